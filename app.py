@@ -1,4 +1,4 @@
-from flask import Flask, render_template, jsonify, request, send_file, redirect, url_for
+from flask import Flask, Response, render_template, jsonify, request, redirect, url_for
 import sqlite3
 import json
 import csv
@@ -6,7 +6,26 @@ import io
 from typing import List, Tuple, Any, Optional, Dict, Union
 from dataclasses import dataclass
 from enum import Enum
-from datetime import datetime, date
+from app.services.scoring_engine import weights_vector
+from app.database.search_index import ensure_search_index
+from app.database.versions import bump_version
+from app.database.category_closure import ensure_category_closure, rebuild_category_closure, category_breadcrumbs
+from app.services.category_order_service import (
+    MISSING_SKUS_REPORTED,
+    apply_category_order,
+    apply_order_operations,
+    apply_staged_positions,
+    bump_category_order,
+    get_category_order_version,
+    missing_skus,
+    schedule_compaction,
+    stage_positions,
+    staged_missing_skus
+)
+from app.services.search_service import find_search_skus
+from app.utils.csv_stream import attachment_headers, csv_chunks
+# Ошибки проверки из сервисов app/ (у app.py свой класс ValidationError)
+from app.utils.validation import ValidationError as OrderValidationError
 
 def init_db():
     """Инициализация базы данных"""
@@ -86,12 +105,30 @@ def init_db():
         ) VALUES (1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0, 1.0)
         ''')
     
+    # Версии данных: по ним снимки каталога, кэш листингов и ETag замечают изменения
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    
+    # Полнотекстовые индексы по name и sku для поиска
+    ensure_search_index(conn)
+    
+    # Замыкание дерева категорий (подкатегории и хлебные крошки)
+    ensure_category_closure(conn)
+    
     conn.commit()
     conn.close()
 
 # Инициализируем базу данных при запуске
 init_db()
 
+class ImportRowError(Exception):
+    """Ошибка в строке загружаемого файла позиций"""
+    pass
+
 class ValidationError(Exception):
     """Кастомное исключение для ошибок валидации"""
     pass
@@ -260,62 +297,6 @@ def get_db_connection():
     conn.row_factory = sqlite3.Row
     return conn
 
-def calculate_score(product, weights):
-    # Базовый скор
-    score = 1.0
-    
-    if weights:
-        # Применяем веса к метрикам
-        if product.get('sessions'):
-            score *= (1 + (weights['sessions_weight'] - 1) * (product['sessions'] / 100))
-        if product.get('product_views'):
-            score *= (1 + (weights['views_weight'] - 1) * (product['product_views'] / 100))
-        if product.get('cart_additions'):
-            score *= (1 + (weights['cart_weight'] - 1) * (product['cart_additions'] / 10))
-        if product.get('checkout_starts'):
-            score *= (1 + (weights['checkout_weight'] - 1) * (product['checkout_starts'] / 10))
-        if product.get('orders_gross'):
-            score *= (1 + (weights['orders_gross_weight'] - 1) * (product['orders_gross'] / 5))
-        if product.get('orders_net'):
-            score *= (1 + (weights['orders_net_weight'] - 1) * (product['orders_net'] / 5))
-        
-        # Применяем вес DNP для товаров с датой начала продаж
-        sale_start_date = product.get('sale_start_date')
-        if sale_start_date and isinstance(sale_start_date, str):
-            try:
-                # Пробуем сначала формат DD.MM.YYYY
-                sale_start = datetime.strptime(sale_start_date, '%d.%m.%Y').date()
-            except ValueError:
-                try:
-                    # Если не получилось, пробуем формат YYYY-MM-DD
-                    sale_start = datetime.strptime(sale_start_date, '%Y-%m-%d').date()
-                except ValueError:
-                    # Если оба формата не подошли, пропускаем
-                    sale_start = None
-            
-            if sale_start:
-                today = date.today()
-                # Если дата начала продаж в прошлом, применяем штраф
-                if sale_start < today:
-                    days_since_sale = (today - sale_start).days
-                    # Штраф увеличивается с течением времени, но не более 50%
-                    penalty = min(0.5, days_since_sale / 365)  # Максимальный штраф 50%
-                    score *= (1 - penalty * weights['dnp_weight'])
-                # Если дата начала продаж в будущем, но товар уже продается - даем поощрение
-                elif sale_start > today and product.get('available', False):
-                    days_until_sale = (sale_start - today).days
-                    # Поощрение увеличивается с удаленностью от официальной даты
-                    bonus = min(0.5, days_until_sale / 365)  # Максимальное поощрение 50%
-                    score *= (1 + bonus * weights['dnp_weight'])
-        
-        # Применяем штраф за скидку
-        if product.get('discount') and weights['discount_penalty']:
-            # Штраф увеличивается с ростом скидки и веса штрафа, но не более 50%
-            penalty = min(0.5, (product['discount'] / 100) * weights['discount_penalty'])
-            score *= (1 - penalty)
-    
-    return round(score, 2)
-
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -381,31 +362,10 @@ def get_products():
         cursor.execute('SELECT * FROM weights ORDER BY id DESC LIMIT 1')
         weights = cursor.fetchone()
         
-        # --- Считаем total_count отдельным простым запросом ---
-        count_query = '''
-            SELECT COUNT(DISTINCT p.sku) 
-            FROM products p
-            LEFT JOIN product_categories pc ON p.sku = pc.sku
-            LEFT JOIN feed_categories fc ON pc.category_id = fc.id
-            WHERE 1=1
-        '''
-        count_params = []
-        if category != 'all':
-            count_query += ' AND fc.category_number = ?'
-            count_params.append(int(category))
-        if hide_no_price:
-            count_query += ' AND p.price > 0'
-        if search:
-            count_query += ' AND (p.sku LIKE ? OR p.name LIKE ?)'
-            search_param = f'%{search}%'
-            count_params.extend([search_param, search_param])
-        if gender != 'all':
-            count_query += ' AND p.gender = ?'
-            count_params.append(gender)
-        cursor.execute(count_query, count_params)
-        total_count = cursor.fetchone()[0]
+        # Поиск по FTS5-индексу: найденные sku передаются одним JSON-параметром
+        search_skus = json.dumps(find_search_skus(conn, search), ensure_ascii=False) if search else None
         
-        # Формируем основной запрос с сортировкой и пагинацией
+        # Один запрос: фильтрация, скор, общее количество (COUNT(*) OVER ()), сортировка и страница
         query = '''
             WITH ProductScores AS (
                 SELECT 
@@ -417,6 +377,7 @@ def get_products():
                     p.gender,
                     p.image_url,
                     p.sale_start_date,
+                    p.sale_start_day,
                     p.available,
                     COALESCE(pm.sessions, 0) as sessions,
                     COALESCE(pm.product_views, 0) as product_views,
@@ -424,11 +385,12 @@ def get_products():
                     COALESCE(pm.checkout_starts, 0) as checkout_starts,
                     COALESCE(pm.orders_gross, 0) as orders_gross,
                     COALESCE(pm.orders_net, 0) as orders_net,
+                    -- Ручная позиция — только из связи с самой выбранной категорией (не с подкатегорией)
                     CASE 
-                        WHEN pc.position IS NOT NULL THEN 1
+                        WHEN MIN(CASE WHEN fc.category_number = ? THEN pc.position END) IS NOT NULL THEN 1
                         ELSE 2
                     END as has_position,
-                    COALESCE(pc.position, 999999) as position,
+                    COALESCE(MIN(CASE WHEN fc.category_number = ? THEN pc.position END), 999999) as position,
                     GROUP_CONCAT(DISTINCT fc.name) as category_names,
                     GROUP_CONCAT(DISTINCT fc.category_number) as category_numbers,
                     p.url
@@ -438,99 +400,90 @@ def get_products():
                 LEFT JOIN feed_categories fc ON pc.category_id = fc.id
                 WHERE 1=1
         '''
-        params = []
+        category_number = int(category) if category != 'all' else None
+        params = [category_number, category_number]
         if category != 'all':
-            query += ' AND fc.category_number = ?'
-            params.append(int(category))
+            # Категория вместе со всеми подкатегориями — через таблицу замыкания дерева
+            query += ''' AND pc.category_id IN (
+                SELECT cc.descendant_id FROM category_closure cc
+                JOIN feed_categories a ON a.id = cc.ancestor_id
+                WHERE a.category_number = ?
+            )'''
+            params.append(category_number)
         if hide_no_price:
             query += ' AND p.price > 0'
         if search:
-            query += ' AND (p.sku LIKE ? OR p.name LIKE ?)'
-            search_param = f'%{search}%'
-            params.extend([search_param, search_param])
+            query += ' AND p.sku IN (SELECT value FROM json_each(?))'
+            params.append(search_skus)
         if gender != 'all':
             query += ' AND p.gender = ?'
             params.append(gender)
+        # Скор — та же формула, что в scoring_engine: метрики × веса, штраф за скидку
+        # и бонус за новизну (плотный ранг даты старта среди отобранных товаров, 1 без даты)
         query += '''
             GROUP BY p.sku
             )
-            SELECT * FROM ProductScores
+            SELECT
+                ProductScores.*,
+                sessions * ? + product_views * ? + cart_additions * ? + checkout_starts * ?
+                    + orders_gross * ? + orders_net * ?
+                    - COALESCE(discount, 0) * ?
+                    + ? * CASE
+                        WHEN sale_start_day IS NULL THEN 1
+                        ELSE DENSE_RANK() OVER (PARTITION BY sale_start_day IS NULL ORDER BY sale_start_day)
+                    END as score,
+                COUNT(*) OVER () as total_count
+            FROM ProductScores
         '''
+        params.extend(weights_vector(weights).tolist())
         
         # --- Сортировка ---
+        # В категории сначала товары с позицией (по позиции), затем остальные по скору; при равенстве — по sku
         if category == 'all':
-            # Без сортировки и лимита в SQL
-            cursor.execute(query, params)
-            products = cursor.fetchall()
-            result = []
-            for product in products:
-                product_dict = {
-                    'sku': product['sku'],
-                    'name': product['name'],
-                    'price': product['price'],
-                    'oldprice': product['oldprice'],
-                    'discount': product['discount'],
-                    'gender': product['gender'],
-                    'image_url': product['image_url'],
-                    'sale_start_date': product['sale_start_date'],
-                    'available': bool(product['available']),
-                    'sessions': product['sessions'],
-                    'product_views': product['product_views'],
-                    'cart_additions': product['cart_additions'],
-                    'checkout_starts': product['checkout_starts'],
-                    'orders_gross': product['orders_gross'],
-                    'orders_net': product['orders_net'],
-                    'categories': product['category_names'].split(',') if product['category_names'] else [],
-                    'category_numbers': [int(x) for x in product['category_numbers'].split(',')] if product['category_numbers'] else [],
-                    'url': product['url']
-                }
-                product_dict['score'] = calculate_score(product_dict, weights)
-                result.append(product_dict)
-            result.sort(key=lambda x: x['score'], reverse=True)
-            start = (page - 1) * per_page
-            end = start + per_page
-            result = result[start:end]
+            query += ' ORDER BY score DESC, sku'
         else:
-            # Получаем все товары для выбранной категории (без LIMIT)
-            cursor.execute(query, params)
-            products = cursor.fetchall()
-            with_position = []
-            without_position = []
-            for product in products:
-                product_dict = {
-                    'sku': product['sku'],
-                    'name': product['name'],
-                    'price': product['price'],
-                    'oldprice': product['oldprice'],
-                    'discount': product['discount'],
-                    'gender': product['gender'],
-                    'image_url': product['image_url'],
-                    'sale_start_date': product['sale_start_date'],
-                    'available': bool(product['available']),
-                    'sessions': product['sessions'],
-                    'product_views': product['product_views'],
-                    'cart_additions': product['cart_additions'],
-                    'checkout_starts': product['checkout_starts'],
-                    'orders_gross': product['orders_gross'],
-                    'orders_net': product['orders_net'],
-                    'categories': product['category_names'].split(',') if product['category_names'] else [],
-                    'category_numbers': [int(x) for x in product['category_numbers'].split(',')] if product['category_numbers'] else [],
-                    'has_position': product['has_position'],
-                    'position': product['position'],
-                    'url': product['url']
-                }
-                product_dict['score'] = calculate_score(product_dict, weights)
-                if product['has_position'] == 1:
-                    with_position.append(product_dict)
-                else:
-                    without_position.append(product_dict)
-            # Сортируем с позицией по position, без позиции — по скору
-            with_position.sort(key=lambda x: (x['position'] if x['position'] is not None else 999999))
-            without_position.sort(key=lambda x: x['score'], reverse=True)
-            result = with_position + without_position
-            start = (page - 1) * per_page
-            end = start + per_page
-            result = result[start:end]
+            query += ' ORDER BY has_position, position, CASE WHEN has_position = 2 THEN score END DESC, sku'
+        query += ' LIMIT ? OFFSET ?'
+        params.extend([per_page, (page - 1) * per_page])
+        
+        # Строки страницы читаются прямо из курсора
+        cursor.execute(query, params)
+        result = []
+        total_count = None
+        for product in cursor:
+            total_count = product['total_count']
+            product_dict = {
+                'sku': product['sku'],
+                'name': product['name'],
+                'price': product['price'],
+                'oldprice': product['oldprice'],
+                'discount': product['discount'],
+                'gender': product['gender'],
+                'image_url': product['image_url'],
+                'sale_start_date': product['sale_start_date'],
+                'sale_start_day': product['sale_start_day'],
+                'available': bool(product['available']),
+                'sessions': product['sessions'],
+                'product_views': product['product_views'],
+                'cart_additions': product['cart_additions'],
+                'checkout_starts': product['checkout_starts'],
+                'orders_gross': product['orders_gross'],
+                'orders_net': product['orders_net'],
+                'categories': product['category_names'].split(',') if product['category_names'] else [],
+                'category_numbers': [int(x) for x in product['category_numbers'].split(',')] if product['category_numbers'] else [],
+                'url': product['url'],
+                'score': product['score']
+            }
+            if category != 'all':
+                product_dict['has_position'] = product['has_position']
+                product_dict['position'] = product['position']
+            result.append(product_dict)
+        
+        if total_count is None:
+            # Страница за концом списка — количество берется из первой строки того же запроса
+            cursor.execute(query, params[:-2] + [1, 0])
+            first = cursor.fetchone()
+            total_count = first['total_count'] if first else 0
         
         total_pages = (total_count + per_page - 1) // per_page
         
@@ -615,6 +568,7 @@ def get_category(category_number):
                 'category_number': category['parent_number']
             } if category['parent_id'] else None,
             'product_count': category['product_count'],
+            'breadcrumbs': category_breadcrumbs(conn, category['id']),
             'children': [{
                 'id': child['id'],
                 'category_number': child['category_number'],
@@ -723,6 +677,7 @@ def update_category_order():
                 category['id'],
                 position
             ))
+            bump_category_order(conn, category['id'])
             
             conn.commit()
             return jsonify({'status': 'success'})
@@ -789,6 +744,7 @@ def reset_category_order():
         category_id = category['id']
         # Обнуляем позиции в product_categories для этой категории, но сохраняем связи
         conn.execute('UPDATE product_categories SET position = NULL WHERE category_id = ?', (category_id,))
+        bump_category_order(conn, category_id)
         conn.commit()
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -799,6 +755,8 @@ def reset_category_order():
 @app.route('/api/export_category/<int:category_number>')
 def export_category(category_number):
     conn = get_db_connection()
+    # При потоковой отдаче соединение закрывается вместе с ответом
+    streaming = False
     try:
         # Получаем ID и номер категории
         category = conn.execute(
@@ -826,29 +784,31 @@ def export_category(category_number):
                 CASE WHEN pc.position IS NOT NULL THEN 1 ELSE 2 END,
                 pc.position
         """
-        products = conn.execute(query, (category['category_number'], category['id'], category['id'], category['id'])).fetchall()
-        
-        # Создаем CSV в памяти
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';')
-        writer.writerow(['sku', 'category_id', 'position'])
-        for product in products:
-            writer.writerow([
+        cursor = conn.execute(query, (category['category_number'], category['id'], category['id'], category['id']))
+        
+        # Строки читаются из курсора по мере отдачи ответа
+        rows = (
+            (
                 product['sku'],
                 product['category_id'],
                 product['position'] if product['position'] is not None else ''
-            ])
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
+            )
+            for product in cursor
+        )
+        response = Response(
+            csv_chunks(['sku', 'category_id', 'position'], rows),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'{category["name"]}_positions.csv'
+            headers=attachment_headers(f'{category["name"]}_positions.csv')
         )
+        # Соединение нужно до конца отдачи — его закрывает сам ответ
+        response.call_on_close(conn.close)
+        streaming = True
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     finally:
-        conn.close()
+        if not streaming:
+            conn.close()
 
 @app.route('/api/import_category/<int:category_number>', methods=['POST'])
 def import_category(category_number):
@@ -873,41 +833,43 @@ def import_category(category_number):
         if not category:
             return jsonify({'error': 'Категория не найдена'}), 404
         
-        # Читаем CSV файл
-        stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
+        # CSV читается из загруженного файла построчно и пачками уходит во временную таблицу
+        stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
         csv_input = csv.DictReader(stream)
         
-        # Подготавливаем данные для вставки
-        positions = []
-        for row in csv_input:
-            try:
-                sku = row['Артикул']
-                position = int(row['Позиция в категории'])
-                if position < 0:
-                    raise ValueError("Позиция не может быть отрицательной")
-                positions.append((sku, category['id'], position))
-            except (KeyError, ValueError) as e:
-                return jsonify({'error': f'Ошибка в строке {csv_input.line_num}: {str(e)}'}), 400
-        
-        # Проверяем существование всех SKU
-        skus = [p[0] for p in positions]
-        existing_skus = set(row[0] for row in conn.execute(
-            'SELECT sku FROM products WHERE sku IN ({})'.format(','.join('?' * len(skus))),
-            skus
-        ).fetchall())
-        
-        missing_skus = set(skus) - existing_skus
+        def rows():
+            for row in csv_input:
+                try:
+                    sku = row['Артикул']
+                    position = int(row['Позиция в категории'])
+                    if position < 0:
+                        raise ValueError("Позиция не может быть отрицательной")
+                except (KeyError, TypeError, ValueError) as e:
+                    raise ImportRowError(f'Ошибка в строке {csv_input.line_num}: {str(e)}')
+                yield csv_input.line_num, sku, position
+        
+        try:
+            stage_positions(conn, rows())
+        except ImportRowError as e:
+            conn.rollback()
+            return jsonify({'error': str(e)}), 400
+        
+        # Проверяем существование всех SKU одним anti-join по временной таблице
+        missing_skus, missing_count = staged_missing_skus(conn, MISSING_SKUS_REPORTED)
         if missing_skus:
+            more = f' и еще {missing_count - len(missing_skus)}' if missing_count > len(missing_skus) else ''
+            conn.rollback()
             return jsonify({
-                'error': 'Следующие артикулы не найдены в базе: ' + ', '.join(missing_skus)
+                'error': 'Следующие артикулы не найдены в базе: ' + ', '.join(missing_skus) + more
             }), 400
         
-        # Обновляем позиции
-        conn.executemany(
-            'INSERT OR REPLACE INTO product_categories (sku, category_id, position) VALUES (?, ?, ?)',
-            positions
-        )
+        # Обновляем позиции одним INSERT … SELECT
+        apply_staged_positions(conn, category['id'])
+        # Новая версия порядка в той же транзакции: снимки, кэш листингов и ETag видят импорт сразу
+        bump_category_order(conn, category['id'])
         conn.commit()
+        # Позиции из файла идут подряд — промежутки для ручных перестановок создаются в фоне
+        schedule_compaction(conn, category['id'])
         
         return jsonify({'message': 'Позиции успешно обновлены'})
         
@@ -961,6 +923,10 @@ def create_or_update_category():
                     VALUES (?, ?, ?, ?)
                 ''', (category_number, name, parent_id, is_active))
             
+            # Дерево изменилось — пересчитываем замыкание
+            rebuild_category_closure(conn)
+            # Новая версия каталога сбрасывает снимки и ETag ответов API
+            bump_version(conn)
             conn.commit()
             return jsonify({'status': 'success'})
         finally:
@@ -990,31 +956,65 @@ def update_category_order_bulk():
             if not category:
                 return jsonify({'error': 'Категория не найдена'}), 404
             category_id = category['id']
-            if data:  # Только если массив не пустой
-                # Удаляю все старые связи для этой категории
-                conn.execute('DELETE FROM product_categories WHERE category_id = ?', (category_id,))
-                # Проверяем существование всех sku
-                skus = [item['sku'] for item in data]
-                existing_skus = set(row[0] for row in conn.execute(
-                    'SELECT sku FROM products WHERE sku IN ({})'.format(','.join('?' * len(skus))),
-                    skus
-                ).fetchall())
-                missing_skus = set(skus) - existing_skus
-                if missing_skus:
-                    return jsonify({'error': 'Следующие артикулы не найдены в базе: ' + ', '.join(missing_skus)}), 400
-                # Обновляем позиции
-                positions = [(item['sku'], category_id, item['position']) for item in data]
-                conn.executemany(
-                    'INSERT OR REPLACE INTO product_categories (sku, category_id, position) VALUES (?, ?, ?)',
-                    positions
-                )
+            # Позиции читаются уже под блокировкой записи: фоновое уплотнение не перенумерует
+            # категорию между чтением позиций и записью новых
+            conn.execute('BEGIN IMMEDIATE')
+            # Полная замена ручного порядка: товары из списка закрепляются (без связи — привязываются),
+            # у остальных товаров категории позиция сбрасывается (связь сохраняется).
+            # Пишутся только строки, чья позиция изменилась
+            skus = [item['sku'] for item in sorted(data, key=lambda item: item['position'])]
+            missing = missing_skus(conn, skus)
+            if missing:
+                return jsonify({'error': 'Следующие артикулы не найдены в базе: ' + ', '.join(missing)}), 400
+            changed, crowded = apply_category_order(conn, category_id, skus)
+            if changed:
+                bump_category_order(conn, category_id)
             conn.commit()
-            return jsonify({'status': 'success'})
+            if crowded:
+                # Промежутки между позициями исчерпаны — перенумерация в фоне
+                schedule_compaction(conn, category_id)
+            return jsonify({'status': 'success', 'changed': changed})
         finally:
             conn.close()
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/category_order_ops', methods=['POST'])
+def category_order_ops():
+    """Точечное изменение порядка категории списком операций (move, pin, unpin) — как в app/routes"""
+    try:
+        data = request.json
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Данные должны быть объектом'}), 400
+        category_id = InputValidator.validate_integer(data.get('category_id'), 'category_id', min_value=1)
+        expected_version = data.get('version')
+        conn = get_db_connection()
+        try:
+            # Блокировка записи берется до чтения версии и позиций
+            conn.execute('BEGIN IMMEDIATE')
+            current_version = get_category_order_version(conn, category_id)
+            if expected_version is not None and expected_version != current_version:
+                conn.rollback()
+                return jsonify({'error': 'Порядок категории изменился, обновите страницу',
+                                'version': current_version}), 409
+            try:
+                changed, crowded = apply_order_operations(conn, category_id, data.get('operations'))
+            except OrderValidationError as e:
+                conn.rollback()
+                return jsonify({'error': str(e)}), 400
+            version = bump_category_order(conn, category_id) if changed else current_version
+            conn.commit()
+            if crowded:
+                # Промежутки между позициями исчерпаны — перенумерация в фоне
+                schedule_compaction(conn, category_id)
+            return jsonify({'status': 'success', 'version': version, 'changed': changed})
+        finally:
+            conn.close()
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(ValidationError)
 def handle_validation_error(error):
     return jsonify({'error': str(error)}), 400
@@ -0,0 +1,86 @@
+from typing import Any, Dict, List
+
+CLOSURE_TABLE = 'category_closure'
+
+# Ограничение глубины рекурсии: защита от циклов в parent_id
+MAX_CATEGORY_DEPTH = 32
+
+
+def _table_exists(conn, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def ensure_category_closure(conn) -> bool:
+    """Создание таблицы замыкания дерева категорий (ancestor_id, descendant_id, depth).
+
+    Для каждой категории хранятся все ее предки вместе с ней самой (depth = 0), поэтому
+    подкатегории и цепочка родителей находятся одним индексным запросом без обхода parent_id.
+    Возвращает True, если таблица была создана (и заполнена) в этом вызове.
+    Коммит остается за вызывающим кодом.
+    """
+    created = not _table_exists(conn, CLOSURE_TABLE)
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS {CLOSURE_TABLE} (
+        ancestor_id INTEGER NOT NULL,
+        descendant_id INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        PRIMARY KEY (ancestor_id, descendant_id)
+    ) WITHOUT ROWID
+    ''')
+    # Обратный индекс: предки категории по удаленности (хлебные крошки)
+    conn.execute(f'''
+    CREATE INDEX IF NOT EXISTS idx_{CLOSURE_TABLE}_descendant
+    ON {CLOSURE_TABLE} (descendant_id, depth)
+    ''')
+    # Товары категории по category_id (первичный ключ product_categories начинается с sku)
+    if _table_exists(conn, 'product_categories'):
+        conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_product_categories_category
+        ON product_categories (category_id, sku)
+        ''')
+
+    if created:
+        rebuild_category_closure(conn)
+    return created
+
+
+def rebuild_category_closure(conn) -> None:
+    """Пересчет замыкания по текущему feed_categories одним рекурсивным запросом.
+
+    Вызывается после каждого изменения дерева категорий (импорт, редактирование).
+    При цикле в parent_id остается кратчайшее расстояние между категориями.
+    """
+    conn.execute(f'DELETE FROM {CLOSURE_TABLE}')
+    if not _table_exists(conn, 'feed_categories'):
+        return
+    conn.execute(f'''
+        WITH RECURSIVE chain (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM feed_categories
+            UNION ALL
+            SELECT parent.id, chain.descendant_id, chain.depth + 1
+            FROM chain
+            JOIN feed_categories child ON child.id = chain.ancestor_id
+            JOIN feed_categories parent ON parent.id = child.parent_id
+            WHERE chain.depth < ?
+        )
+        INSERT INTO {CLOSURE_TABLE} (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, MIN(depth)
+        FROM chain
+        GROUP BY ancestor_id, descendant_id
+    ''', (MAX_CATEGORY_DEPTH,))
+
+
+def category_breadcrumbs(conn, category_id: int) -> List[Dict[str, Any]]:
+    """Цепочка категорий от корня до заданной (включительно) одним запросом"""
+    return [
+        {'id': row[0], 'name': row[1], 'category_number': row[2]}
+        for row in conn.execute(f'''
+            SELECT f.id, f.name, f.category_number
+            FROM {CLOSURE_TABLE} c
+            JOIN feed_categories f ON f.id = c.ancestor_id
+            WHERE c.descendant_id = ?
+            ORDER BY c.depth DESC
+        ''', (category_id,)).fetchall()
+    ]
@@ -1,4 +1,18 @@
 from app.database.connection import get_db_connection
+from app.database.search_index import ensure_search_index
+from app.database.category_closure import ensure_category_closure
+from app.services.category_order_service import spread_dense_positions
+
+def ensure_columns(cursor, table, columns):
+    """Добавление недостающих колонок в существующую таблицу, возвращает список добавленных"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    added = []
+    for name, definition in columns.items():
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+            added.append(name)
+    return added
 
 def init_db():
     """Инициализация базы данных"""
@@ -21,6 +35,28 @@ def init_db():
         )
         ''')
         
+        # Колонки, которые заполняет import_processed_data_to_db.py
+        ensure_columns(cursor, 'products', {
+            'sessions': 'INTEGER DEFAULT 0',
+            'product_views': 'INTEGER DEFAULT 0',
+            'cart_additions': 'INTEGER DEFAULT 0',
+            'checkout_starts': 'INTEGER DEFAULT 0',
+            'orders_gross': 'INTEGER DEFAULT 0',
+            'orders_net': 'INTEGER DEFAULT 0',
+            'revenue_vat': 'REAL DEFAULT 0',
+            'revenue_net': 'REAL DEFAULT 0',
+            'categories': 'TEXT',
+            'url': 'TEXT'
+        })
+        
+        # Нормализованная дата старта продаж (номер дня) и ранг новизны, считаются при импорте
+        if ensure_columns(cursor, 'products', {
+            'sale_start_day': 'INTEGER',
+            'novelty_rank': 'INTEGER'
+        }):
+            from app.services.score_table_service import refresh_sale_start_days
+            refresh_sale_start_days(conn)
+        
         # Создаем таблицу product_metrics
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS product_metrics (
@@ -62,6 +98,62 @@ def init_db():
         )
         ''')
         
+        # Создаем таблицу product_scores (материализованный скор для последних весов)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_scores (
+            sku TEXT PRIMARY KEY,
+            weights_id INTEGER NOT NULL,
+            score REAL NOT NULL,
+            score_rank INTEGER NOT NULL
+        )
+        ''')
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_product_scores_rank
+        ON product_scores (weights_id, score_rank)
+        ''')
+
+        # Создаем таблицу category_weight_profiles (веса категории; NULL — брать из общих весов)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_weight_profiles (
+            category_id INTEGER PRIMARY KEY,
+            sessions_weight REAL,
+            views_weight REAL,
+            cart_weight REAL,
+            checkout_weight REAL,
+            orders_gross_weight REAL,
+            orders_net_weight REAL,
+            discount_penalty REAL,
+            sale_start_weight REAL,
+            category_group TEXT,
+            discount_type TEXT DEFAULT 'regular',
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''')
+
+        # Создаем таблицу data_versions (версии данных для in-memory кэшей)
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+
+        # Полнотекстовые индексы по name и sku (синхронизируются триггерами)
+        ensure_search_index(conn)
+
+        # Замыкание дерева категорий (подкатегории и хлебные крошки одним запросом)
+        ensure_category_closure(conn)
+
+        # Индекс ручных позиций: соседи товара в порядке категории без сортировки всей категории
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_categories'")
+        if cursor.fetchone():
+            cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_product_categories_position
+            ON product_categories (category_id, position)
+            ''')
+            # Позиции, записанные подряд (1..N), один раз разводятся с шагом POSITION_GAP
+            spread_dense_positions(conn)
+
         # Добавляем начальные веса, если таблица пуста
         cursor.execute('SELECT COUNT(*) FROM weights')
         if cursor.fetchone()[0] == 0:
@@ -0,0 +1,102 @@
+SEARCH_TABLE = 'products_fts'
+TRIGRAM_TABLE = 'products_trigram'
+# Представление products с нормализованным названием — содержимое обоих индексов
+SEARCH_CONTENT = 'products_search_content'
+
+# unicode61 приводит к нижнему регистру и кириллицу, но «ё» для него отдельная буква
+# (это не диакритика), поэтому «ё» сводится к «е» до токенизации — в индексируемом
+# названии и в строке поиска (fold_yo). Префиксные индексы ускоряют запросы вида "плат*"
+SEARCH_TOKENIZE = 'unicode61 remove_diacritics 2'
+SEARCH_PREFIXES = '2 3 4'
+
+_YO = str.maketrans('ёЁ', 'еЕ')
+
+
+def fold_yo(text: str) -> str:
+    """Замена «ё» на «е» — так же, как в индексируемом названии"""
+    return text.translate(_YO)
+
+
+def _fold_yo_sql(value: str) -> str:
+    return f"replace(replace({value}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _drop_unnormalized_index(cursor) -> None:
+    """Удаление индексов прежнего формата (content='products', название без замены «ё»)"""
+    row = cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).fetchone()
+    if row is None or SEARCH_CONTENT in row[0]:
+        return
+    for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+        for suffix in ('ai', 'ad', 'au'):
+            cursor.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def ensure_search_index(conn) -> bool:
+    """Создание FTS5-индексов по name и sku и триггеров синхронизации с products.
+
+    Индексы — external content над представлением products с нормализованным названием:
+    хранятся только токены, строки берутся из products по rowid. Индексы прежнего формата
+    пересоздаются. Возвращает True, если индексы были созданы (и заполнены) в этом вызове.
+    Коммит остается за вызывающим кодом.
+    """
+    cursor = conn.cursor()
+    _drop_unnormalized_index(cursor)
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?)",
+        (SEARCH_TABLE, TRIGRAM_TABLE)
+    )
+    created = cursor.fetchone()[0] < 2
+
+    cursor.execute(f'''
+    CREATE VIEW IF NOT EXISTS {SEARCH_CONTENT} AS
+    SELECT rowid AS product_rowid, sku, {_fold_yo_sql('name')} AS name FROM products
+    ''')
+
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        sku, name,
+        content='{SEARCH_CONTENT}', content_rowid='product_rowid',
+        tokenize='{SEARCH_TOKENIZE}', prefix='{SEARCH_PREFIXES}'
+    )
+    ''')
+    # Триграммы: поиск подстроки (как LIKE '%...%') и нечеткий поиск при опечатках
+    cursor.execute(f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5(
+        sku, name,
+        content='{SEARCH_CONTENT}', content_rowid='product_rowid',
+        tokenize='trigram'
+    )
+    ''')
+
+    # Триггеры пишут в индекс то же нормализованное название, что отдает представление
+    new_name, old_name = _fold_yo_sql('new.name'), _fold_yo_sql('old.name')
+    for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON products BEGIN
+            INSERT INTO {table} (rowid, sku, name) VALUES (new.rowid, new.sku, {new_name});
+        END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON products BEGIN
+            INSERT INTO {table} ({table}, rowid, sku, name) VALUES ('delete', old.rowid, old.sku, {old_name});
+        END
+        ''')
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE OF sku, name ON products BEGIN
+            INSERT INTO {table} ({table}, rowid, sku, name) VALUES ('delete', old.rowid, old.sku, {old_name});
+            INSERT INTO {table} (rowid, sku, name) VALUES (new.rowid, new.sku, {new_name});
+        END
+        ''')
+
+    if created:
+        rebuild_search_index(conn)
+    return created
+
+
+def rebuild_search_index(conn) -> None:
+    """Полное перестроение поисковых индексов по текущему содержимому products"""
+    for table in (SEARCH_TABLE, TRIGRAM_TABLE):
+        conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
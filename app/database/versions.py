@@ -0,0 +1,25 @@
+CATALOG = 'catalog'
+CATEGORY_ORDER = 'category_order'
+
+
+def get_version(conn, name: str = CATALOG) -> int:
+    """Текущая версия набора данных (увеличивается при каждом изменении)"""
+    row = conn.execute('SELECT version FROM data_versions WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def bump_version(conn, name: str = CATALOG) -> int:
+    """Увеличение версии набора данных; коммит остается за вызывающим кодом"""
+    conn.execute('''
+        INSERT INTO data_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''', (name,))
+    return get_version(conn, name)
+
+
+def database_file(conn) -> str:
+    """Путь к файлу основной БД соединения (для ключей in-memory кэшей)"""
+    for row in conn.execute('PRAGMA database_list').fetchall():
+        if row[1] == 'main':
+            return row[2]
+    return ''
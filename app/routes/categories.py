@@ -1,20 +1,32 @@
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, Response, jsonify, request
 from app.services.category_service import (
     get_all_categories, 
     get_category_products, 
+    get_category_ordering,
     update_category_order,
     reset_category_order, 
-    export_category_data
+    get_export_category,
+    export_category_csv,
+    export_all_categories_zip
 )
 from app.utils.validation import InputValidator, ValidationError
-import io
-import csv
+from app.utils.etag import conditional_get
+from app.utils.csv_stream import attachment_headers
 import json
 from app.database.connection import get_db_connection
+from app.services.catalog_snapshot import invalidate_catalog_snapshot
+from app.services.category_order_service import (
+    apply_listed_positions,
+    apply_order_operations,
+    bump_category_order,
+    get_category_order_version,
+    schedule_compaction
+)
 
 categories_bp = Blueprint('categories', __name__)
 
 @categories_bp.route('/api/categories')
+@conditional_get
 def get_categories():
     """API для получения всех категорий"""
     try:
@@ -44,6 +56,16 @@ def get_category(category_number):
     except Exception as e:
         return jsonify({"error": f"Ошибка при получении категории: {str(e)}"}), 500
 
+@categories_bp.route('/api/category_ordering/<int:category_id>')
+@conditional_get
+def get_category_ordering_route(category_id):
+    """API для получения порядка всех товаров категории (sku, скор, позиция, миниатюра)"""
+    try:
+        hide_no_price = request.args.get('hide_no_price', 'true').lower() == 'true'
+        return Response(get_category_ordering(category_id, hide_no_price), mimetype='application/json')
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при получении порядка категории: {str(e)}"}), 500
+
 @categories_bp.route('/api/category_order', methods=['POST'])
 def update_category_order_route():
     """API для обновления порядка товаров в категории"""
@@ -88,9 +110,11 @@ def reset_category_order():
                 SET position = NULL 
                 WHERE category_id = ?
             ''', (category_id,))
+            version = bump_category_order(conn, category_id)
             conn.commit()
+        invalidate_catalog_snapshot()
             
-        return jsonify({"status": "success"})
+        return jsonify({"status": "success", "version": version})
     except ValidationError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
@@ -100,50 +124,30 @@ def reset_category_order():
 def export_category(category_id):
     """API для экспорта категории в CSV формат (только sku, category_id, position)"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, name 
-                FROM feed_categories 
-                WHERE id = ? AND is_active = 1
-            """, (category_id,))
-            category = cursor.fetchone()
-            if not category:
-                return jsonify({"error": "Категория не найдена"}), 404
-            # Получаем только нужные поля
-            cursor.execute("""
-                SELECT 
-                    p.sku,
-                    pc.category_id,
-                    pc.position
-                FROM products p
-                LEFT JOIN product_categories pc ON p.sku = pc.sku AND pc.category_id = ?
-                WHERE pc.category_id = ?
-                ORDER BY 
-                    CASE WHEN pc.position IS NOT NULL THEN 1 ELSE 2 END,
-                    pc.position
-            """, (category_id, category_id))
-            products = cursor.fetchall()
-        # Создаем CSV в памяти
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';')
-        writer.writerow(['sku', 'category_id', 'position'])
-        for product in products:
-            writer.writerow([
-                product['sku'],
-                product['category_id'],
-                product['position'] if product['position'] is not None else ''
-            ])
-        output.seek(0)
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
+        category = get_export_category(category_id)
+        if not category:
+            return jsonify({"error": "Категория не найдена"}), 404
+        # CSV отдается по мере чтения курсора
+        return Response(
+            export_category_csv(category_id),
             mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'category_{category["name"]}_products.csv'
+            headers=attachment_headers(f'category_{category["name"]}_products.csv')
         )
     except Exception as e:
         return jsonify({"error": f"Ошибка при экспорте категории: {str(e)}"}), 500
 
+@categories_bp.route('/api/export_categories')
+def export_all_categories():
+    """API для экспорта всех категорий: ZIP-архив с CSV каждой категории"""
+    try:
+        return Response(
+            export_all_categories_zip(),
+            mimetype='application/zip',
+            headers=attachment_headers('categories.zip')
+        )
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при экспорте категорий: {str(e)}"}), 500
+
 @categories_bp.route('/api/category_order_bulk', methods=['POST'])
 def update_category_order_bulk():
     """API для массового обновления порядка товаров в категории"""
@@ -152,24 +156,93 @@ def update_category_order_bulk():
         if not isinstance(data, list):
             return jsonify({"error": "Ожидается массив позиций"}), 400
             
+        # Места товаров среди закрепленных, по каждой категории
+        orders = {}
+        for position in data:
+            sku = position.get('sku')
+            category_id = position.get('category_id')
+            pos = position.get('position')
+            
+            if not all([sku, category_id, pos is not None]):
+                return jsonify({"error": "Неверный формат данных"}), 400
+            rank = InputValidator.validate_integer(pos, 'position', min_value=1)
+            orders.setdefault(int(category_id), []).append((rank, sku))
+            
         with get_db_connection() as conn:
-            cursor = conn.cursor()
-            for position in data:
-                sku = position.get('sku')
-                category_id = position.get('category_id')
-                pos = position.get('position')
-                
-                if not all([sku, category_id, pos is not None]):
-                    return jsonify({"error": "Неверный формат данных"}), 400
-                    
-                cursor.execute('''
-                    UPDATE product_categories 
-                    SET position = ? 
-                    WHERE sku = ? AND category_id = ?
-                ''', (pos, sku, category_id))
-                
-            conn.commit()
+            # Позиции читаются уже под блокировкой записи: фоновое уплотнение не перенумерует
+            # категорию между чтением позиций и записью новых
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                # Частичное обновление: position — место товара среди закрепленных товаров категории,
+                # остальные закрепленные сохраняют взаимный порядок
+                changed, crowded, versions = 0, [], {}
+                for category_id, items in orders.items():
+                    category_changed, category_crowded = apply_listed_positions(conn, category_id, items)
+                    changed += category_changed
+                    if category_crowded:
+                        crowded.append(category_id)
+                    # Версия категории меняется, только если ее порядок действительно изменился
+                    versions[str(category_id)] = (
+                        bump_category_order(conn, category_id) if category_changed
+                        else get_category_order_version(conn, category_id)
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            # Промежутки между позициями исчерпаны — перенумерация в фоне
+            for category_id in crowded:
+                schedule_compaction(conn, category_id)
+        if changed:
+            invalidate_catalog_snapshot()
             
-        return jsonify({"status": "success"})
+        return jsonify({"status": "success", "changed": changed, "versions": versions})
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при обновлении порядка: {str(e)}"}), 500
+
+
+@categories_bp.route('/api/category_order_ops', methods=['POST'])
+def category_order_ops():
+    """API для точечного изменения порядка категории списком операций (move, pin, unpin).
+
+    Все операции применяются в одной транзакции. Если передан version и он не совпадает
+    с текущей версией порядка категории, ничего не меняется и возвращается 409.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict):
+            raise ValidationError("Данные должны быть объектом")
+        category_id = InputValidator.validate_integer(data.get('category_id'), 'category_id', min_value=1)
+        expected_version = data.get('version')
+        
+        with get_db_connection() as conn:
+            # Блокировка записи берется до чтения версии: между проверкой version и записью
+            # порядок категории не может изменить параллельный запрос
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                current_version = get_category_order_version(conn, category_id)
+                if expected_version is not None and expected_version != current_version:
+                    conn.rollback()
+                    return jsonify({
+                        "error": "Порядок категории изменился, обновите страницу",
+                        "version": current_version
+                    }), 409
+                changed, crowded = apply_order_operations(conn, category_id, data.get('operations'))
+                version = bump_category_order(conn, category_id) if changed else current_version
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if crowded:
+                # Промежутки между позициями исчерпаны — перенумерация в фоне
+                schedule_compaction(conn, category_id)
+        if changed:
+            invalidate_catalog_snapshot()
+        
+        return jsonify({"status": "success", "version": version, "changed": changed})
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": f"Ошибка при обновлении порядка: {str(e)}"}), 500 
\ No newline at end of file
+        return jsonify({"error": f"Ошибка при изменении порядка: {str(e)}"}), 500
@@ -1,17 +1,65 @@
-from flask import Blueprint, jsonify, request
-from app.services.product_service import get_products
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from app.services.product_service import get_products, stream_products, get_facets, autocomplete_skus
+from app.services.catalog_snapshot import listing_cache_stats
 from app.utils.validation import InputValidator, ValidationError
+from app.utils.etag import conditional_get
 
 products_bp = Blueprint('products', __name__)
 
+# Форматы, в которых страница отдается потоком, и их MIME-типы
+STREAMING_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json-stream': 'application/json'
+}
+
 @products_bp.route('/api/products')
+@conditional_get
 def get_products_route():
     """API для получения продуктов с фильтрами и пагинацией"""
     try:
         filters = InputValidator.validate_product_filters(request.args)
+        if filters.response_format in STREAMING_MIMETYPES:
+            meta, chunks = stream_products(filters)
+            response = Response(stream_with_context(chunks), mimetype=STREAMING_MIMETYPES[filters.response_format])
+            response.headers['X-Total-Count'] = str(meta['total'])
+            response.headers['X-Total-Pages'] = str(meta['total_pages'])
+            if meta['next_cursor']:
+                response.headers['X-Next-Cursor'] = meta['next_cursor']
+            return response
         result = get_products(filters)
         return jsonify(result)
     except ValidationError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
-        return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500 
\ No newline at end of file
+        return jsonify({"error": f"Внутренняя ошибка сервера: {str(e)}"}), 500
+
+@products_bp.route('/api/facets')
+@conditional_get
+def get_facets_route():
+    """API для получения количества товаров по полу, категориям и наличию цены при текущих фильтрах"""
+    try:
+        filters = InputValidator.validate_product_filters(request.args)
+        return jsonify(get_facets(filters))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при подсчете фасетов: {str(e)}"}), 500
+
+@products_bp.route('/api/sku_autocomplete')
+def sku_autocomplete_route():
+    """API подсказок по началу артикула (варианты сгруппированы по базовому артикулу)"""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = InputValidator.validate_integer(request.args.get('limit', 10), 'limit', min_value=1, max_value=50)
+        if not query:
+            return jsonify({"query": query, "items": []})
+        return jsonify({"query": query, "items": autocomplete_skus(query, limit)})
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при поиске артикулов: {str(e)}"}), 500
+
+@products_bp.route('/api/cache_stats')
+def cache_stats_route():
+    """API для просмотра счетчиков кэша листингов"""
+    return jsonify({"listings": listing_cache_stats()})
@@ -1,10 +1,18 @@
 from flask import Blueprint, jsonify, request
 from app.services.weights_service import get_current_weights, update_weights, reset_weights
+from app.services.category_weights_service import (
+    get_category_profile,
+    save_category_profile,
+    delete_category_profile
+)
+from app.services.simulation_service import simulate_weights
 from app.utils.validation import ValidationError
+from app.utils.etag import conditional_get
 
 weights_bp = Blueprint('weights', __name__)
 
 @weights_bp.route('/api/weights')
+@conditional_get
 def get_weights():
     """API для получения текущих весов"""
     try:
@@ -51,4 +59,72 @@ def reset_weights_route():
             return jsonify({"error": message}), 400
             
     except Exception as e:
-        return jsonify({"error": f"Ошибка при сбросе весов: {str(e)}"}), 500 
\ No newline at end of file
+        return jsonify({"error": f"Ошибка при сбросе весов: {str(e)}"}), 500 
+
+@weights_bp.route('/api/simulate_weights', methods=['POST'])
+def simulate_weights_route():
+    """API для пакетной оценки вариантов весов без сохранения"""
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "Необходимо передать варианты весов в формате JSON"}), 400
+        
+        try:
+            top_k = int(data.get('top_k', 20))
+        except (ValueError, TypeError):
+            return jsonify({"error": "top_k должен быть целым числом"}), 400
+        
+        return jsonify(simulate_weights(data.get('candidates'), top_k))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при оценке весов: {str(e)}"}), 500
+
+@weights_bp.route('/api/category_weights/<int:category_id>')
+def get_category_weights(category_id):
+    """API для получения профиля весов категории"""
+    try:
+        profile = get_category_profile(category_id)
+        if profile is None:
+            return jsonify({"error": "У категории нет собственного профиля весов"}), 404
+        return jsonify(profile)
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при получении профиля весов: {str(e)}"}), 500
+
+@weights_bp.route('/api/category_weights/<int:category_id>', methods=['POST'])
+def update_category_weights(category_id):
+    """API для сохранения профиля весов категории"""
+    try:
+        profile = request.get_json()
+        
+        if not profile or not isinstance(profile, dict):
+            return jsonify({"error": "Необходимо передать профиль весов в формате JSON"}), 400
+        
+        # Валидация входных данных: веса — числа или null (взять из общих весов)
+        for key, value in profile.items():
+            if key in ('category_group', 'discount_type') or value is None:
+                continue
+            try:
+                profile[key] = float(value)
+            except (ValueError, TypeError):
+                return jsonify({"error": f"Значение {key} должно быть числом"}), 400
+        
+        success, message = save_category_profile(category_id, profile)
+        
+        if success:
+            return jsonify({"message": message})
+        else:
+            return jsonify({"error": message}), 400
+            
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при сохранении профиля весов: {str(e)}"}), 500
+
+@weights_bp.route('/api/category_weights/<int:category_id>', methods=['DELETE'])
+def delete_category_weights(category_id):
+    """API для удаления профиля весов категории"""
+    try:
+        success, message = delete_category_profile(category_id)
+        return jsonify({"message": message})
+    except Exception as e:
+        return jsonify({"error": f"Ошибка при удалении профиля весов: {str(e)}"}), 500
\ No newline at end of file
@@ -0,0 +1,442 @@
+import bisect
+import re
+import sys
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.database import connection
+from app.database.connection import get_db_connection
+from app.database.versions import database_file
+from app.services.category_weights_service import compile_category_scorer, get_current_season
+from app.services.score_table_service import get_latest_weights
+from app.services.search_service import find_search_skus
+from app.services.scoring_engine import CompiledScorer, IncrementalScorer, ScoringEngine
+from app.utils.bitmap import Bitmap
+from app.utils.sku_index import SkuIndex
+from app.utils.keyset import ListingCursor, after_cursor_mask
+from app.utils.lru_cache import TTLCache
+from app.utils.validation import Gender, ProductFilters
+
+# Как часто (в секундах) проверять версии данных в SQLite; между проверками запросы
+# обслуживаются только из памяти. Изменения через сервисы этого процесса видны сразу
+# (они вызывают invalidate_catalog_snapshot), изменения из других процессов — не позже интервала.
+CHECK_INTERVAL = 1.0
+
+# Суффикс размера в имени картинки CDN: ..._01_515Wx515H.jpg
+_IMAGE_SIZE_RE = re.compile(r'_\d+Wx\d+H$')
+
+# Сколько результатов поиска по FTS-индексу держать в снимке
+MAX_CACHED_SEARCHES = 256
+
+
+def thumbnail_id(image_url: Optional[str]) -> str:
+    """Имя файла картинки без каталога, размера (_515Wx515H) и расширения"""
+    if not image_url:
+        return ''
+    stem = image_url.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+    return _IMAGE_SIZE_RE.sub('', stem)
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CategoryMembers:
+    """Товары категории: номера строк снимка (по возрастанию) и ручные позиции (NaN — без позиции)"""
+
+    __slots__ = ('rows', 'positions', 'raw_positions')
+
+    def __init__(self, rows: List[int], positions: List[Optional[int]]):
+        order = np.argsort(np.asarray(rows, dtype=np.int64), kind='stable')
+        self.rows = np.asarray(rows, dtype=np.int64)[order]
+        self.raw_positions = [positions[i] for i in order.tolist()]
+        self.positions = np.array(
+            [np.nan if position is None else position for position in self.raw_positions],
+            dtype=np.float64
+        )
+
+
+class CatalogSnapshot:
+    """Неизменяемый колоночный снимок каталога в памяти процесса.
+
+    Строка снимка — целочисленный id товара (товары упорядочены по sku). Колонки products
+    хранятся списками с интернированными строками, метрики — матрицей вкладов NumPy,
+    цена и пол — массивами для векторной фильтрации. Снимок строится один раз на версию
+    данных и заменяется целиком, поэтому читателям не нужны блокировки.
+    """
+
+    def __init__(self, key: Tuple, columns: Dict[str, List[Any]], categories: Dict[int, CategoryMembers],
+                 profiles: Dict[int, Dict[str, Any]], engine: ScoringEngine,
+                 category_tree: Optional[Dict[int, Dict[str, Any]]] = None,
+                 category_ancestors: Optional[Dict[int, List[int]]] = None):
+        self.key = key
+        self.column_names = list(columns)
+        self.columns = columns
+        self.skus: List[str] = columns['sku']
+        self.sku_ids = {sku: row for row, sku in enumerate(self.skus)}
+        self.categories = categories
+        self.profiles = profiles
+        self.category_tree = category_tree or {}
+        self.category_ancestors = category_ancestors or {}
+
+        # Битовые карты фильтров: фильтр — побитовое AND, количество — popcount
+        size = len(self.skus)
+        self.all_bitmap = Bitmap.full(size)
+        self.empty_bitmap = Bitmap.empty(size)
+        prices = np.array([price or 0.0 for price in columns.get('price', [0.0] * size)], dtype=np.float64)
+        self.price_bitmap = Bitmap.from_mask(prices > 0)
+        genders = np.array(columns.get('gender', [None] * size), dtype=object)
+        gender_values = {gender.value for gender in Gender if gender != Gender.ALL}
+        gender_values.update(gender for gender in genders.tolist() if gender is not None)
+        self.gender_bitmaps = {gender: Bitmap.from_mask(genders == gender) for gender in sorted(gender_values)}
+        self.category_bitmaps = {
+            category_id: Bitmap.from_rows(members.rows, size) for category_id, members in categories.items()
+        }
+
+        self._scorer = IncrementalScorer(engine)
+        self._lock = threading.Lock()
+        self._scores: Dict[Any, np.ndarray] = {}
+        self._category_scorers: Dict[Tuple, Optional[CompiledScorer]] = {}
+        self._searches: Dict[str, np.ndarray] = {}
+        self._sku_index: Optional[SkuIndex] = None
+        self._subtree_bitmaps: Optional[Dict[int, Bitmap]] = None
+        self._thumbnail_ids: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.skus)
+
+    @classmethod
+    def load(cls, conn, key: Tuple) -> 'CatalogSnapshot':
+        """Чтение каталога из SQLite (товары, членство в категориях, дерево категорий, профили весов)"""
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM products ORDER BY sku')
+        names = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+        columns = {name: [_intern(row[i]) for row in rows] for i, name in enumerate(names)}
+        products = [dict(zip(names, row)) for row in rows]
+        engine = ScoringEngine.from_products(products, stored_novelty=True)
+        del products
+
+        sku_ids = {sku: row for row, sku in enumerate(columns['sku'])}
+        members: Dict[int, Tuple[List[int], List[Optional[int]]]] = {}
+        for sku, category_id, position in conn.execute(
+                'SELECT sku, category_id, position FROM product_categories').fetchall():
+            row = sku_ids.get(sku)
+            if row is None or category_id is None:
+                continue
+            category_rows, positions = members.setdefault(int(category_id), ([], []))
+            category_rows.append(row)
+            positions.append(position)
+        categories = {category_id: CategoryMembers(*value) for category_id, value in members.items()}
+
+        profiles = {
+            row['category_id']: dict(row)
+            for row in conn.execute('SELECT * FROM category_weight_profiles').fetchall()
+        }
+        category_tree = {
+            row['id']: {'name': row['name'], 'parent_id': row['parent_id']}
+            for row in conn.execute('SELECT id, name, parent_id FROM feed_categories WHERE is_active = 1').fetchall()
+        }
+        # Предки каждой категории из таблицы замыкания, от ближайшего к корню
+        category_ancestors: Dict[int, List[int]] = {}
+        for descendant_id, ancestor_id in conn.execute('''
+            SELECT cc.descendant_id, cc.ancestor_id
+            FROM category_closure cc
+            JOIN feed_categories a ON a.id = cc.ancestor_id AND a.is_active = 1
+            WHERE cc.depth > 0
+            ORDER BY cc.descendant_id, cc.depth
+        ''').fetchall():
+            category_ancestors.setdefault(descendant_id, []).append(ancestor_id)
+        return cls(key, columns, categories, profiles, engine, category_tree, category_ancestors)
+
+    def scores(self, weights: Dict[str, Any]) -> np.ndarray:
+        """Скор всех товаров снимка для общих весов (кэшируется по id весов)"""
+        with self._lock:
+            scores = self._scores.get(weights['id'])
+            if scores is None:
+                scores = self._scorer.score(weights)
+                self._scores = {weights['id']: scores}
+            return scores
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """Матрица вкладов каталога (строки — товары снимка по возрастанию sku)"""
+        return self._scorer.matrix
+
+    def contribution_rows(self, skus: List[str]) -> np.ndarray:
+        """Строки матрицы вкладов для заданных sku (нулевые для sku, которых нет в снимке)"""
+        rows = np.fromiter((self.sku_ids.get(sku, -1) for sku in skus), dtype=np.int64, count=len(skus))
+        matrix = self._scorer.matrix
+        result = matrix[np.maximum(rows, 0)] if len(matrix) else np.zeros((len(skus), matrix.shape[1]))
+        result[rows < 0] = 0.0
+        return result
+
+    def category_scorer(self, category_id: int, weights: Dict[str, Any]) -> Optional[CompiledScorer]:
+        """Скомпилированный скорер профиля категории (None — категория использует общие веса)"""
+        profile = self.profiles.get(category_id)
+        if profile is None:
+            return None
+        key = (category_id, weights['id'], get_current_season())
+        with self._lock:
+            if key not in self._category_scorers:
+                self._category_scorers[key] = compile_category_scorer(profile, weights, key[2])
+            return self._category_scorers[key]
+
+    @property
+    def sku_index(self) -> SkuIndex:
+        """Индекс sku для поиска по префиксу (строится при первом обращении)"""
+        if self._sku_index is None:
+            self._sku_index = SkuIndex(self.skus)
+        return self._sku_index
+
+    def column(self, name: str, row: int) -> Any:
+        """Значение колонки products для строки (None, если колонки нет в схеме)"""
+        values = self.columns.get(name)
+        return values[row] if values is not None else None
+
+    def ancestors(self, category_id: int) -> List[int]:
+        """Родители категории от ближайшего к корню (из таблицы замыкания)"""
+        return self.category_ancestors.get(category_id, [])
+
+    @property
+    def thumbnail_ids(self) -> List[str]:
+        """Идентификаторы миниатюр товаров (имя файла картинки без размера и расширения)"""
+        if self._thumbnail_ids is None:
+            self._thumbnail_ids = [
+                _intern(thumbnail_id(url)) for url in self.columns.get('image_url', [None] * len(self.skus))
+            ]
+        return self._thumbnail_ids
+
+    @property
+    def subtree_bitmaps(self) -> Dict[int, Bitmap]:
+        """Битовые карты категорий вместе с товарами всех подкатегорий (строятся при первом обращении)"""
+        if self._subtree_bitmaps is None:
+            subtree = dict(self.category_bitmaps)
+            for category_id, bitmap in self.category_bitmaps.items():
+                for ancestor in self.ancestors(category_id):
+                    subtree[ancestor] = subtree[ancestor] | bitmap if ancestor in subtree else bitmap
+            self._subtree_bitmaps = subtree
+        return self._subtree_bitmaps
+
+    def search_rows(self, search: str) -> np.ndarray:
+        """Номера строк снимка, найденных FTS-поиском (результат кэшируется в снимке)"""
+        with self._lock:
+            found = self._searches.get(search)
+        if found is None:
+            with get_db_connection() as conn:
+                skus = find_search_skus(conn, search)
+            found = np.array(sorted(self.sku_ids[sku] for sku in skus if sku in self.sku_ids), dtype=np.int64)
+            with self._lock:
+                if len(self._searches) >= MAX_CACHED_SEARCHES:
+                    self._searches.clear()
+                self._searches[search] = found
+        return found
+
+    def filter_bitmap(self, filters: ProductFilters) -> Bitmap:
+        """Битовая карта товаров, прошедших фильтры (пересечение карт категории, цены, пола, поиска).
+
+        Фильтр по категории включает товары всех ее подкатегорий.
+        """
+        bitmap = self.all_bitmap
+        if filters.category != 'all':
+            category_id = int(filters.category) if str(filters.category).isdigit() else None
+            bitmap = bitmap & self.subtree_bitmaps.get(category_id, self.empty_bitmap)
+        if filters.hide_no_price:
+            bitmap = bitmap & self.price_bitmap
+        if filters.gender != 'all':
+            bitmap = bitmap & self.gender_bitmaps.get(filters.gender, self.empty_bitmap)
+        if filters.sku:
+            row = self.sku_ids.get(filters.sku)
+            bitmap = bitmap & (Bitmap.from_rows([row], len(self)) if row is not None else self.empty_bitmap)
+        if filters.search:
+            bitmap = bitmap & Bitmap.from_rows(self.search_rows(filters.search), len(self))
+        return bitmap
+
+    def count(self, filters: ProductFilters) -> int:
+        """Количество товаров под фильтрами — popcount без выборки строк"""
+        return self.filter_bitmap(filters).count()
+
+    def filter_rows(self, filters: ProductFilters) -> Tuple[np.ndarray, Optional[CategoryMembers], np.ndarray]:
+        """Номера строк, прошедших фильтры (по возрастанию sku).
+
+        Для фильтра по категории дополнительно возвращаются члены категории и индексы
+        отобранных строк среди них (для ручных позиций); -1 — товар только из подкатегорий.
+        """
+        rows = self.filter_bitmap(filters).rows()
+        members = None
+        if filters.category != 'all':
+            category_id = int(filters.category) if str(filters.category).isdigit() else None
+            members = self.categories.get(category_id)
+        if members is None:
+            return rows, None, np.empty(0, dtype=np.int64)
+        member_index = np.searchsorted(members.rows, rows)
+        found = member_index < len(members.rows)
+        found[found] = members.rows[member_index[found]] == rows[found]
+        return rows, members, np.where(found, member_index, -1)
+
+    def ordered_listing(self, filters: ProductFilters, weights: Optional[Dict[str, Any]]) -> 'OrderedListing':
+        """Все товары под фильтрами в порядке выдачи (из кэша результатов, если он есть).
+
+        В категории сначала ручные позиции (при равной позиции — по скору), затем остальные
+        по убыванию скора; при равенстве — по sku (номер строки снимка растет вместе с sku).
+        """
+        key = (
+            self.key, weights['id'] if weights else None, get_current_season(),
+            str(filters.category), filters.gender, filters.hide_no_price, filters.search, filters.sku
+        )
+        listing = _listing_cache.get(key)
+        if listing is not None:
+            return listing
+
+        rows, members, member_index = self.filter_rows(filters)
+        category_scorer = None
+        if members is not None and weights:
+            category_scorer = self.category_scorer(int(filters.category), weights)
+        if category_scorer is not None:
+            scores = category_scorer.score(self.matrix[rows])
+        elif weights:
+            scores = self.scores(weights)[rows]
+        else:
+            scores = np.zeros(len(rows))
+        if members is not None:
+            positions = np.where(member_index >= 0, members.positions[np.maximum(member_index, 0)], np.nan)
+        else:
+            positions = np.full(len(rows), np.nan)
+
+        unpinned = np.isnan(positions)
+        order = np.lexsort((rows, -scores, np.where(unpinned, 0.0, positions), unpinned))
+        raw_positions = None
+        if members is not None:
+            raw_positions = [members.raw_positions[i] if i >= 0 else None for i in member_index[order].tolist()]
+        listing = OrderedListing(rows[order], scores[order], positions[order], raw_positions)
+        _listing_cache.put(key, listing)
+        return listing
+
+    def query(self, filters: ProductFilters, weights: Optional[Dict[str, Any]],
+              after: Optional[ListingCursor] = None,
+              columns: Optional[Iterable[str]] = None) -> Tuple[Iterator[Dict[str, Any]], int, bool, Optional[ListingCursor]]:
+        """Страница листинга без обращения к SQLite.
+
+        С курсором страница начинается сразу после него (page игнорируется): упорядоченный
+        листинг монотонен по ключу курсора, поэтому начало находится без отбора предыдущих строк.
+        columns ограничивает колонки products в строках (None — все).
+        Возвращает ленивый итератор строк страницы, общее количество, признак следующей
+        страницы и ключ сортировки последней строки страницы.
+        """
+        listing = self.ordered_listing(filters, weights)
+        total = len(listing.rows)
+        if after is not None:
+            later_sku = listing.rows >= bisect.bisect_right(self.skus, after.sku)
+            mask = after_cursor_mask(listing.positions, listing.scores, later_sku, after)
+            start = int(np.argmax(mask)) if mask.any() else total
+        else:
+            start = (filters.page - 1) * filters.per_page
+        page = range(start, min(start + filters.per_page, total))
+
+        names = self.column_names if columns is None else [name for name in self.column_names if name in columns]
+        last_key = None
+        if page:
+            last = page[-1]
+            position = listing.raw_positions[last] if listing.raw_positions is not None else None
+            last_key = ListingCursor(position, float(listing.scores[last]), self.skus[int(listing.rows[last])])
+
+        def products():
+            # Строки страницы создаются по мере чтения — потоковый ответ не держит всю страницу в памяти
+            for i in page:
+                row = int(listing.rows[i])
+                product = {name: self.columns[name][row] for name in names}
+                if listing.raw_positions is not None:
+                    product['position'] = listing.raw_positions[i]
+                product['score'] = float(listing.scores[i])
+                yield product
+
+        return products(), total, page.stop < total, last_key
+
+
+class OrderedListing(NamedTuple):
+    """Товары под фильтрами в порядке выдачи: строки снимка, скор, позиции (NaN — без позиции)
+    и исходные значения позиций (None вне категории)"""
+    rows: np.ndarray
+    scores: np.ndarray
+    positions: np.ndarray
+    raw_positions: Optional[List[Optional[int]]]
+
+
+# Кэш упорядоченных листингов: ключ (данные снимка, id весов, сезон, фильтры без страницы)
+LISTING_CACHE_SIZE = 64
+LISTING_CACHE_TTL = 300.0
+_listing_cache = TTLCache(LISTING_CACHE_SIZE, LISTING_CACHE_TTL)
+
+
+def listing_cache_stats() -> Dict[str, Any]:
+    """Счетчики кэша листингов (попадания, промахи, вытеснения)"""
+    return _listing_cache.stats()
+
+
+# Текущий снимок процесса; заменяется целиком одной операцией присваивания
+_state = {'snapshot': None, 'weights': None, 'path': None, 'checked_at': float('-inf')}
+_build_lock = threading.Lock()
+
+
+def _data_key(conn) -> Tuple:
+    """Ключ данных снимка: файл БД и все версии data_versions (каталог, порядок категорий, профили)"""
+    versions = tuple(sorted(tuple(row) for row in conn.execute('SELECT name, version FROM data_versions').fetchall()))
+    return (database_file(conn), versions)
+
+
+def invalidate_catalog_snapshot() -> None:
+    """Принудительная проверка версий данных при следующем запросе и сброс кэша листингов
+    (после записи в БД)"""
+    _state['checked_at'] = float('-inf')
+    _listing_cache.clear()
+
+
+def expire_stale_snapshot(versions: Tuple, weights_id: Optional[int]) -> None:
+    """Немедленная перепроверка снимка, если он отстает от состояния БД.
+
+    versions — отсортированные пары (имя, версия) data_versions, weights_id — id последних
+    весов, прочитанные вызывающим кодом (например, для ETag). Если снимок процесса построен
+    по другим данным (запись из другого процесса, CHECK_INTERVAL еще не истек), следующий
+    get_catalog_snapshot перечитает данные — ответ не окажется старше своего ETag.
+    """
+    snapshot = _state['snapshot']
+    if snapshot is None:
+        return
+    weights = _state['weights']
+    if snapshot.key[1] != versions or (weights['id'] if weights else None) != weights_id:
+        invalidate_catalog_snapshot()
+
+
+def current_catalog_snapshot(conn) -> Optional[CatalogSnapshot]:
+    """Снимок процесса, если он построен по тем же данным, что видит conn (иначе None)"""
+    snapshot = _state['snapshot']
+    if snapshot is None or snapshot.key != _data_key(conn):
+        return None
+    return snapshot
+
+
+def get_catalog_snapshot() -> Tuple[CatalogSnapshot, Optional[Dict[str, Any]]]:
+    """Актуальный снимок каталога и последние веса.
+
+    Проверка версий — два коротких запроса не чаще раза в CHECK_INTERVAL. Новый снимок
+    строится под блокировкой одним потоком; остальные потоки до замены продолжают
+    работать со старым.
+    """
+    now = time.monotonic()
+    snapshot = _state['snapshot']
+    if (snapshot is not None and _state['path'] == connection.DATABASE_PATH
+            and now - _state['checked_at'] < CHECK_INTERVAL):
+        return snapshot, _state['weights']
+
+    with _build_lock:
+        path = connection.DATABASE_PATH
+        with get_db_connection() as conn:
+            key = _data_key(conn)
+            weights = get_latest_weights(conn)
+            snapshot = _state['snapshot']
+            if snapshot is None or snapshot.key != key:
+                snapshot = CatalogSnapshot.load(conn, key)
+        _state.update(snapshot=snapshot, weights=weights, path=path, checked_at=time.monotonic())
+        return snapshot, weights
@@ -0,0 +1,469 @@
+import bisect
+import json
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.database.versions import CATEGORY_ORDER, bump_version, database_file, get_version
+from app.utils.validation import ValidationError
+
+# Шаг между соседними ручными позициями: между двумя товарами помещается
+# POSITION_GAP - 1 вставок, прежде чем понадобится перенумерация
+POSITION_GAP = 1024
+# Отметка в data_versions: ручные позиции уже переведены на шаг POSITION_GAP
+POSITION_GAPS_VERSION = 'category_order_gaps'
+
+# Операции над порядком категории (POST /api/category_order_ops)
+ORDER_OPERATIONS = ('move', 'pin', 'unpin')
+
+# Категории, для которых уже запущено уплотнение позиций (ключ — файл БД и категория)
+_compaction_lock = threading.Lock()
+_pending_compactions: Set[Tuple[str, int]] = set()
+
+
+def category_order_version_name(category_id: int) -> str:
+    """Имя версии порядка одной категории в data_versions"""
+    return f'{CATEGORY_ORDER}:{category_id}'
+
+
+def get_category_order_version(conn, category_id: int) -> int:
+    return get_version(conn, category_order_version_name(category_id))
+
+
+def bump_category_order(conn, category_id: int) -> int:
+    """Новая версия порядка категории (и общей версии порядка для снимков и ETag).
+    Возвращает версию категории; коммит остается за вызывающим кодом."""
+    bump_version(conn, CATEGORY_ORDER)
+    return bump_version(conn, category_order_version_name(category_id))
+
+
+def pinned_positions(conn, category_id: int) -> List[Tuple[str, int]]:
+    """Закрепленные товары категории в порядке ручных позиций: [(sku, позиция)]"""
+    return [
+        (row[0], row[1])
+        for row in conn.execute('''
+            SELECT sku, position FROM product_categories
+            WHERE category_id = ? AND position IS NOT NULL
+            ORDER BY position, sku
+        ''', (category_id,)).fetchall()
+    ]
+
+
+def keys_between(low: Optional[int], high: Optional[int], count: int) -> Optional[List[int]]:
+    """count возрастающих целых позиций строго между low и high.
+
+    None вместо low — начало списка (позиции положительные), вместо high — конец списка
+    (позиции идут с шагом POSITION_GAP). Если места не хватает, возвращается None.
+    """
+    low = 0 if low is None else low
+    if high is None:
+        return [low + POSITION_GAP * i for i in range(1, count + 1)]
+    if high - low <= count:
+        return None
+    return [low + (high - low) * i // (count + 1) for i in range(1, count + 1)]
+
+
+def _kept_indexes(keys: Sequence[Optional[int]]) -> Set[int]:
+    """Индексы самой длинной строго возрастающей подпоследовательности ключей (None пропускаются).
+
+    Эти товары уже стоят в нужном порядке относительно друг друга и остаются на своих позициях.
+    """
+    tails: List[int] = []
+    tail_indexes: List[int] = []
+    previous: Dict[int, Optional[int]] = {}
+    for i, key in enumerate(keys):
+        if key is None:
+            continue
+        j = bisect.bisect_left(tails, key)
+        previous[i] = tail_indexes[j - 1] if j else None
+        if j == len(tails):
+            tails.append(key)
+            tail_indexes.append(i)
+        else:
+            tails[j] = key
+            tail_indexes[j] = i
+    kept = set()
+    i = tail_indexes[-1] if tail_indexes else None
+    while i is not None:
+        kept.add(i)
+        i = previous[i]
+    return kept
+
+
+def plan_positions(current: Sequence[Optional[int]], low: Optional[int] = None) -> Tuple[Dict[int, int], bool]:
+    """Новые позиции для списка, который должен идти в заданном порядке.
+
+    current — текущие позиции элементов в новом порядке (None — не закреплен). Элементы самой
+    длинной возрастающей подпоследовательности не меняются, остальные получают позиции в
+    промежутках между ними. Если промежуток исчерпан, перемещаемый участок расширяется
+    на соседей справа. low — позиция элемента перед списком (None — список с начала).
+    Возвращает {индекс: новая позиция} и признак исчерпанного промежутка (пора уплотнить позиции).
+    """
+    kept = _kept_indexes(current)
+    changes: Dict[int, int] = {}
+    crowded = False
+    i = 0
+    while i < len(current):
+        if i in kept:
+            low = current[i]
+            i += 1
+            continue
+        # Участок подряд идущих перемещаемых элементов и следующий неподвижный сосед
+        end = i
+        while end < len(current) and end not in kept:
+            end += 1
+        while True:
+            high = current[end] if end < len(current) else None
+            keys = keys_between(low, high, end - i)
+            if keys is not None:
+                break
+            crowded = True
+            kept.discard(end)
+            end += 1
+            while end < len(current) and end not in kept:
+                end += 1
+        for index, key in zip(range(i, end), keys):
+            if current[index] != key:
+                changes[index] = key
+        low = keys[-1]
+        i = end
+    return changes, crowded
+
+
+def missing_skus(conn, skus: Sequence[str]) -> List[str]:
+    """Sku из списка, которых нет в products (список передается одним JSON-параметром)"""
+    return [row[0] for row in conn.execute('''
+        SELECT DISTINCT value FROM json_each(?)
+        WHERE value NOT IN (SELECT sku FROM products)
+    ''', (json.dumps(list(skus), ensure_ascii=False),)).fetchall()]
+
+
+def apply_category_order(conn, category_id: int, skus: Sequence[str]) -> Tuple[int, bool]:
+    """Закрепление товаров категории в заданном порядке (skus — все закрепленные, по порядку).
+
+    Пишутся только строки, чья позиция изменилась: перестановка одного товара — одна
+    запись. Товары, закрепленные раньше, но отсутствующие в списке, открепляются (связь
+    с категорией сохраняется); товары без связи с категорией привязываются к ней.
+    Возвращает число измененных строк и признак того, что позиции пора уплотнить.
+    Коммит остается за вызывающим кодом;
+    транзакцию он начинает с BEGIN IMMEDIATE, чтобы позиции не изменились между чтением и записью.
+    """
+    skus = list(dict.fromkeys(skus))
+    missing = missing_skus(conn, skus)
+    if missing:
+        raise ValidationError('Следующие артикулы не найдены в базе: ' + ', '.join(missing))
+
+    current = dict(pinned_positions(conn, category_id))
+    changes, crowded = plan_positions([current.get(sku) for sku in skus])
+
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE product_categories SET position = NULL
+        WHERE category_id = ? AND position IS NOT NULL
+          AND sku NOT IN (SELECT value FROM json_each(?))
+    ''', (category_id, json.dumps(skus, ensure_ascii=False)))
+    unpinned = cursor.rowcount
+    cursor.executemany('''
+        INSERT INTO product_categories (sku, category_id, position) VALUES (?, ?, ?)
+        ON CONFLICT (sku, category_id) DO UPDATE SET position = excluded.position
+    ''', [(skus[index], category_id, position) for index, position in changes.items()])
+    return unpinned + len(changes), crowded
+
+
+def apply_listed_positions(conn, category_id: int, ranks: Sequence[Tuple[int, str]]) -> Tuple[int, bool]:
+    """Перемещение перечисленных товаров на заданные места среди закрепленных (частичное обновление).
+
+    ranks — пары (место с 1, sku). Остальные закрепленные товары сохраняют взаимный порядок
+    и сдвигаются, освобождая места; товары из списка, не закрепленные раньше, закрепляются.
+    Пишутся только строки, чья позиция изменилась. Новые связи не создаются — товары без
+    связи с категорией отклоняются. Возвращает число измененных строк и признак того,
+    что позиции пора уплотнить. Коммит остается за вызывающим кодом;
+    транзакцию он начинает с BEGIN IMMEDIATE, чтобы позиции не изменились между чтением и записью.
+    """
+    # При повторе sku действует последнее место
+    requested = {sku: rank for rank, sku in ranks}
+    skus = list(requested)
+    missing = missing_skus(conn, skus)
+    if missing:
+        raise ValidationError('Следующие артикулы не найдены в базе: ' + ', '.join(missing))
+
+    linked = {
+        row[0]
+        for row in conn.execute('''
+            SELECT sku FROM product_categories
+            WHERE category_id = ? AND sku IN (SELECT value FROM json_each(?))
+        ''', (category_id, json.dumps(skus, ensure_ascii=False))).fetchall()
+    }
+    unlinked = [sku for sku in skus if sku not in linked]
+    if unlinked:
+        raise ValidationError(f'Следующие артикулы не привязаны к категории {category_id}: ' + ', '.join(unlinked))
+
+    pinned = pinned_positions(conn, category_id)
+    current = dict(pinned)
+    order = [sku for sku, _ in pinned if sku not in requested]
+    for sku in sorted(skus, key=lambda sku: requested[sku]):
+        order.insert(min(max(requested[sku] - 1, 0), len(order)), sku)
+
+    changes, crowded = plan_positions([current.get(sku) for sku in order])
+    conn.executemany(
+        'UPDATE product_categories SET position = ? WHERE sku = ? AND category_id = ?',
+        [(position, order[index], category_id) for index, position in changes.items()]
+    )
+    return len(changes), crowded
+
+
+def compact_category_positions(conn, category_id: int) -> int:
+    """Перенумерация закрепленных товаров категории с шагом POSITION_GAP (порядок не меняется).
+
+    Пишутся только строки, чья позиция изменилась. Возвращает их число.
+    Коммит остается за вызывающим кодом.
+    """
+    updates = [
+        (POSITION_GAP * (i + 1), sku, category_id)
+        for i, (sku, position) in enumerate(pinned_positions(conn, category_id))
+        if position != POSITION_GAP * (i + 1)
+    ]
+    conn.executemany(
+        'UPDATE product_categories SET position = ? WHERE sku = ? AND category_id = ?', updates
+    )
+    return len(updates)
+
+
+def spread_dense_positions(conn) -> int:
+    """Однократный перевод ручных позиций всех категорий на шаг POSITION_GAP.
+
+    Позиции, записанные подряд (1..N), не оставляют места для вставок, и первое же
+    перемещение перенумеровало бы всю категорию. Выполняется один раз (отметка в
+    data_versions). Возвращает число измененных строк; коммит остается за вызывающим кодом.
+    """
+    if get_version(conn, POSITION_GAPS_VERSION):
+        return 0
+    changed = 0
+    for (category_id,) in conn.execute(
+        'SELECT DISTINCT category_id FROM product_categories WHERE position IS NOT NULL'
+    ).fetchall():
+        changed += compact_category_positions(conn, category_id)
+    if changed:
+        bump_version(conn, CATEGORY_ORDER)
+    bump_version(conn, POSITION_GAPS_VERSION)
+    return changed
+
+
+def _compaction_worker(path: str, category_id: int) -> None:
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            # Позиции читаются уже под блокировкой записи, иначе параллельное перемещение,
+            # записанное между чтением и перенумерацией, было бы затерто старыми позициями
+            conn.execute('BEGIN IMMEDIATE')
+            # Видимый порядок не меняется: версия категории (для version в операциях) остается прежней,
+            # обновляется только общая версия порядка для снимков и ETag
+            if compact_category_positions(conn, category_id):
+                bump_version(conn, CATEGORY_ORDER)
+            conn.commit()
+        finally:
+            conn.close()
+        from app.services.catalog_snapshot import invalidate_catalog_snapshot
+        invalidate_catalog_snapshot()
+    finally:
+        with _compaction_lock:
+            _pending_compactions.discard((path, category_id))
+
+
+def schedule_compaction(conn, category_id: int) -> Optional[threading.Thread]:
+    """Уплотнение позиций категории в фоновом потоке (после коммита вызывающего кода).
+
+    Для одной категории одновременно работает не больше одного уплотнения.
+    Возвращает запущенный поток или None, если уплотнение уже идет.
+    """
+    path = database_file(conn)
+    with _compaction_lock:
+        if (path, category_id) in _pending_compactions:
+            return None
+        _pending_compactions.add((path, category_id))
+    thread = threading.Thread(target=_compaction_worker, args=(path, category_id), daemon=True)
+    thread.start()
+    return thread
+
+
+def _position_of(conn, category_id: int, sku: str) -> Optional[int]:
+    row = conn.execute(
+        'SELECT position FROM product_categories WHERE category_id = ? AND sku = ?', (category_id, sku)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def _neighbor(conn, category_id: int, sku: str, position: int, before: bool) -> Optional[int]:
+    """Ближайшая позиция перед (before=True) или после заданной, без самого sku (по индексу)"""
+    sign, order = ('<', 'DESC') if before else ('>', 'ASC')
+    row = conn.execute(f'''
+        SELECT position FROM product_categories
+        WHERE category_id = ? AND position {sign} ? AND sku != ?
+        ORDER BY position {order}
+        LIMIT 1
+    ''', (category_id, position, sku)).fetchone()
+    return row[0] if row else None
+
+
+def _bounds_at_index(conn, category_id: int, sku: str, index: int) -> Tuple[Optional[int], Optional[int]]:
+    """Позиции соседей, между которыми sku окажется index-м среди закрепленных (с нуля)"""
+    rows = [row[0] for row in conn.execute('''
+        SELECT position FROM product_categories
+        WHERE category_id = ? AND position IS NOT NULL AND sku != ?
+        ORDER BY position, sku
+        LIMIT 2 OFFSET ?
+    ''', (category_id, sku, max(index - 1, 0))).fetchall()]
+    if index == 0:
+        return None, rows[0] if rows else None
+    if not rows:
+        # Индекс за концом закрепленных — товар встает последним
+        last = conn.execute(
+            'SELECT MAX(position) FROM product_categories WHERE category_id = ? AND sku != ?',
+            (category_id, sku)
+        ).fetchone()[0]
+        return last, None
+    return rows[0], rows[1] if len(rows) > 1 else None
+
+
+def _place(conn, category_id: int, sku: str, low: Optional[int], high: Optional[int]) -> Tuple[int, bool]:
+    """Запись sku между позициями low и high.
+
+    Обычно это одна строка. Если промежуток исчерпан, соседи справа сдвигаются ровно
+    настолько, насколько нужно (минимум записей), и возвращается признак уплотнения.
+    """
+    current = _position_of(conn, category_id, sku)
+    if current is not None and (low is None or current > low) and (high is None or current < high):
+        return 0, False
+    keys = keys_between(low, high, 1)
+    if keys is not None:
+        updates = [(sku, keys[0])]
+        crowded = False
+    else:
+        tail = [(row[0], row[1]) for row in conn.execute('''
+            SELECT sku, position FROM product_categories
+            WHERE category_id = ? AND position >= ? AND sku != ?
+            ORDER BY position, sku
+        ''', (category_id, high, sku)).fetchall()]
+        changes, crowded = plan_positions([None] + [position for _, position in tail], low)
+        skus = [sku] + [tail_sku for tail_sku, _ in tail]
+        updates = [(skus[index], position) for index, position in changes.items()]
+    conn.executemany('''
+        INSERT INTO product_categories (sku, category_id, position) VALUES (?, ?, ?)
+        ON CONFLICT (sku, category_id) DO UPDATE SET position = excluded.position
+    ''', [(row_sku, category_id, position) for row_sku, position in updates])
+    return len(updates), crowded
+
+
+def apply_order_operations(conn, category_id: int, operations: Sequence[Dict]) -> Tuple[int, bool]:
+    """Применение операций над порядком категории по очереди в одной транзакции вызывающего кода.
+
+    Операции:
+    - {'op': 'move', 'sku': X, 'before': Y} или {'op': 'move', 'sku': X, 'after': Y} —
+      X закрепляется рядом с закрепленным Y;
+    - {'op': 'pin', 'sku': X, 'index': N} — X становится N-м (с нуля) среди закрепленных;
+    - {'op': 'unpin', 'sku': X} — ручная позиция X снимается.
+
+    Каждая операция читает соседей по индексу (category_id, position) и обычно пишет одну
+    строку, поэтому стоимость зависит от числа изменений, а не от размера категории.
+    Возвращает число измененных строк и признак того, что позиции пора уплотнить.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValidationError('operations должен быть непустым списком')
+    for operation in operations:
+        if not isinstance(operation, dict) or operation.get('op') not in ORDER_OPERATIONS:
+            raise ValidationError(f"op должен быть одним из {list(ORDER_OPERATIONS)}")
+        if not isinstance(operation.get('sku'), str) or not operation['sku']:
+            raise ValidationError('Каждая операция должна содержать sku')
+    missing = missing_skus(conn, [operation['sku'] for operation in operations])
+    if missing:
+        raise ValidationError('Следующие артикулы не найдены в базе: ' + ', '.join(missing))
+
+    changed, crowded = 0, False
+    for operation in operations:
+        sku = operation['sku']
+        if operation['op'] == 'unpin':
+            changed += conn.execute('''
+                UPDATE product_categories SET position = NULL
+                WHERE category_id = ? AND sku = ? AND position IS NOT NULL
+            ''', (category_id, sku)).rowcount
+            continue
+        if operation['op'] == 'pin':
+            index = operation.get('index')
+            if not isinstance(index, int) or isinstance(index, bool) or index < 0:
+                raise ValidationError('index должен быть неотрицательным целым числом')
+            low, high = _bounds_at_index(conn, category_id, sku, index)
+        else:
+            before = 'before' in operation
+            anchor = operation.get('before' if before else 'after')
+            anchor_position = _position_of(conn, category_id, anchor) if anchor != sku else None
+            if anchor_position is None:
+                raise ValidationError(f"Опорный товар {anchor} не закреплен в категории")
+            if before:
+                low, high = _neighbor(conn, category_id, sku, anchor_position, True), anchor_position
+            else:
+                low, high = anchor_position, _neighbor(conn, category_id, sku, anchor_position, False)
+        rows, operation_crowded = _place(conn, category_id, sku, low, high)
+        changed += rows
+        crowded = crowded or operation_crowded
+    return changed, crowded
+
+
+# Загрузка позиций из файла: строк в одной пачке вставки во временную таблицу
+IMPORT_CHUNK_ROWS = 5000
+
+# Сколько отсутствующих в каталоге sku перечислять в сообщении об ошибке
+MISSING_SKUS_REPORTED = 50
+
+# Временная таблица загрузки (живет в рамках соединения)
+STAGING_TABLE = 'temp.category_positions_import'
+
+
+def stage_positions(conn, rows: Iterable[Tuple[int, str, int]], chunk_rows: int = IMPORT_CHUNK_ROWS) -> int:
+    """Загрузка строк (номер строки файла, sku, позиция) во временную таблицу пачками.
+
+    Строки читаются из итератора по мере вставки, поэтому память не зависит от размера файла.
+    Возвращает число загруженных строк. Коммит остается за вызывающим кодом.
+    """
+    conn.execute(f'DROP TABLE IF EXISTS {STAGING_TABLE}')
+    conn.execute(f'CREATE TABLE {STAGING_TABLE} (line INTEGER PRIMARY KEY, sku TEXT NOT NULL, position INTEGER NOT NULL)')
+    insert = f'INSERT INTO {STAGING_TABLE} (line, sku, position) VALUES (?, ?, ?)'
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            conn.executemany(insert, chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(insert, chunk)
+        total += len(chunk)
+    return total
+
+
+def staged_missing_skus(conn, limit: int = MISSING_SKUS_REPORTED) -> Tuple[List[str], int]:
+    """Sku загруженного файла, которых нет в products (anti-join): первые limit и общее число"""
+    query = f'''
+        SELECT DISTINCT s.sku FROM {STAGING_TABLE} s
+        WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.sku = s.sku)
+    '''
+    sample = [row[0] for row in conn.execute(f'{query} LIMIT ?', (limit,)).fetchall()]
+    if len(sample) < limit:
+        return sample, len(sample)
+    return sample, conn.execute(f'SELECT COUNT(*) FROM ({query})').fetchone()[0]
+
+
+def apply_staged_positions(conn, category_id: int) -> int:
+    """Перенос позиций из временной таблицы в категорию одним INSERT … SELECT.
+
+    При повторе sku в файле побеждает последняя строка. Временная таблица удаляется.
+    Возвращает число записанных строк. Коммит остается за вызывающим кодом.
+    """
+    # WHERE true нужен SQLite, чтобы отличить ON CONFLICT upsert от условия JOIN
+    changed = conn.execute(f'''
+        INSERT INTO product_categories (sku, category_id, position)
+        SELECT sku, ?, position FROM {STAGING_TABLE} WHERE true ORDER BY line
+        ON CONFLICT (sku, category_id) DO UPDATE SET position = excluded.position
+    ''', (category_id,)).rowcount
+    conn.execute(f'DROP TABLE {STAGING_TABLE}')
+    return changed
@@ -1,7 +1,19 @@
 from app.database.connection import get_db_connection
-from typing import Dict, List, Any
+from app.services.catalog_snapshot import get_catalog_snapshot, thumbnail_id
+from app.services.category_order_service import category_order_version_name
+from app.services.category_weights_service import get_current_season
+from app.utils.csv_stream import csv_chunks, zip_chunks
+from app.utils.lru_cache import TTLCache
+from app.utils.validation import ProductFilters
+from typing import Dict, Iterator, List, Any, Optional
 import json
 
+# Колонки CSV-выгрузки категории
+EXPORT_HEADER = ['sku', 'category_id', 'position']
+
+# Готовые JSON-ответы порядка категорий: ключ (данные снимка, категория, фильтр цены, id весов, сезон)
+_ordering_cache = TTLCache(maxsize=128, ttl=300.0)
+
 def get_all_categories():
     """Получение всех уникальных категорий из feed_categories"""
     with get_db_connection() as conn:
@@ -88,4 +100,83 @@ def reset_category_order(category_id: str):
 def export_category_data(category_id: str):
     """Экспорт данных категории в JSON формат"""
     products = get_category_products(category_id)
-    return json.dumps(products, ensure_ascii=False) 
\ No newline at end of file
+    return json.dumps(products, ensure_ascii=False) 
+
+def get_category_ordering(category_id: int, hide_no_price: bool = True) -> str:
+    """Порядок всех товаров категории для экрана сортировки — готовый JSON.
+
+    Возвращаются только sku, скор, ручная позиция и id миниатюры, по массиву на поле
+    (в порядке выдачи). Ответ кэшируется по версии данных и весов целиком,
+    вместе с сериализацией. Ссылка на миниатюру: thumbnail_template с подставленным {id}.
+    """
+    snapshot, weights = get_catalog_snapshot()
+    weights_id = weights['id'] if weights else None
+    key = (snapshot.key, category_id, hide_no_price, weights_id, get_current_season())
+    body = _ordering_cache.get(key)
+    if body is not None:
+        return body
+
+    listing = snapshot.ordered_listing(
+        ProductFilters(category=str(category_id), hide_no_price=hide_no_price), weights
+    )
+    rows = listing.rows.tolist()
+    thumbnails = snapshot.thumbnail_ids
+    template = None
+    for row in rows:
+        image_url = snapshot.column('image_url', row)
+        if image_url:
+            template = image_url.replace(thumbnail_id(image_url), '{id}', 1)
+            break
+    body = json.dumps({
+        'category_id': category_id,
+        # Версия порядка категории из ключа снимка (для параметра version в /api/category_order_ops)
+        'version': dict(snapshot.key[1]).get(category_order_version_name(category_id), 0),
+        'weights_id': weights_id,
+        'total': len(rows),
+        'thumbnail_template': template,
+        'skus': [snapshot.skus[row] for row in rows],
+        'scores': listing.scores.tolist(),
+        'positions': listing.raw_positions or [None] * len(rows),
+        'thumbnails': [thumbnails[row] for row in rows]
+    }, ensure_ascii=False, separators=(',', ':'))
+    _ordering_cache.put(key, body)
+    return body
+
+
+def get_export_category(category_id: int) -> Optional[Dict[str, Any]]:
+    """Активная категория для выгрузки (id и name) или None"""
+    with get_db_connection() as conn:
+        row = conn.execute(
+            'SELECT id, name FROM feed_categories WHERE id = ? AND is_active = 1', (category_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+def _export_rows(conn, category_id: int):
+    """Строки выгрузки категории прямо из курсора: сначала ручные позиции, затем остальные"""
+    cursor = conn.execute("""
+        SELECT pc.sku, pc.category_id, pc.position
+        FROM product_categories pc
+        JOIN products p ON p.sku = pc.sku
+        WHERE pc.category_id = ?
+        ORDER BY pc.position IS NULL, pc.position
+    """, (category_id,))
+    for sku, row_category_id, position in cursor:
+        yield sku, row_category_id, position if position is not None else ''
+
+def export_category_csv(category_id: int) -> Iterator[bytes]:
+    """CSV-выгрузка категории (sku, category_id, position) по кускам, без сборки файла в памяти"""
+    with get_db_connection() as conn:
+        yield from csv_chunks(EXPORT_HEADER, _export_rows(conn, category_id))
+
+def export_all_categories_zip() -> Iterator[bytes]:
+    """ZIP-архив с CSV-выгрузками всех активных категорий, отдается по мере формирования"""
+    with get_db_connection() as conn:
+        categories = conn.execute(
+            'SELECT id, name FROM feed_categories WHERE is_active = 1 ORDER BY id'
+        ).fetchall()
+        files = (
+            (f"category_{category['id']}_{category['name'].replace('/', '_')}.csv",
+             csv_chunks(EXPORT_HEADER, _export_rows(conn, category['id'])))
+            for category in categories
+        )
+        yield from zip_chunks(files)
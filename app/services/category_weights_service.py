@@ -0,0 +1,111 @@
+import threading
+from datetime import date
+from typing import Any, Dict, Optional, Tuple
+
+from app.database.connection import get_db_connection
+from app.database.versions import get_version, bump_version, database_file
+from app.services.scoring_engine import CompiledScorer, WEIGHT_FIELDS, weights_vector
+from config import SEASONAL_MULTIPLIERS, DISCOUNT_MULTIPLIERS
+
+CATEGORY_WEIGHTS_VERSION = 'category_weights'
+PROFILE_WEIGHT_FIELDS = WEIGHT_FIELDS + ('discount_penalty', 'sale_start_weight')
+
+# Скомпилированные скореры категорий: ключ (файл БД, категория, id весов, версия профилей, сезон)
+_compiled_lock = threading.Lock()
+_compiled_scorers: Dict[Tuple, Optional[CompiledScorer]] = {}
+MAX_COMPILED_SCORERS = 1024
+
+
+def _invalidate_snapshot() -> None:
+    """Сброс проверки снимка каталога: профили весов входят в снимок"""
+    from app.services.catalog_snapshot import invalidate_catalog_snapshot
+    invalidate_catalog_snapshot()
+
+
+def get_current_season(today: Optional[date] = None) -> str:
+    """Сезон (ключ SEASONAL_MULTIPLIERS) по текущему месяцу"""
+    month = (today or date.today()).month
+    if month in (12, 1, 2):
+        return 'winter'
+    if month in (3, 4, 5):
+        return 'spring'
+    if month in (6, 7, 8):
+        return 'summer'
+    return 'autumn'
+
+
+def get_category_profile(category_id: int) -> Optional[Dict[str, Any]]:
+    """Профиль весов категории (None, если категория использует общие веса)"""
+    with get_db_connection() as conn:
+        row = conn.execute(
+            'SELECT * FROM category_weight_profiles WHERE category_id = ?',
+            (category_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+
+def save_category_profile(category_id: int, profile: Dict[str, Any]) -> Tuple[bool, str]:
+    """Создание или обновление профиля весов категории"""
+    category_group = profile.get('category_group')
+    discount_type = profile.get('discount_type', 'regular')
+    category_groups = sorted({group for multipliers in SEASONAL_MULTIPLIERS.values() for group in multipliers})
+    if category_group is not None and category_group not in category_groups:
+        return False, f"category_group должен быть одним из {category_groups}"
+    if discount_type not in DISCOUNT_MULTIPLIERS:
+        return False, f"discount_type должен быть одним из {list(DISCOUNT_MULTIPLIERS)}"
+    try:
+        with get_db_connection() as conn:
+            columns = ('category_id',) + PROFILE_WEIGHT_FIELDS + ('category_group', 'discount_type')
+            values = [category_id] + [profile.get(field) for field in PROFILE_WEIGHT_FIELDS] + [category_group, discount_type]
+            conn.execute(f'''
+                INSERT OR REPLACE INTO category_weight_profiles ({', '.join(columns)})
+                VALUES ({', '.join('?' * len(columns))})
+            ''', values)
+            bump_version(conn, CATEGORY_WEIGHTS_VERSION)
+            conn.commit()
+            _invalidate_snapshot()
+            return True, "Профиль весов категории сохранен"
+    except Exception as e:
+        return False, f"Ошибка при сохранении профиля весов: {str(e)}"
+
+
+def delete_category_profile(category_id: int) -> Tuple[bool, str]:
+    """Удаление профиля: категория снова использует общие веса"""
+    with get_db_connection() as conn:
+        conn.execute('DELETE FROM category_weight_profiles WHERE category_id = ?', (category_id,))
+        bump_version(conn, CATEGORY_WEIGHTS_VERSION)
+        conn.commit()
+        _invalidate_snapshot()
+        return True, "Профиль весов категории удален"
+
+
+def compile_category_scorer(profile: Dict[str, Any], weights: Dict[str, Any], season: str) -> CompiledScorer:
+    """Сборка вектора весов категории (поля профиля с NULL берутся из общих весов) и множителей"""
+    merged = dict(weights)
+    for field in PROFILE_WEIGHT_FIELDS:
+        if profile.get(field) is not None:
+            merged[field] = profile[field]
+    # Множитель скидки усиливает штраф за скидку, сезонный — масштабирует итоговый скор
+    merged['discount_penalty'] = (merged.get('discount_penalty') or 0.0) * \
+        DISCOUNT_MULTIPLIERS.get(profile.get('discount_type') or 'regular', 1.0)
+    multiplier = SEASONAL_MULTIPLIERS.get(season, {}).get(profile.get('category_group'), 1.0)
+    return CompiledScorer(weights_vector(merged), multiplier)
+
+
+def get_category_scorer(conn, category_id: int, weights: Dict[str, Any]) -> Optional[CompiledScorer]:
+    """Скомпилированный скорер категории из кэша (None — у категории нет своего профиля)"""
+    season = get_current_season()
+    key = (database_file(conn), category_id, weights['id'], get_version(conn, CATEGORY_WEIGHTS_VERSION), season)
+    with _compiled_lock:
+        if key in _compiled_scorers:
+            return _compiled_scorers[key]
+    row = conn.execute(
+        'SELECT * FROM category_weight_profiles WHERE category_id = ?',
+        (category_id,)
+    ).fetchone()
+    scorer = compile_category_scorer(dict(row), weights, season) if row else None
+    with _compiled_lock:
+        if len(_compiled_scorers) >= MAX_COMPILED_SCORERS:
+            _compiled_scorers.clear()
+        _compiled_scorers[key] = scorer
+    return scorer
@@ -1,9 +1,29 @@
 from app.database.connection import get_db_connection
 from app.utils.query_builder import QueryBuilder
 from app.utils.validation import ProductFilters
-from typing import List, Dict, Any
+from app.services.score_table_service import ensure_product_scores
+from app.services.category_weights_service import get_category_scorer
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.search_service import find_search_skus
+from app.utils.top_k import top_k_indices
+from app.utils.keyset import ListingCursor, after_cursor_mask, decode_cursor, encode_cursor
+from typing import Any, Dict, Iterator, List, Tuple
+import copy
 import json
-from datetime import datetime
+import os
+import numpy as np
+
+# Максимум параметров в одном IN (...) — с запасом до SQLITE_MAX_VARIABLE_NUMBER
+SQL_IN_CHUNK = 500
+
+# Списки товаров отдаются из колоночного снимка каталога в памяти; CATALOG_SNAPSHOT=0 — напрямую из SQLite
+CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT', '1') != '0'
+
+# Компактный кодировщик для потоковых ответов (без проверки циклов и лишних пробелов)
+STREAM_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+
+# Поля ответа, которые вычисляются из колонок products
+DERIVED_FIELD_SOURCES = {'has_image': 'image_url', 'category': 'categories'}
 
 def calculate_score(product, weights):
     """Расчет скоринга для продукта: все веса (кроме штрафа и бонуса) — множители абсолютных метрик"""
@@ -29,139 +49,299 @@ def calculate_score(product, weights):
     score -= discount * discount_penalty if discount_penalty > 0 else 0
     return score
 
+def _get_category_page_with_profile(conn, from_clause, where_clause, params, filters, category_scorer, offset, after=None):
+    """Страница категории с собственным профилем весов.
+
+    Из SQLite читаются только sku и позиции категории, скор считается по матрице вкладов
+    из снимка каталога, полные строки товаров выбираются только для текущей страницы.
+    """
+    members = conn.execute(f"""
+        SELECT p.sku, pc.position
+        FROM {from_clause}
+        WHERE {where_clause}
+        ORDER BY p.sku
+    """, params).fetchall()
+    skus = [row['sku'] for row in members]
+    snapshot, _ = get_catalog_snapshot()
+    scores = category_scorer.score(snapshot.contribution_rows(skus))
+    positions = np.array(
+        [np.nan if row['position'] is None else row['position'] for row in members],
+        dtype=np.float64
+    )
+    if after is not None:
+        later_sku = np.fromiter((sku > after.sku for sku in skus), dtype=bool, count=len(skus))
+        candidates = np.flatnonzero(after_cursor_mask(positions, scores, later_sku, after))
+    else:
+        candidates = np.arange(len(skus))
+    end = offset + filters.per_page
+    
+    # Сначала ручные позиции (при равной позиции — по скору), затем top-K остальных по скору;
+    # при равенстве — по sku. Полностью сортируются только закрепленные товары.
+    pinned_rows = candidates[~np.isnan(positions[candidates])]
+    pinned_order = pinned_rows[np.lexsort((pinned_rows, -scores[pinned_rows], positions[pinned_rows]))]
+    unpinned_rows = candidates[np.isnan(positions[candidates])]
+    unpinned_order = unpinned_rows[top_k_indices(scores[unpinned_rows], end - len(pinned_order))]
+    page = np.concatenate([pinned_order, unpinned_order])[offset:end].tolist()
+    has_more = offset + len(page) < len(candidates)
+    
+    page_skus = [skus[i] for i in page]
+    rows_by_sku = {}
+    for start in range(0, len(page_skus), SQL_IN_CHUNK):
+        chunk = page_skus[start:start + SQL_IN_CHUNK]
+        for row in conn.execute(f"""
+            SELECT p.*, pc.position
+            FROM products p
+            LEFT JOIN product_categories pc ON p.sku = pc.sku AND pc.category_id = ?
+            WHERE p.sku IN ({', '.join('?' * len(chunk))})
+        """, [filters.category] + chunk).fetchall():
+            rows_by_sku[row['sku']] = dict(row)
+    
+    rows = []
+    for i in page:
+        row = rows_by_sku.get(skus[i])
+        if row is not None:
+            row['score'] = float(scores[i])
+            rows.append(row)
+    return rows, len(members), has_more
+
+def _to_api_product(row) -> Dict[str, Any]:
+    """Строка листинга в формате ответа API"""
+    product = dict(row)
+    product['score'] = product['score'] or 0.0
+    product['has_image'] = bool(product.get('image_url'))
+    if 'categories' in product:
+        product['category'] = product['categories']
+        product['categories'] = [product['categories']]
+    return product
+
+def _list_products(filters: ProductFilters) -> Tuple[Dict[str, Any], Iterator[Dict[str, Any]]]:
+    """Метаданные страницы (total, курсор и т.д.) и ленивый итератор товаров страницы"""
+    after = decode_cursor(filters.cursor) if filters.cursor else None
+    columns = None
+    if filters.fields:
+        # Колонки products, нужные для запрошенных полей, и sku для курсора
+        columns = {'sku'}.union(filters.fields, (DERIVED_FIELD_SOURCES[field] for field in filters.fields
+                                                 if field in DERIVED_FIELD_SOURCES))
+    if CATALOG_SNAPSHOT_ENABLED:
+        snapshot, weights = get_catalog_snapshot()
+        rows, total, has_more, last_key = snapshot.query(filters, weights, after, columns)
+    else:
+        rows, total, has_more = _query_products_db(filters, after)
+        last_key = None
+        if rows:
+            last = rows[-1]
+            last_key = ListingCursor(last.get('position'), last['score'] or 0.0, last['sku'])
+    
+    meta = {
+        'total': total,
+        'page': filters.page,
+        'per_page': filters.per_page,
+        'total_pages': (total + filters.per_page - 1) // filters.per_page,
+        # Курсор следующей страницы — ключ сортировки последнего отданного товара
+        'next_cursor': encode_cursor(last_key) if has_more and last_key else None
+    }
+    products = (_to_api_product(row) for row in rows)
+    if filters.fields:
+        products = ({field: product.get(field) for field in filters.fields} for product in products)
+    return meta, products
+
 def get_products(filters: ProductFilters) -> Dict[str, Any]:
-    """Получение списка продуктов с пагинацией и фильтрацией"""
+    """Получение списка продуктов с пагинацией и фильтрацией.
+
+    filters.fields ограничивает набор полей товара, filters.response_format='columnar'
+    возвращает вместо массива объектов по одному массиву значений на поле.
+    """
+    result, products = _list_products(filters)
+    products = list(products)
+    if filters.response_format == 'columnar':
+        fields = filters.fields or (list(products[0]) if products else [])
+        result['fields'] = fields
+        result['columns'] = {field: [product.get(field) for product in products] for field in fields}
+    else:
+        result['products'] = products
+    return result
+
+def stream_products(filters: ProductFilters) -> Tuple[Dict[str, Any], Iterator[str]]:
+    """Потоковая выдача страницы: метаданные и генератор фрагментов ответа.
+
+    format=ndjson — по одному товару в строке (метаданные передаются в заголовках),
+    format=json-stream — тот же документ, что и обычный ответ, с массивом products,
+    который кодируется по одному товару. Товары создаются и кодируются по мере отправки.
+    """
+    meta, products = _list_products(filters)
+    encode = STREAM_ENCODER.encode
+    
+    def ndjson():
+        for product in products:
+            yield encode(product) + '\n'
+    
+    def json_array():
+        yield encode(meta)[:-1] + ',"products":['
+        for i, product in enumerate(products):
+            yield (',' if i else '') + encode(product)
+        yield ']}'
+    
+    return meta, ndjson() if filters.response_format == 'ndjson' else json_array()
+
+def _query_products_db(filters: ProductFilters, after=None):
+    """Страница товаров, общее количество и признак следующей страницы — запросами к SQLite"""
     query_builder = QueryBuilder()
-    join_product_categories = False
     
     # Применяем фильтры
-    if filters.category != 'all':
-        join_product_categories = True
-        query_builder.add_condition("pc.category_id = ?", filters.category)
-    
     if filters.hide_no_price:
         query_builder.add_condition("p.price > 0")
     
     if filters.gender != 'all':
         query_builder.add_condition("p.gender = ?", filters.gender)
     
-    if filters.search:
-        search_term = f"%{filters.search}%"
-        query_builder.add_condition("(p.name LIKE ? OR p.sku LIKE ?)", search_term)
-        query_builder.add_condition("(p.name LIKE ? OR p.sku LIKE ?)", search_term)
-    
     if filters.sku:
         query_builder.add_condition("p.sku = ?", filters.sku)
     
-    where_clause, params = query_builder.build()
-    
     with get_db_connection() as conn:
+        # Поиск по FTS5-индексу: список найденных sku передается одним JSON-параметром
+        if filters.search:
+            query_builder.add_condition(
+                "p.sku IN (SELECT value FROM json_each(?))",
+                json.dumps(find_search_skus(conn, filters.search), ensure_ascii=False)
+            )
+        where_clause, params = query_builder.build()
+        
         cursor = conn.cursor()
-        # Формируем FROM и JOIN
-        from_clause = "products p"
-        if join_product_categories:
-            from_clause += " JOIN product_categories pc ON p.sku = pc.sku"
+        # Формируем FROM и JOIN: товары категории и всех ее подкатегорий — одним проходом
+        # по таблице замыкания; ручная позиция берется только из связи с самой категорией
+        from_clause, from_params = "products p", []
+        if filters.category != 'all':
+            from_clause += """
+                JOIN (
+                    SELECT sub.sku, MIN(CASE WHEN cc.depth = 0 THEN sub.position END) AS position
+                    FROM category_closure cc
+                    JOIN product_categories sub ON sub.category_id = cc.descendant_id
+                    WHERE cc.ancestor_id = ?
+                    GROUP BY sub.sku
+                ) pc ON pc.sku = p.sku"""
+            from_params.append(filters.category)
         
-        # Получаем общее количество товаров для пагинации
-        count_query = f"""
-        SELECT COUNT(DISTINCT p.sku) as total
-        FROM {from_clause}
-        WHERE {where_clause}
-        """
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()['total']
+        # Скор берется из материализованной таблицы product_scores для последних весов
+        weights = ensure_product_scores(conn)
+        weights_id = weights['id'] if weights else None
         
-        # Получаем текущие веса
-        cursor.execute("SELECT * FROM weights ORDER BY id DESC LIMIT 1")
-        weights = cursor.fetchone()
-        weights_dict = dict(weights)
+        # Расчет пагинации: с курсором страница начинается сразу после него
+        offset = (filters.page - 1) * filters.per_page if after is None else 0
         
-        # Расчет пагинации
-        offset = (filters.page - 1) * filters.per_page
+        # У категории может быть собственный профиль весов — тогда скор считается скомпилированным скорером
+        category_scorer = None
+        if filters.category != 'all' and weights and str(filters.category).isdigit():
+            category_scorer = get_category_scorer(conn, int(filters.category), weights)
+        if category_scorer is not None:
+            return _get_category_page_with_profile(
+                conn, from_clause, where_clause, from_params + params, filters, category_scorer, offset, after
+            )
         
-        # Получаем продукты с учетом пагинации
+        # Один запрос: страница, общее количество (COUNT(*) OVER () до условия курсора)
+        # и порядок — сначала ручные позиции, затем по скору
         if filters.category != 'all':
-            # Получаем все товары категории без сортировки и лимита
-            products_query = f"""
-                SELECT p.*, pc.position
-                FROM {from_clause}
-                WHERE {where_clause}
-            """
-            cursor.execute(products_query, params)
-            rows = cursor.fetchall()
+            select_clause = "p.*, pc.position, ps.score"
+            order_clause = "position IS NULL, position, score_rank"
         else:
-            products_query = f"""
-                SELECT p.*
+            select_clause = "p.*, ps.score"
+            order_clause = "score_rank"
+        after_where, after_params = "1=1", []
+        if after is not None:
+            # Порядок по score_rank совпадает с (скор по убыванию, sku)
+            after_score = "(score < ? OR (score = ? AND sku > ?))"
+            if filters.category == 'all':
+                after_where = after_score
+            elif after.position is None:
+                after_where = f"position IS NULL AND {after_score}"
+            else:
+                after_where = f"(position IS NULL OR position > ? OR (position = ? AND {after_score}))"
+                after_params = [after.position, after.position]
+            after_params += [after.score, after.score, after.sku]
+        products_query = f"""
+            SELECT * FROM (
+                SELECT {select_clause}, ps.score_rank AS score_rank, COUNT(*) OVER () AS total_count
                 FROM {from_clause}
+                LEFT JOIN product_scores ps ON ps.sku = p.sku AND ps.weights_id = ?
                 WHERE {where_clause}
-            """
-            cursor.execute(products_query, params)
-            rows = cursor.fetchall()
-        
-        # Собираем все уникальные даты старта
-        sale_dates = set()
-        for row in rows:
-            date_str = row['sale_start_date']
-            if date_str and date_str != '':
-                try:
-                    date_obj = datetime.strptime(date_str, "%d.%m.%Y")
-                except ValueError:
-                    try:
-                        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                    except Exception:
-                        continue
-                sale_dates.add(date_obj)
-        if not sale_dates:
-            sale_dates = {datetime(2000, 1, 1)}
-        sale_dates_sorted = sorted(sale_dates)
-        date_to_index = {d: i for i, d in enumerate(sale_dates_sorted)}
-        n = len(sale_dates_sorted)
-        sale_start_weight = weights_dict.get('sale_start_weight', 1.0)
-        def novelty_bonus(date_str):
-            if not date_str or date_str == '':
-                return sale_start_weight
-            try:
-                date_obj = datetime.strptime(date_str, "%d.%m.%Y")
-            except ValueError:
-                try:
-                    date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                except Exception:
-                    return sale_start_weight
-            idx = date_to_index.get(date_obj)
-            if idx is None:
-                return sale_start_weight
-            return sale_start_weight * (idx + 1)
-        
-        products = []
-        for row in rows:
+            ) AS listing
+            WHERE {after_where}
+            ORDER BY {order_clause}
+            LIMIT ? OFFSET ?
+        """
+        # Строки страницы читаются прямо из курсора; лишняя строка показывает, есть ли следующая страница
+        cursor.execute(products_query, from_params + [weights_id] + params + after_params + [filters.per_page + 1, offset])
+        rows, total, has_more = [], None, False
+        for row in cursor:
+            total = row['total_count']
+            if len(rows) == filters.per_page:
+                has_more = True
+                break
             product = dict(row)
-            product['score'] = calculate_score(product, weights)
-            product['has_image'] = bool(product.get('image_url'))
-            if 'categories' in product:
-                product['category'] = product['categories']
-                product['categories'] = [product['categories']]
-            # Бонус за новизну теперь умножается на sale_start_weight
-            product['score'] += novelty_bonus(product.get('sale_start_date'))
-            products.append(product)
+            del product['score_rank'], product['total_count']
+            rows.append(product)
         
-        # Сортировка и пагинация как раньше
-        if filters.category != 'all':
-            products.sort(key=lambda x: (
-                1 if x.get('position') is None else 0,
-                x.get('position') if x.get('position') is not None else 999999,
-                -x['score']
-            ))
-            total = len(products)
-            products = products[offset:offset + filters.per_page]
-        else:
-            products.sort(key=lambda x: -x['score'])
-            total = len(products)
-            products = products[offset:offset + filters.per_page]
+        if total is None:
+            # Пустая страница (за концом списка) — количество считается отдельно
+            cursor.execute(f"SELECT COUNT(*) FROM {from_clause} WHERE {where_clause}", from_params + params)
+            total = cursor.fetchone()[0]
         
-        return {
-            'products': products,
-            'total': total,
-            'page': filters.page,
-            'per_page': filters.per_page,
-            'total_pages': (total + filters.per_page - 1) // filters.per_page
-        } 
\ No newline at end of file
+        return rows, total, has_more
+
+def get_facets(filters: ProductFilters) -> Dict[str, Any]:
+    """Количество товаров по значениям фильтров для текущего набора фильтров.
+
+    Счет идет пересечениями битовых карт снимка. Для каждого фасета его собственный фильтр
+    не применяется (сколько товаров будет, если выбрать другое значение). Количество
+    в категории включает товары ее подкатегорий.
+    """
+    snapshot, _ = get_catalog_snapshot()
+    
+    def without(**changes):
+        facet_filters = copy.copy(filters)
+        for name, value in changes.items():
+            setattr(facet_filters, name, value)
+        return snapshot.filter_bitmap(facet_filters)
+    
+    gender_base = without(gender='all')
+    price_base = without(hide_no_price=False)
+    category_base = without(category='all')
+    has_price = (price_base & snapshot.price_bitmap).count()
+    
+    categories = []
+    for category_id, bitmap in sorted(snapshot.subtree_bitmaps.items()):
+        category = snapshot.category_tree.get(category_id)
+        count = (category_base & bitmap).count()
+        if category is not None and count:
+            categories.append({
+                'id': category_id,
+                'name': category['name'],
+                'parent_id': category['parent_id'],
+                'count': count
+            })
+    
+    return {
+        'total': snapshot.count(filters),
+        'gender': {gender: (gender_base & bitmap).count() for gender, bitmap in snapshot.gender_bitmaps.items()},
+        'price': {'has_price': has_price, 'no_price': price_base.count() - has_price},
+        'categories': categories
+    }
+
+def autocomplete_skus(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Подсказки по началу артикула: базовые артикулы с префиксом и их цветовые варианты"""
+    snapshot, _ = get_catalog_snapshot()
+    items = []
+    for group in snapshot.sku_index.autocomplete(query, limit, snapshot.skus):
+        variants = [{
+            'sku': snapshot.skus[row],
+            'name': snapshot.column('name', row),
+            'image_url': snapshot.column('image_url', row),
+            'price': snapshot.column('price', row)
+        } for row in group['rows']]
+        with_image = next((variant for variant in variants if variant['image_url']), variants[0])
+        items.append({
+            'article': group['article'],
+            'name': variants[0]['name'],
+            'image_url': with_image['image_url'],
+            'variants': variants
+        })
+    return items
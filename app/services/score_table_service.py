@@ -0,0 +1,104 @@
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from app.services.scoring_engine import (
+    ScoringEngine,
+    METRIC_FIELDS,
+    NO_SALE_DAY,
+    dense_novelty_ranks,
+    parse_sale_start_day,
+    weights_vector
+)
+
+CATALOG_COLUMNS = ('sku', 'discount', 'sale_start_day', 'novelty_rank') + METRIC_FIELDS
+
+
+def _fetch_dicts(cursor, query: str, params=()) -> List[Dict[str, Any]]:
+    """Выборка строк в виде словарей независимо от row_factory соединения"""
+    cursor.execute(query, params)
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def refresh_sale_start_days(conn, parse_dates: bool = True) -> None:
+    """Нормализация дат старта продаж в sale_start_day и пересчет плотного ранга novelty_rank.
+
+    parse_dates=False пересчитывает только ранги по уже заполненной sale_start_day
+    (импорт пишет номер дня сразу при вставке товара). Коммит остается за вызывающим кодом.
+    """
+    cursor = conn.cursor()
+    if parse_dates:
+        cursor.execute("SELECT sku, sale_start_date FROM products")
+        days = [(parse_sale_start_day(sale_start_date), sku) for sku, sale_start_date in cursor.fetchall()]
+        cursor.executemany(
+            "UPDATE products SET sale_start_day = ? WHERE sku = ?",
+            [(None if day == NO_SALE_DAY else day, sku) for day, sku in days]
+        )
+
+    cursor.execute("SELECT sku, sale_start_day FROM products")
+    rows = cursor.fetchall()
+    sale_days = np.fromiter(
+        (NO_SALE_DAY if day is None else day for _, day in rows),
+        dtype=np.int64,
+        count=len(rows)
+    )
+    ranks = dense_novelty_ranks(sale_days).tolist()
+    cursor.executemany(
+        "UPDATE products SET novelty_rank = ? WHERE sku = ?",
+        [(rank or None, sku) for (sku, _), rank in zip(rows, ranks)]
+    )
+
+
+def get_latest_weights(conn) -> Optional[Dict[str, Any]]:
+    """Последняя строка весов в виде словаря"""
+    rows = _fetch_dicts(conn.cursor(), "SELECT * FROM weights ORDER BY id DESC LIMIT 1")
+    return rows[0] if rows else None
+
+
+def rebuild_product_scores(conn, weights: Optional[Dict[str, Any]] = None, snapshot=None) -> int:
+    """Полный пересчет таблицы product_scores для последних (или переданных) весов.
+
+    snapshot — снимок каталога процесса, построенный по тем же данным, что видит conn:
+    скор берется из его матрицы вкладов (инкрементально при смене одного веса). Без снимка
+    (импорт, другая БД) товары читаются через conn. Ранг — глобальный (1 — лучший товар,
+    при равном скоре порядок по sku). Строки других версий весов удаляются.
+    Коммит остается за вызывающим кодом.
+    """
+    cursor = conn.cursor()
+    if weights is None:
+        weights = get_latest_weights(conn)
+    if not weights:
+        return 0
+
+    if snapshot is not None:
+        skus, scores = snapshot.skus, snapshot.scores(weights)
+    else:
+        products = _fetch_dicts(conn.cursor(), f"SELECT {', '.join(CATALOG_COLUMNS)} FROM products ORDER BY sku")
+        skus = [product['sku'] for product in products]
+        scores = ScoringEngine.from_products(products, stored_novelty=True).contribution_matrix() @ weights_vector(weights)
+    ranks = np.empty(len(skus), dtype=np.int64)
+    ranks[np.argsort(-scores, kind='stable')] = np.arange(1, len(skus) + 1)
+
+    cursor.execute("DELETE FROM product_scores")
+    cursor.executemany(
+        "INSERT INTO product_scores (sku, weights_id, score, score_rank) VALUES (?, ?, ?, ?)",
+        zip(skus, [weights['id']] * len(skus), scores.tolist(), ranks.tolist())
+    )
+    return len(skus)
+
+
+def ensure_product_scores(conn) -> Optional[Dict[str, Any]]:
+    """Гарантирует, что product_scores посчитана для последних весов; возвращает эти веса.
+
+    Таблица пересчитывается лениво, если веса были изменены в обход weights_service
+    (например, через старый app.py).
+    """
+    weights = get_latest_weights(conn)
+    if not weights:
+        return None
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM product_scores WHERE weights_id = ? LIMIT 1", (weights['id'],))
+    if cursor.fetchone() is None:
+        rebuild_product_scores(conn, weights)
+        conn.commit()
+    return weights
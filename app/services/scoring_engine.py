@@ -0,0 +1,179 @@
+import numpy as np
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, List, Mapping, Optional
+
+# Метрики и соответствующие им веса (порядок совпадает с колонками матрицы вкладов и weights_vector)
+METRIC_FIELDS = (
+    'sessions',
+    'product_views',
+    'cart_additions',
+    'checkout_starts',
+    'orders_gross',
+    'orders_net',
+)
+WEIGHT_FIELDS = (
+    'sessions_weight',
+    'views_weight',
+    'cart_weight',
+    'checkout_weight',
+    'orders_gross_weight',
+    'orders_net_weight',
+)
+SALE_DATE_FORMATS = ('%d.%m.%Y', '%Y-%m-%d')
+
+# Значение для товаров без распознанной даты старта продаж
+NO_SALE_DAY = -1
+
+
+@lru_cache(maxsize=4096)
+def parse_sale_start_day(value: Optional[str]) -> int:
+    """Перевод даты старта продаж в номер дня (date.toordinal), NO_SALE_DAY если дата не распознана"""
+    if not value or not isinstance(value, str):
+        return NO_SALE_DAY
+    for date_format in SALE_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).toordinal()
+        except ValueError:
+            continue
+    return NO_SALE_DAY
+
+
+def weights_vector(weights: Mapping[str, Any]) -> np.ndarray:
+    """Вектор весов в порядке колонок ScoringEngine.contribution_matrix"""
+    weights_dict = dict(weights) if weights else {}
+    discount_penalty = weights_dict.get('discount_penalty', 0.0)
+    return np.array(
+        [weights_dict.get(field, 1.0) for field in WEIGHT_FIELDS]
+        + [discount_penalty if discount_penalty > 0 else 0.0, weights_dict.get('sale_start_weight', 1.0)],
+        dtype=np.float64
+    )
+
+
+def _numeric_column(products: List[Mapping[str, Any]], field: str) -> np.ndarray:
+    return np.fromiter(
+        (product.get(field) or 0 for product in products),
+        dtype=np.float64,
+        count=len(products)
+    )
+
+
+def _sale_day_column(products: List[Mapping[str, Any]]) -> np.ndarray:
+    """Номера дней старта продаж: из нормализованной колонки sale_start_day, если она выбрана, иначе разбором строки"""
+    if products and 'sale_start_day' in products[0]:
+        days = (product['sale_start_day'] for product in products)
+        return np.fromiter(
+            (NO_SALE_DAY if day is None else day for day in days),
+            dtype=np.int64,
+            count=len(products)
+        )
+    return np.fromiter(
+        (parse_sale_start_day(product.get('sale_start_date')) for product in products),
+        dtype=np.int64,
+        count=len(products)
+    )
+
+
+def dense_novelty_ranks(sale_days: np.ndarray) -> np.ndarray:
+    """Плотный ранг даты старта продаж, начиная с 1 (0 для товаров без даты)"""
+    ranks = np.zeros(len(sale_days), dtype=np.int64)
+    has_date = sale_days != NO_SALE_DAY
+    if has_date.any():
+        _, dense_rank = np.unique(sale_days[has_date], return_inverse=True)
+        ranks[has_date] = dense_rank.ravel() + 1
+    return ranks
+
+
+class ScoringEngine:
+    """Колоночное представление метрик каталога для расчёта скоринга за один векторный проход.
+
+    Скор — произведение матрицы вкладов на вектор весов; от построчного calculate_score
+    (+ бонус за новизну) он может отличаться только порядком сложения, то есть в последних
+    битах мантиссы.
+    """
+
+    def __init__(self, metrics: np.ndarray, discount: np.ndarray, sale_days: np.ndarray,
+                 novelty_ranks: Optional[np.ndarray] = None):
+        self.metrics = metrics
+        self.discount = discount
+        self.sale_days = sale_days
+        self._novelty_ranks = None
+        if novelty_ranks is not None:
+            self._novelty_ranks = np.maximum(novelty_ranks, 1).astype(np.float64)
+
+    @classmethod
+    def from_products(cls, products: List[Mapping[str, Any]], stored_novelty: bool = False) -> 'ScoringEngine':
+        """Построение движка из списка словарей товаров (строк products).
+
+        stored_novelty=True берет ранг новизны из колонки novelty_rank, посчитанной при импорте;
+        это корректно только когда products — весь каталог.
+        """
+        metrics = np.column_stack([_numeric_column(products, field) for field in METRIC_FIELDS]) \
+            if products else np.zeros((0, len(METRIC_FIELDS)))
+        discount = _numeric_column(products, 'discount')
+        sale_days = _sale_day_column(products)
+        novelty_ranks = _numeric_column(products, 'novelty_rank') if stored_novelty else None
+        return cls(metrics, discount, sale_days, novelty_ranks)
+
+    def __len__(self) -> int:
+        return len(self.discount)
+
+    def novelty_ranks(self) -> np.ndarray:
+        """Множитель бонуса за новизну: плотный ранг даты старта + 1 (1 для товаров без даты)"""
+        if self._novelty_ranks is None:
+            self._novelty_ranks = np.maximum(dense_novelty_ranks(self.sale_days), 1).astype(np.float64)
+        return self._novelty_ranks
+
+    def contribution_matrix(self) -> np.ndarray:
+        """Матрица вкладов (метрики, -скидка, ранг новизны): скор = contribution_matrix() @ weights_vector(weights)"""
+        return np.asfortranarray(np.column_stack([self.metrics, -self.discount, self.novelty_ranks()]))
+
+
+class CompiledScorer:
+    """Скомпилированный скорер: вектор весов и множитель итогового скора"""
+
+    def __init__(self, vector: np.ndarray, multiplier: float = 1.0):
+        self.vector = vector
+        self.multiplier = multiplier
+
+    def score(self, contribution_rows: np.ndarray) -> np.ndarray:
+        """Скор для строк матрицы вкладов (ScoringEngine.contribution_matrix)"""
+        return (contribution_rows @ self.vector) * self.multiplier
+
+
+class IncrementalScorer:
+    """Скор каталога, пересчитываемый при смене весов без повторного чтения товаров.
+
+    Матрица вкладов держится в памяти: новые веса стоят одного умножения матрицы на вектор,
+    а если изменился ровно один вес — только score += Δw × колонка. Чтобы ошибка округления
+    не накапливалась, после MAX_DELTA_UPDATES дельт подряд делается полный пересчет.
+    """
+
+    MAX_DELTA_UPDATES = 32
+
+    def __init__(self, engine: ScoringEngine):
+        self.matrix = engine.contribution_matrix()
+        self.vector = None
+        self.scores = None
+        self.delta_updates = 0
+
+    def __len__(self) -> int:
+        return self.matrix.shape[0]
+
+    def score(self, weights: Mapping[str, Any]) -> np.ndarray:
+        """Скор всех товаров для весов; возвращаемый массив не изменяется последующими вызовами"""
+        vector = weights_vector(weights)
+        if self.vector is not None:
+            changed = np.flatnonzero(vector != self.vector)
+            if len(changed) == 0:
+                return self.scores
+            if len(changed) == 1 and self.delta_updates < self.MAX_DELTA_UPDATES:
+                column = changed[0]
+                self.scores = self.scores + (vector[column] - self.vector[column]) * self.matrix[:, column]
+                self.vector = vector
+                self.delta_updates += 1
+                return self.scores
+        self.scores = self.matrix @ vector
+        self.vector = vector
+        self.delta_updates = 0
+        return self.scores
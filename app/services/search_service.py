@@ -0,0 +1,64 @@
+import re
+from typing import List, Set
+
+from app.database.search_index import SEARCH_TABLE, TRIGRAM_TABLE, fold_yo
+
+# Нечеткий поиск: сколько кандидатов брать из триграммного индекса и какая доля
+# триграмм запроса должна встретиться в названии или sku
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_SIMILARITY = 0.3
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def _quote(term: str) -> str:
+    """Строка запроса как одна фраза FTS5 (кавычки внутри удваиваются)"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(text: str) -> Set[str]:
+    text = text.lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def prefix_query(search: str) -> str:
+    """FTS5-запрос: все слова поиска как префиксы ("плат" "бел" → "плат"* "бел"*)"""
+    return ' '.join(_quote(token) + '*' for token in _TOKEN_RE.findall(search))
+
+
+def find_search_skus(conn, search: str) -> List[str]:
+    """Sku товаров, подходящих под строку поиска.
+
+    Сначала точный поиск: слова как префиксы по name и sku плюс подстрока целиком
+    (триграммный индекс, как прежний LIKE '%...%'). Если ничего не нашлось — нечеткий
+    поиск по общим триграммам, чтобы находить товары при опечатках. «ё» в запросе
+    сводится к «е», как в индексе.
+    """
+    search = fold_yo(search.strip())
+    skus = set()
+    query = prefix_query(search)
+    if query:
+        skus.update(row[0] for row in conn.execute(
+            f'SELECT sku FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?', (query,)
+        ).fetchall())
+    if len(search) >= 3:
+        skus.update(row[0] for row in conn.execute(
+            f'SELECT sku FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH ?', (_quote(search),)
+        ).fetchall())
+    if skus:
+        return sorted(skus)
+
+    grams = _trigrams(search)
+    if not grams:
+        return []
+    candidates = conn.execute(f'''
+        SELECT sku, name FROM {TRIGRAM_TABLE}
+        WHERE {TRIGRAM_TABLE} MATCH ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (' OR '.join(_quote(gram) for gram in sorted(grams)), FUZZY_CANDIDATES)).fetchall()
+    return sorted(
+        sku for sku, name in candidates
+        if max(len(grams & _trigrams(sku or '')), len(grams & _trigrams(name or ''))) / len(grams)
+        >= FUZZY_MIN_SIMILARITY
+    )
@@ -0,0 +1,81 @@
+import numpy as np
+from typing import Any, Dict, List
+
+from app.services.catalog_snapshot import get_catalog_snapshot
+from app.services.scoring_engine import weights_vector
+from app.utils.validation import ValidationError
+
+MAX_CANDIDATES = 50
+MAX_TOP_K = 500
+
+
+def _ranks(scores: np.ndarray) -> np.ndarray:
+    """Ранги по колонкам (0 — лучший); при равном скоре порядок по sku, как в product_scores"""
+    order = np.argsort(-scores, axis=0, kind='stable')
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(scores.shape[0])[:, None], axis=0)
+    return ranks
+
+
+def simulate_weights(candidates: List[Dict[str, Any]], top_k: int = 20) -> Dict[str, Any]:
+    """Оценка набора вариантов весов на всем каталоге без записи в таблицу weights.
+
+    Все варианты считаются одним умножением матрицы вкладов на матрицу весов. Для каждого
+    варианта возвращаются top-K, смещение рангов относительно текущих весов и пересечение top-K.
+    Поля, которых нет в варианте, берутся из текущих весов.
+    """
+    if not isinstance(candidates, list) or not candidates:
+        raise ValidationError("candidates должен быть непустым списком вариантов весов")
+    if len(candidates) > MAX_CANDIDATES:
+        raise ValidationError(f"Не больше {MAX_CANDIDATES} вариантов за запрос")
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise ValidationError(f"top_k должен быть от 1 до {MAX_TOP_K}")
+
+    snapshot, current = get_catalog_snapshot()
+    current = current or {}
+    skus, matrix = snapshot.skus, snapshot.matrix
+
+    vectors = [weights_vector(current)]
+    for candidate in candidates:
+        if not isinstance(candidate, dict):
+            raise ValidationError("Каждый вариант весов должен быть объектом")
+        merged = dict(current)
+        for key, value in candidate.items():
+            try:
+                merged[key] = float(value)
+            except (ValueError, TypeError):
+                raise ValidationError(f"Значение {key} должно быть числом")
+        vectors.append(weights_vector(merged))
+
+    # Колонка 0 — текущие веса, дальше — варианты
+    scores = matrix @ np.column_stack(vectors)
+    ranks = _ranks(scores)
+    k = min(top_k, len(skus))
+    current_ranks = ranks[:, 0]
+    current_top = set(np.flatnonzero(current_ranks < k).tolist())
+
+    results = []
+    for column in range(1, scores.shape[1]):
+        candidate_ranks = ranks[:, column]
+        top = np.argsort(candidate_ranks)[:k]
+        displacement = np.abs(candidate_ranks - current_ranks)
+        results.append({
+            'weights': candidates[column - 1],
+            'top': [{
+                'sku': skus[row],
+                'score': float(scores[row, column]),
+                'rank': int(candidate_ranks[row]) + 1,
+                'current_rank': int(current_ranks[row]) + 1
+            } for row in top.tolist()],
+            'top_k_overlap': len(current_top.intersection(top.tolist())) / k if k else 0.0,
+            'mean_rank_displacement': float(displacement.mean()) if len(skus) else 0.0,
+            'max_rank_displacement': int(displacement.max()) if len(skus) else 0,
+            'top_k_rank_displacement': float(displacement[top].mean()) if k else 0.0
+        })
+
+    return {
+        'current_weights_id': current.get('id'),
+        'total_products': len(skus),
+        'top_k': k,
+        'candidates': results
+    }
@@ -1,4 +1,6 @@
 from app.database.connection import get_db_connection
+from app.services.score_table_service import rebuild_product_scores
+from app.services.catalog_snapshot import current_catalog_snapshot, invalidate_catalog_snapshot
 from typing import Dict, Any, Tuple
 
 def get_current_weights() -> Dict[str, Any]:
@@ -40,7 +42,10 @@ def update_weights(weight_data: Dict[str, float]) -> Tuple[bool, str]:
                 weight_data.get('sale_start_weight', 1.0)
             ))
             
+            # Пересчитываем материализованный скор под новые веса
+            rebuild_product_scores(conn, snapshot=current_catalog_snapshot(conn))
             conn.commit()
+            invalidate_catalog_snapshot()
             return True, "Веса успешно обновлены"
     except Exception as e:
         return False, f"Ошибка при обновлении весов: {str(e)}"
@@ -66,7 +71,9 @@ def reset_weights() -> Tuple[bool, str]:
             """
             
             cursor.execute(query)
+            rebuild_product_scores(conn, snapshot=current_catalog_snapshot(conn))
             conn.commit()
+            invalidate_catalog_snapshot()
             return True, "Веса успешно сброшены до значений по умолчанию"
     except Exception as e:
         return False, f"Ошибка при сбросе весов: {str(e)}" 
\ No newline at end of file
@@ -0,0 +1,50 @@
+import numpy as np
+from typing import Iterable
+
+# Число единичных битов в каждом байте (np.bitwise_count есть только в NumPy 2)
+_POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+class Bitmap:
+    """Битовая карта над целочисленными id товаров 0..size-1, упакованная по 8 id в байт"""
+
+    __slots__ = ('bits', 'size')
+
+    def __init__(self, bits: np.ndarray, size: int):
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> 'Bitmap':
+        return cls(np.packbits(np.asarray(mask, dtype=bool)), len(mask))
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[int], size: int) -> 'Bitmap':
+        mask = np.zeros(size, dtype=bool)
+        mask[np.fromiter(rows, dtype=np.int64)] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def full(cls, size: int) -> 'Bitmap':
+        return cls.from_mask(np.ones(size, dtype=bool))
+
+    @classmethod
+    def empty(cls, size: int) -> 'Bitmap':
+        return cls(np.zeros((size + 7) // 8, dtype=np.uint8), size)
+
+    def __and__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(np.bitwise_and(self.bits, other.bits), self.size)
+
+    def __or__(self, other: 'Bitmap') -> 'Bitmap':
+        return Bitmap(np.bitwise_or(self.bits, other.bits), self.size)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def count(self) -> int:
+        """Число установленных битов (popcount)"""
+        return int(_POPCOUNT[self.bits].sum(dtype=np.int64))
+
+    def rows(self) -> np.ndarray:
+        """Номера установленных битов по возрастанию"""
+        return np.flatnonzero(np.unpackbits(self.bits, count=self.size))
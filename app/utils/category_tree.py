@@ -0,0 +1,22 @@
+from typing import Dict, Hashable, List, Optional
+
+
+def category_paths(parents: Dict[Hashable, Optional[Hashable]]) -> Dict[Hashable, List[Hashable]]:
+    """Пути от корня до каждой категории по словарю {id: parent_id} (замыкание дерева в памяти).
+
+    Каждая категория обходится один раз: путь родителя переиспользуется для всех его
+    потомков. Родители, которых нет в словаре, и циклы в parent_id обрывают путь.
+    """
+    paths: Dict[Hashable, List[Hashable]] = {}
+    for category_id in parents:
+        # Поднимаемся до категории с уже известным путем (или до корня)
+        chain = []
+        current = category_id
+        while current in parents and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents[current]
+        path = list(paths.get(current, []))
+        for node in reversed(chain):
+            path.append(node)
+            paths[node] = list(path)
+    return paths
@@ -0,0 +1,89 @@
+import csv
+import unicodedata
+import zipfile
+from typing import Iterable, Iterator, List, Sequence, Tuple
+from urllib.parse import quote
+
+# Сколько строк CSV собирается в один кусок потокового ответа
+CSV_CHUNK_ROWS = 1000
+
+
+class _LineBuffer:
+    """Буфер для csv.writer: writerow возвращает готовую строку вместо записи в файл"""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_chunks(header: Sequence, rows: Iterable[Sequence], delimiter: str = ';',
+               chunk_rows: int = CSV_CHUNK_ROWS) -> Iterator[bytes]:
+    """CSV по кускам в UTF-8: строки читаются из итератора (например, курсора БД) по мере отдачи.
+
+    В памяти одновременно находится не больше chunk_rows строк.
+    """
+    writer = csv.writer(_LineBuffer(), delimiter=delimiter)
+    lines: List[str] = [writer.writerow(header)]
+    for row in rows:
+        lines.append(writer.writerow(row))
+        if len(lines) >= chunk_rows:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+class _ChunkSink:
+    """Поток только для записи: ZipFile пишет в него, а генератор забирает накопленные байты"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._offset = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_chunks(files: Iterable[Tuple[str, Iterable[bytes]]]) -> Iterator[bytes]:
+    """ZIP-архив по кускам из пар (имя файла, куски содержимого).
+
+    Архив пишется в поток без перемотки (размеры записываются после данных каждого файла),
+    поэтому ни архив, ни отдельный файл целиком в памяти не собираются.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in files:
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                for chunk in chunks:
+                    entry.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def attachment_headers(filename: str) -> dict:
+    """Заголовок Content-Disposition для скачивания файла с произвольным (в т.ч. русским) именем"""
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = ascii_name.replace('"', '').replace('\\', '') or 'export'
+    value = f'attachment; filename="{ascii_name}"'
+    if ascii_name != filename:
+        value += f"; filename*=UTF-8''{quote(filename, safe='')}"
+    return {'Content-Disposition': value}
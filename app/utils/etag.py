@@ -0,0 +1,64 @@
+import hashlib
+from functools import wraps
+from typing import Optional, Tuple
+
+from flask import make_response, request
+
+from app.database.connection import get_db_connection
+from app.services.catalog_snapshot import expire_stale_snapshot
+from app.services.category_weights_service import get_current_season
+
+
+def data_state(conn) -> Tuple[Optional[int], Tuple]:
+    """Состояние данных одним запросом: id последних весов и отсортированные пары
+    (имя, версия) data_versions — в том же виде, что ключ снимка каталога"""
+    rows = conn.execute('''
+        SELECT name, version FROM data_versions
+        UNION ALL
+        SELECT NULL, MAX(id) FROM weights
+    ''').fetchall()
+    weights_id = next((row[1] for row in rows if row[0] is None), None)
+    return weights_id, tuple(sorted((row[0], row[1]) for row in rows if row[0] is not None))
+
+
+def normalized_query() -> str:
+    """Параметры запроса в каноническом виде: порядок параметров и пустые значения не влияют"""
+    pairs = sorted(
+        (key, value.strip())
+        for key, values in request.args.lists()
+        for value in values
+        if value.strip()
+    )
+    return '&'.join(f"{key}={value}" for key, value in pairs)
+
+
+def compute_etag() -> str:
+    """Сильный ETag ответа: путь, нормализованные параметры, состояние данных и сезон
+    (сезонный множитель меняет скор без изменения данных)"""
+    with get_db_connection() as conn:
+        weights_id, versions = data_state(conn)
+    # Снимок каталога перепроверяется раз в CHECK_INTERVAL; если он отстает от прочитанного
+    # состояния, ответ строится уже по новым данным, а не по старым под новым ETag
+    expire_stale_snapshot(versions, weights_id)
+    state = f"weights={weights_id};" + ';'.join(f"{name}={version}" for name, version in versions)
+    payload = f"{request.path}?{normalized_query()}|{state}|season={get_current_season()}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def conditional_get(view):
+    """Условный GET: ответ помечается ETag, при совпадении If-None-Match возвращается 304
+    без вызова обработчика (и без запроса к данным)"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = compute_etag()
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # Браузер хранит ответ, но перед использованием всегда сверяет ETag с сервером
+        response.cache_control.no_cache = True
+        return response
+    return wrapper
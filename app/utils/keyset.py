@@ -0,0 +1,50 @@
+import base64
+import json
+import numpy as np
+from typing import NamedTuple, Optional
+
+from app.utils.validation import ValidationError
+
+
+class ListingCursor(NamedTuple):
+    """Ключ последней отданной строки: ручная позиция (None — без позиции), скор, sku.
+
+    Порядок списка — (есть позиция, позиция, -скор, sku), поэтому следующая страница
+    начинается строго после этого ключа и не сдвигается, если между запросами появились товары.
+    """
+    position: Optional[float]
+    score: float
+    sku: str
+
+
+def encode_cursor(cursor: ListingCursor) -> str:
+    """Непрозрачный токен курсора для ответа API"""
+    payload = json.dumps([cursor.position, cursor.score, cursor.sku], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> ListingCursor:
+    """Разбор токена курсора; ValidationError для поврежденного токена"""
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        position, score, sku = json.loads(payload)
+        if position is not None:
+            position = float(position)
+        if not isinstance(sku, str):
+            raise ValueError(sku)
+        return ListingCursor(position, float(score), sku)
+    except (ValueError, TypeError):
+        raise ValidationError("Некорректный cursor")
+
+
+def after_cursor_mask(positions: np.ndarray, scores: np.ndarray, later_sku: np.ndarray,
+                      cursor: ListingCursor) -> np.ndarray:
+    """Маска строк, идущих в порядке списка строго после курсора.
+
+    positions — ручные позиции (NaN — без позиции), later_sku — маска строк с sku больше sku курсора.
+    """
+    pinned = ~np.isnan(positions)
+    after_score = (scores < cursor.score) | ((scores == cursor.score) & later_sku)
+    if cursor.position is None:
+        return ~pinned & after_score
+    return ~pinned | (positions > cursor.position) | ((positions == cursor.position) & after_score)
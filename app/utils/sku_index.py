@@ -0,0 +1,55 @@
+import bisect
+import re
+from typing import Any, Dict, List, Sequence
+
+# Цветовые варианты одного артикула: GKT027834-1, GKT027834-2 → GKT027834
+_VARIANT_RE = re.compile(r'^(.+)-(\d+)$')
+
+
+def normalize_sku(sku: str) -> str:
+    """Ключ поиска по sku: без пробелов по краям, в верхнем регистре"""
+    return (sku or '').strip().upper()
+
+
+def base_article(sku: str) -> str:
+    """Базовый артикул sku (без суффикса цветового варианта)"""
+    match = _VARIANT_RE.match(sku)
+    return match.group(1) if match else sku
+
+
+class SkuIndex:
+    """Отсортированный индекс нормализованных sku для поиска по префиксу через bisect.
+
+    Варианты одного артикула в индексе идут подряд: '-' меньше любой цифры и буквы,
+    поэтому GKT027834-1, GKT027834-2 стоят перед GKT0278340.
+    """
+
+    def __init__(self, skus: Sequence[str]):
+        pairs = sorted((normalize_sku(sku), row) for row, sku in enumerate(skus))
+        self.keys = [key for key, _ in pairs]
+        self.rows = [row for _, row in pairs]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def prefix_rows(self, prefix: str):
+        """Номера строк sku с заданным префиксом, по возрастанию sku (ленивый генератор)"""
+        prefix = normalize_sku(prefix)
+        start = bisect.bisect_left(self.keys, prefix)
+        for i in range(start, len(self.keys)):
+            if not self.keys[i].startswith(prefix):
+                return
+            yield self.rows[i]
+
+    def autocomplete(self, prefix: str, limit: int, skus: Sequence[str]) -> List[Dict[str, Any]]:
+        """Первые limit базовых артикулов с префиксом и их варианты (номера строк)"""
+        groups: List[Dict[str, Any]] = []
+        for row in self.prefix_rows(prefix):
+            article = base_article(skus[row])
+            if groups and groups[-1]['article'] == article:
+                groups[-1]['rows'].append(row)
+                continue
+            if len(groups) == limit:
+                break
+            groups.append({'article': article, 'rows': [row]})
+        return groups
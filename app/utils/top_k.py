@@ -0,0 +1,20 @@
+import numpy as np
+
+# Если нужна бо́льшая часть списка (глубокие страницы), полная сортировка выгоднее частичного отбора
+FULL_SORT_RATIO = 4
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Индексы k лучших по убыванию скора; при равном скоре — по возрастанию индекса.
+
+    Совпадает с np.argsort(-scores, kind='stable')[:k], но для малых k использует argpartition.
+    """
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k * FULL_SORT_RATIO >= n:
+        return np.argsort(-scores, kind='stable')[:k]
+    threshold = scores[np.argpartition(-scores, k - 1)[:k]].min()
+    # Все элементы не хуже порога, включая равные ему, в порядке индексов
+    candidates = np.flatnonzero(scores >= threshold)
+    return candidates[np.argsort(-scores[candidates], kind='stable')][:k]
@@ -24,7 +24,10 @@ class ProductFilters:
                  search: str = '',
                  gender: str = 'all',
                  per_page: int = 20,
-                 sku: str = ''):
+                 sku: str = '',
+                 cursor: str = '',
+                 fields: Optional[List[str]] = None,
+                 response_format: str = 'objects'):
         self.category = category
         self.page = page
         self.hide_no_price = hide_no_price
@@ -32,11 +35,15 @@ class ProductFilters:
         self.gender = gender
         self.per_page = per_page
         self.sku = sku
+        self.cursor = cursor
+        self.fields = fields
+        self.response_format = response_format
 
 class InputValidator:
     """Класс для валидации входных данных"""
     
     MAX_SEARCH_LENGTH = 100
+    RESPONSE_FORMATS = ['objects', 'columnar', 'ndjson', 'json-stream']
     ALLOWED_PER_PAGE = [20, 50, 100, 200, 500]
     
     @staticmethod
@@ -59,6 +66,11 @@ class InputValidator:
             gender = args.get('gender', 'all')
             category = args.get('category', 'all')
             sku = args.get('sku', '')
+            cursor = args.get('cursor', '')
+            fields = [field.strip() for field in args.get('fields', '').split(',') if field.strip()] or None
+            response_format = args.get('format', 'objects')
+            if response_format not in InputValidator.RESPONSE_FORMATS:
+                raise ValidationError(f"format должен быть одним из {InputValidator.RESPONSE_FORMATS}")
             
             return ProductFilters(
                 category=category,
@@ -67,7 +79,10 @@ class InputValidator:
                 search=search,
                 gender=gender,
                 per_page=per_page,
-                sku=sku
+                sku=sku,
+                cursor=cursor,
+                fields=fields,
+                response_format=response_format
             )
         except ValueError as e:
             raise ValidationError(f"Ошибка валидации фильтров: {str(e)}")
@@ -2,6 +2,7 @@ import pandas as pd
 import xml.etree.ElementTree as ET
 import numpy as np
 import sqlite3
+from app.utils.category_tree import category_paths
 
 # Пути к файлам
 DATA_FILE = 'data.xlsx'
@@ -68,16 +69,12 @@ def load_feed(feed_path):
                 'name': name,
                 'parent_id': parent_id
             }
-    def get_all_categories(cat_id):
-        result = []
-        current = categories.get(cat_id)
-        while current:
-            result.append(current['name'])
-            if current['parent_id']:
-                current = categories.get(current['parent_id'])
-            else:
-                break
-        return result
+    # Цепочки категорий считаются один раз на категорию, а не для каждого товара
+    paths = category_paths({cat_id: category['parent_id'] for cat_id, category in categories.items()})
+    chains = {
+        cat_id: ' | '.join(categories[node]['name'] for node in path)
+        for cat_id, path in paths.items()
+    }
     for offer in root.findall('.//offer'):
         sku = offer.get('id')
         if not sku:
@@ -86,16 +83,8 @@ def load_feed(feed_path):
         category_chains = []
         category_ids = []
         for cat_id in category_ids_raw:
-            chain = []
-            current = categories.get(cat_id)
-            while current:
-                chain.append(current['name'])
-                if current['parent_id']:
-                    current = categories.get(current['parent_id'])
-                else:
-                    break
-            if chain:
-                category_chains.append(' | '.join(reversed(chain)))
+            if cat_id in chains:
+                category_chains.append(chains[cat_id])
                 category_ids.append(int(cat_id))
         gender = ''
         for param in offer.findall('param'):
@@ -1,5 +1,7 @@
 import sqlite3
 import xml.etree.ElementTree as ET
+from app.database.versions import bump_version
+from app.database.category_closure import ensure_category_closure, rebuild_category_closure
 
 FEED_FILE = 'feed.xml'
 DB_FILE = 'merchandise.db'
@@ -37,6 +39,11 @@ def import_feed_categories():
                 VALUES (?, ?, (SELECT id FROM feed_categories WHERE category_number = ?), 1)
             ''', (cat_id, name, parent_id))
 
+    # Пересчет замыкания дерева (подкатегории и хлебные крошки)
+    ensure_category_closure(conn)
+    rebuild_category_closure(conn)
+    # Новая версия каталога сбрасывает in-memory снимки и ETag ответов API
+    bump_version(conn)
     conn.commit()
     print(f'Импортировано категорий: {len(categories)}')
     conn.close()
@@ -2,6 +2,9 @@ import pandas as pd
 import sqlite3
 import xml.etree.ElementTree as ET
 import ast
+from app.database.versions import bump_version
+from app.database.category_closure import ensure_category_closure, rebuild_category_closure
+from app.utils.category_tree import category_paths
 
 DB_FILE = 'merchandise.db'
 DATA_FILE = 'processed_data.xlsx'
@@ -33,12 +36,10 @@ def main():
                 'parent_id': int(category.get('parentId')) if category.get('parentId') and category.get('parentId').isdigit() else None
             }
     # 3. Собираем всех родителей
+    paths = category_paths({cat_id: cat['parent_id'] for cat_id, cat in cat_map.items()})
     needed_ids = set(all_cat_ids)
-    for cat_id in list(all_cat_ids):
-        current = cat_map.get(cat_id)
-        while current and current['parent_id']:
-            needed_ids.add(current['parent_id'])
-            current = cat_map.get(current['parent_id'])
+    for cat_id in all_cat_ids:
+        needed_ids.update(paths.get(cat_id, []))
     # 4. Очищаем feed_categories
     conn = sqlite3.connect(DB_FILE)
     cur = conn.cursor()
@@ -49,6 +50,11 @@ def main():
         if cat:
             cur.execute('INSERT INTO feed_categories (id, name, parent_id, category_number) VALUES (?, ?, ?, ?)',
                         (cat['id'], cat['name'], cat['parent_id'], cat['id']))
+    # Пересчет замыкания дерева (подкатегории и хлебные крошки)
+    ensure_category_closure(conn)
+    rebuild_category_closure(conn)
+    # Новая версия каталога сбрасывает in-memory снимки и ETag ответов API
+    bump_version(conn)
     conn.commit()
     conn.close()
     print('feed_categories успешно обновлена!')
@@ -1,6 +1,13 @@
 import pandas as pd
 import sqlite3
 import ast
+from app.database import connection
+from app.database.init import init_db
+from app.services.scoring_engine import parse_sale_start_day, NO_SALE_DAY
+from app.database.versions import bump_version
+from app.database.category_closure import ensure_category_closure, rebuild_category_closure
+from app.database.search_index import ensure_search_index
+from app.services.score_table_service import rebuild_product_scores, refresh_sale_start_days
 
 DB_FILE = 'merchandise.db'
 DATA_FILE = 'processed_data.xlsx'
@@ -18,8 +25,14 @@ def main():
                 ids = []
         for cat_name, cat_id in zip(cats_split, ids):
             cat_map[cat_id] = cat_name.strip()
+    # Схема приводится к текущей версии (sale_start_day, novelty_rank, data_versions,
+    # product_scores) до записи: старая база может быть создана до этих изменений
+    connection.DATABASE_PATH = DB_FILE
+    init_db()
     conn = sqlite3.connect(DB_FILE)
     cur = conn.cursor()
+    # Поисковый индекс обновляется триггерами products при upsert/удалении товаров
+    ensure_search_index(conn)
     # Очищаем feed_categories
     cur.execute('DELETE FROM feed_categories')
     # Заливаем только реально используемые категории
@@ -56,12 +69,16 @@ def main():
         revenue_vat = float(row.get('revenue_vat', 0))
         revenue_net = float(row.get('revenue_net', 0))
         sale_start_date = str(row.get('sale_start_date', '01.01.2000'))
+        # Номер дня старта продаж, чтобы при запросах не разбирать строку даты
+        sale_start_day = parse_sale_start_day(sale_start_date)
+        if sale_start_day == NO_SALE_DAY:
+            sale_start_day = None
         categories = str(row.get('categories', ''))
         url = str(row.get('url', ''))
         # upsert в products
         cur.execute('''
-            INSERT INTO products (sku, name, price, oldprice, discount, gender, image_url, sessions, product_views, cart_additions, checkout_starts, orders_gross, orders_net, revenue_vat, revenue_net, sale_start_date, categories, url)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO products (sku, name, price, oldprice, discount, gender, image_url, sessions, product_views, cart_additions, checkout_starts, orders_gross, orders_net, revenue_vat, revenue_net, sale_start_date, sale_start_day, categories, url)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ON CONFLICT(sku) DO UPDATE SET
                 name=excluded.name,
                 price=excluded.price,
@@ -78,9 +95,10 @@ def main():
                 revenue_vat=excluded.revenue_vat,
                 revenue_net=excluded.revenue_net,
                 sale_start_date=excluded.sale_start_date,
+                sale_start_day=excluded.sale_start_day,
                 categories=excluded.categories,
                 url=excluded.url
-        ''', (sku, name, price, oldprice, discount, gender, image_url, sessions, product_views, cart_additions, checkout_starts, orders_gross, orders_net, revenue_vat, revenue_net, sale_start_date, categories, url))
+        ''', (sku, name, price, oldprice, discount, gender, image_url, sessions, product_views, cart_additions, checkout_starts, orders_gross, orders_net, revenue_vat, revenue_net, sale_start_date, sale_start_day, categories, url))
         # Обновляем связи с категориями
         cur.execute('DELETE FROM product_categories WHERE sku = ?', (sku,))
         # category_ids может быть строкой вида '[1, 2, 3]' — преобразуем
@@ -92,6 +110,13 @@ def main():
                 cat_ids = []
         for cat_id in cat_ids:
             cur.execute('INSERT INTO product_categories (sku, category_id) VALUES (?, ?)', (sku, cat_id))
+    # --- Ранг новизны по всему каталогу и пересчет материализованного скора ---
+    refresh_sale_start_days(conn, parse_dates=False)
+    # Пересчет замыкания дерева (подкатегории и хлебные крошки)
+    ensure_category_closure(conn)
+    rebuild_category_closure(conn)
+    bump_version(conn)
+    rebuild_product_scores(conn)
     conn.commit()
     conn.close()
     print('Импорт завершён!')
@@ -1,5 +1,6 @@
 import sqlite3
 import xml.etree.ElementTree as ET
+from app.database.versions import bump_version
 
 FEED_FILE = 'feed.xml'
 DB_FILE = 'merchandise.db'
@@ -50,6 +51,8 @@ def import_product_category_links():
                 ''', (sku, category_id))
                 count += 1
 
+    # Новая версия каталога сбрасывает in-memory снимки и ETag ответов API
+    bump_version(conn)
     conn.commit()
     print(f'Добавлено связей товаров с категориями: {count}')
     conn.close()
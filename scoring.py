@@ -1,7 +1,58 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Sequence
 from datetime import datetime
+import numpy as np
 from models import Product, ProductMetrics, ScoringWeights, ScoringThresholds, ProductScore
 
+# Битовые флаги штрафов для пакетного скоринга
+PENALTY_HIGH_CONVERSION_RATE = 1
+PENALTY_NO_SIZES_AVAILABLE = 2
+PENALTY_LOW_REVENUE = 4
+
+PENALTY_NAMES = (
+    (PENALTY_HIGH_CONVERSION_RATE, "high_conversion_rate"),
+    (PENALTY_NO_SIZES_AVAILABLE, "no_sizes_available"),
+    (PENALTY_LOW_REVENUE, "low_revenue"),
+)
+
+METRICS_USED = ["views", "cart_additions", "orders", "revenue"]
+
+
+class BatchScores:
+    """Результат пакетного скоринга: массивы скоров и битовые маски штрафов.
+
+    Объекты ProductScore создаются только по запросу (product_score / итерация).
+    """
+
+    def __init__(self, product_ids: Sequence[str], base_scores: np.ndarray, final_scores: np.ndarray,
+                 penalty_masks: np.ndarray, timestamp: datetime):
+        self.product_ids = product_ids
+        self.base_scores = base_scores
+        self.final_scores = final_scores
+        self.penalty_masks = penalty_masks
+        self.timestamp = timestamp
+
+    def __len__(self) -> int:
+        return len(self.final_scores)
+
+    def penalties(self, index: int) -> List[str]:
+        """Названия штрафов товара по его битовой маске"""
+        mask = int(self.penalty_masks[index])
+        return [name for flag, name in PENALTY_NAMES if mask & flag]
+
+    def product_score(self, index: int) -> ProductScore:
+        """ProductScore для одного товара"""
+        return ProductScore(
+            product_id=self.product_ids[index],
+            base_score=float(self.base_scores[index]),
+            final_score=float(self.final_scores[index]),
+            metrics_used=list(METRICS_USED),
+            penalties=self.penalties(index),
+            timestamp=self.timestamp
+        )
+
+    def __iter__(self) -> Iterator[ProductScore]:
+        return (self.product_score(index) for index in range(len(self)))
+
 class ProductScorer:
     def __init__(self, weights: ScoringWeights, thresholds: ScoringThresholds):
         self.weights = weights
@@ -50,6 +101,58 @@ class ProductScorer:
             
         return final_score, penalties
     
+    def score_batch(
+        self,
+        views: Sequence[float],
+        cart_additions: Sequence[float],
+        orders: Sequence[float],
+        revenue: Sequence[float],
+        sizes_available: Sequence[bool],
+        product_ids: Optional[Sequence[str]] = None
+    ) -> BatchScores:
+        """Пакетный расчет скора по колонкам метрик (векторный аналог calculate_base_score + apply_penalties)"""
+        views = np.asarray(views, dtype=np.float64)
+        cart_additions = np.asarray(cart_additions, dtype=np.float64)
+        orders = np.asarray(orders, dtype=np.float64)
+        revenue = np.asarray(revenue, dtype=np.float64)
+        sizes_available = np.asarray(sizes_available, dtype=bool)
+
+        # Нормализация метрик
+        views_score = np.minimum(views / self.thresholds.min_views, 1.0)
+        revenue_score = np.minimum(revenue / self.thresholds.min_revenue, 1.0)
+
+        # Расчет конверсий (0 там, где знаменатель нулевой)
+        has_views = views > 0
+        view_to_cart = np.divide(cart_additions, views, out=np.zeros_like(views), where=has_views)
+        cart_to_order = np.divide(orders, cart_additions, out=np.zeros_like(views), where=cart_additions > 0)
+
+        # Взвешенная сумма в том же порядке, что и в calculate_base_score
+        base_scores = np.zeros_like(views)
+        base_scores += views_score * self.weights.views_weight
+        base_scores += view_to_cart * self.weights.cart_weight
+        base_scores += cart_to_order * self.weights.orders_weight
+        base_scores += revenue_score * self.weights.revenue_weight
+
+        # Штрафы
+        final_scores = base_scores.copy()
+        penalty_masks = np.zeros(len(views), dtype=np.uint8)
+
+        high_conversion = has_views & (np.divide(orders, views, out=np.zeros_like(views), where=has_views) > 0.5)
+        final_scores[high_conversion] *= 0.7
+        penalty_masks[high_conversion] |= PENALTY_HIGH_CONVERSION_RATE
+
+        no_sizes = ~sizes_available
+        final_scores[no_sizes] *= 0.8
+        penalty_masks[no_sizes] |= PENALTY_NO_SIZES_AVAILABLE
+
+        low_revenue = revenue < self.thresholds.min_revenue
+        final_scores[low_revenue] *= 0.9
+        penalty_masks[low_revenue] |= PENALTY_LOW_REVENUE
+
+        if product_ids is None:
+            product_ids = [str(index) for index in range(len(views))]
+        return BatchScores(product_ids, base_scores, final_scores, penalty_masks, datetime.now())
+
     def score_product(self, product: Product) -> ProductScore:
         """Расчет финального скора для товара"""
         base_score = self.calculate_base_score(product.metrics)
@@ -65,5 +168,17 @@ class ProductScorer:
         )
         
     def score_products(self, products: List[Product]) -> List[ProductScore]:
-        """Расчет скора для списка товаров"""
-        return [self.score_product(product) for product in products] 
\ No newline at end of file
+        """Расчет скора для списка товаров (одним пакетом)"""
+        return list(self.score_products_batch(products))
+
+    def score_products_batch(self, products: List[Product]) -> BatchScores:
+        """Пакетный скоринг списка товаров без промежуточных ProductScore"""
+        metrics = [product.metrics for product in products]
+        return self.score_batch(
+            views=[m.views for m in metrics],
+            cart_additions=[m.cart_additions for m in metrics],
+            orders=[m.orders for m in metrics],
+            revenue=[m.revenue for m in metrics],
+            sizes_available=[bool(m.sizes_available) for m in metrics],
+            product_ids=[product.id for product in products]
+        ) 
\ No newline at end of file
@@ -1,6 +1,9 @@
 import pytest
 import sqlite3
 import os
+import importlib.util
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 @pytest.fixture
 def test_db():
@@ -74,4 +77,102 @@ def app_with_db(app, test_db):
 @pytest.fixture
 def client(app_with_db):
     """Создает тестовый клиент"""
-    return app_with_db.test_client() 
\ No newline at end of file
+    return app_with_db.test_client()
+
+
+@pytest.fixture
+def catalog_db(tmp_path, monkeypatch):
+    """Файловая БД со схемой каталога (как после импорта processed_data) и несколькими товарами"""
+    from app.database import connection
+    from app.database.init import init_db
+
+    db_path = str(tmp_path / 'merchandise.db')
+    monkeypatch.setattr(connection, 'DATABASE_PATH', db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE products (
+            sku TEXT PRIMARY KEY,
+            name TEXT,
+            price REAL,
+            oldprice REAL,
+            discount REAL,
+            gender TEXT,
+            image_url TEXT,
+            sessions INTEGER,
+            product_views INTEGER,
+            cart_additions INTEGER,
+            checkout_starts INTEGER,
+            orders_gross INTEGER,
+            orders_net INTEGER,
+            revenue_vat REAL,
+            revenue_net REAL,
+            sale_start_date TEXT,
+            categories TEXT,
+            url TEXT
+        );
+
+        CREATE TABLE feed_categories (
+            id INTEGER PRIMARY KEY,
+            category_number INTEGER,
+            name TEXT,
+            parent_id INTEGER,
+            is_active BOOLEAN DEFAULT 1,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TABLE product_categories (
+            sku TEXT,
+            category_id INTEGER,
+            position INTEGER,
+            PRIMARY KEY (sku, category_id)
+        );
+
+        INSERT INTO feed_categories (id, category_number, name, parent_id) VALUES
+            (1, 1, 'Одежда', NULL),
+            (2, 2, 'Платья', 1),
+            (3, 3, 'Обувь', NULL);
+
+        INSERT INTO products (sku, name, price, oldprice, discount, gender, image_url,
+                              sessions, product_views, cart_additions, checkout_starts,
+                              orders_gross, orders_net, sale_start_date, categories, url)
+        VALUES
+            ('GKT000001-1', 'Платье белое', 1999, 2499, 20, 'Женщины', 'http://img/1.jpg', 100, 50, 10, 5, 3, 2, '01.03.2024', 'Одежда | Платья', 'http://site/1'),
+            ('GKT000001-2', 'Платье черное', 1999, 1999, 0, 'Женщины', 'http://img/2.jpg', 80, 40, 8, 4, 2, 1, '2024-03-01', 'Одежда | Платья', 'http://site/2'),
+            ('GKT000002-1', 'Кеды', 2999, 2999, 0, 'Мужчины', 'http://img/3.jpg', 300, 120, 30, 10, 6, 5, '15.01.2023', 'Обувь', 'http://site/3'),
+            ('GKT000003-1', 'Футболка', 0, 0, 0, 'Унисекс', '', 10, 5, 1, 0, 0, 0, '', 'Одежда', 'http://site/4');
+
+        INSERT INTO product_categories (sku, category_id, position) VALUES
+            ('GKT000001-1', 2, NULL),
+            ('GKT000001-2', 2, 1),
+            ('GKT000001-1', 1, NULL),
+            ('GKT000001-2', 1, NULL),
+            ('GKT000003-1', 1, NULL),
+            ('GKT000002-1', 3, NULL);
+    ''')
+    conn.commit()
+    conn.close()
+
+    init_db()
+    return db_path
+
+
+@pytest.fixture
+def api(catalog_db):
+    """Тестовый клиент приложения поверх catalog_db"""
+    from app import create_app
+    return create_app().test_client()
+
+
+@pytest.fixture
+def legacy_api(catalog_db, monkeypatch):
+    """Тестовый клиент прежнего приложения app.py поверх catalog_db.
+
+    app.py открывает merchandise.db в текущем каталоге, а имя модуля app занято пакетом,
+    поэтому файл загружается по пути из каталога с тестовой БД.
+    """
+    monkeypatch.chdir(os.path.dirname(catalog_db))
+    spec = importlib.util.spec_from_file_location('legacy_app', os.path.join(ROOT_DIR, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app.test_client()
@@ -0,0 +1,29 @@
+import numpy as np
+
+from app.services.catalog_snapshot import get_catalog_snapshot, invalidate_catalog_snapshot
+from app.utils.bitmap import Bitmap
+from app.utils.validation import ProductFilters
+
+
+def test_bitmap_and_count_and_rows():
+    a = Bitmap.from_mask(np.array([1, 1, 0, 1, 0, 1, 1, 1, 1, 0, 1], dtype=bool))
+    b = Bitmap.from_rows([0, 3, 4, 10], 11)
+    assert a.count() == 8
+    assert (a & b).rows().tolist() == [0, 3, 10]
+    assert (a & b).count() == 3
+    assert (a | b).count() == 9
+    assert Bitmap.full(11).count() == 11
+    assert Bitmap.empty(11).rows().tolist() == []
+
+
+def test_snapshot_counts_match_filters(catalog_db):
+    invalidate_catalog_snapshot()
+    snapshot, _ = get_catalog_snapshot()
+    assert snapshot.count(ProductFilters(hide_no_price=False)) == 4
+    assert snapshot.count(ProductFilters(hide_no_price=True)) == 3
+    assert snapshot.count(ProductFilters(hide_no_price=False, gender='Женщины')) == 2
+    assert snapshot.count(ProductFilters(hide_no_price=False, gender='Девочки')) == 0
+    assert snapshot.count(ProductFilters(category='1', hide_no_price=False)) == 3
+    assert snapshot.count(ProductFilters(category='1', hide_no_price=True)) == 2
+    assert snapshot.count(ProductFilters(category='1', hide_no_price=False, gender='Унисекс')) == 1
+    assert snapshot.count(ProductFilters(category='42', hide_no_price=False)) == 0
@@ -0,0 +1,155 @@
+import pytest
+
+from app.database.connection import get_db_connection
+from app.database.versions import bump_version
+from app.services import product_service
+from app.services.catalog_snapshot import get_catalog_snapshot, invalidate_catalog_snapshot
+from app.services.category_weights_service import save_category_profile
+from app.services.product_service import get_products
+from app.services.weights_service import update_weights
+from app.utils.validation import ProductFilters, ValidationError
+
+FILTERS = [
+    dict(category='all', hide_no_price=False),
+    dict(category='all', hide_no_price=True),
+    dict(category='all', hide_no_price=False, gender='Женщины'),
+    dict(category='all', hide_no_price=False, sku='GKT000002-1'),
+    dict(category='1', hide_no_price=False),
+    dict(category='1', hide_no_price=True),
+    dict(category='2', hide_no_price=False),
+    dict(category='2', hide_no_price=False, per_page=1, page=2),
+    dict(category='99', hide_no_price=False),
+    dict(category='all', hide_no_price=False, per_page=3, page=2),
+]
+
+
+def _listing(filters, use_snapshot, monkeypatch):
+    monkeypatch.setattr(product_service, 'CATALOG_SNAPSHOT_ENABLED', use_snapshot)
+    return get_products(ProductFilters(**filters))
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_snapshot_matches_sql_listing(catalog_db, monkeypatch, filters):
+    from_sql = _listing(filters, False, monkeypatch)
+    from_snapshot = _listing(filters, True, monkeypatch)
+    assert from_snapshot['total'] == from_sql['total']
+    assert [p['sku'] for p in from_snapshot['products']] == [p['sku'] for p in from_sql['products']]
+    for expected, actual in zip(from_sql['products'], from_snapshot['products']):
+        assert actual.keys() == expected.keys()
+        assert actual['score'] == pytest.approx(expected['score'])
+        assert {k: v for k, v in actual.items() if k != 'score'} == \
+            {k: v for k, v in expected.items() if k != 'score'}
+
+
+def test_snapshot_matches_sql_listing_with_category_profile(catalog_db, monkeypatch):
+    save_category_profile(1, {'sessions_weight': 0.0, 'orders_net_weight': 100.0})
+    filters = dict(category='1', hide_no_price=False)
+    from_sql = _listing(filters, False, monkeypatch)
+    from_snapshot = _listing(filters, True, monkeypatch)
+    assert [p['sku'] for p in from_snapshot['products']] == [p['sku'] for p in from_sql['products']]
+    assert [p['score'] for p in from_snapshot['products']] == \
+        pytest.approx([p['score'] for p in from_sql['products']])
+
+
+def test_search_matches_names_and_skus(catalog_db):
+    result = get_products(ProductFilters(category='all', hide_no_price=False, search='gkt000001'))
+    assert sorted(p['sku'] for p in result['products']) == ['GKT000001-1', 'GKT000001-2']
+    result = get_products(ProductFilters(category='all', hide_no_price=False, search='Платье'))
+    assert result['total'] == 2
+
+
+def test_snapshot_is_reused_until_data_changes(catalog_db):
+    invalidate_catalog_snapshot()
+    first, _ = get_catalog_snapshot()
+    invalidate_catalog_snapshot()
+    assert get_catalog_snapshot()[0] is first
+
+    # Новые веса не требуют перечитывать каталог
+    update_weights({'sessions_weight': 0.0})
+    second, weights = get_catalog_snapshot()
+    assert second is first
+    assert weights['sessions_weight'] == 0.0
+
+    with get_db_connection() as conn:
+        conn.execute("UPDATE products SET price = 0 WHERE sku = 'GKT000002-1'")
+        bump_version(conn)
+        conn.commit()
+    invalidate_catalog_snapshot()
+    third, _ = get_catalog_snapshot()
+    assert third is not first
+    assert get_products(ProductFilters(category='3', hide_no_price=True))['total'] == 0
+
+
+def _walk(filters, per_page):
+    skus, cursor = [], ''
+    while True:
+        result = get_products(ProductFilters(per_page=per_page, cursor=cursor, **filters))
+        skus += [p['sku'] for p in result['products']]
+        cursor = result['next_cursor']
+        if not cursor:
+            return skus
+
+
+@pytest.mark.parametrize('use_snapshot', [True, False])
+@pytest.mark.parametrize('filters', [
+    dict(category='all', hide_no_price=False),
+    dict(category='1', hide_no_price=False),
+    dict(category='2', hide_no_price=False),
+])
+def test_cursor_pages_cover_listing_in_order(catalog_db, monkeypatch, use_snapshot, filters):
+    monkeypatch.setattr(product_service, 'CATALOG_SNAPSHOT_ENABLED', use_snapshot)
+    full = [p['sku'] for p in get_products(ProductFilters(per_page=100, **filters))['products']]
+    assert _walk(filters, 1) == full
+    assert _walk(filters, 2) == full
+
+
+def test_cursor_is_stable_when_rows_arrive(catalog_db):
+    filters = dict(category='all', hide_no_price=False)
+    first = get_products(ProductFilters(per_page=2, **filters))
+    seen = [p['sku'] for p in first['products']]
+
+    # Новый товар с максимальным скором попадает в начало списка и не сдвигает следующую страницу
+    with get_db_connection() as conn:
+        conn.execute("""
+            INSERT INTO products (sku, name, price, sessions, product_views, cart_additions,
+                                  checkout_starts, orders_gross, orders_net, discount)
+            VALUES ('GKT000000-1', 'Новинка', 100, 10000, 0, 0, 0, 0, 0, 0)
+        """)
+        bump_version(conn)
+        conn.commit()
+    invalidate_catalog_snapshot()
+
+    second = get_products(ProductFilters(per_page=2, cursor=first['next_cursor'], **filters))
+    assert [p['sku'] for p in second['products']] == [
+        sku for sku in ['GKT000002-1', 'GKT000001-1', 'GKT000001-2', 'GKT000003-1'] if sku not in seen
+    ][:2]
+
+
+def test_invalid_cursor_is_rejected(catalog_db):
+    with pytest.raises(ValidationError):
+        get_products(ProductFilters(cursor='не-курсор'))
+
+
+@pytest.mark.parametrize('use_snapshot', [True, False])
+def test_fields_projection_and_columnar_format(catalog_db, monkeypatch, use_snapshot):
+    monkeypatch.setattr(product_service, 'CATALOG_SNAPSHOT_ENABLED', use_snapshot)
+    full = get_products(ProductFilters(category='2', hide_no_price=False))
+
+    projected = get_products(ProductFilters(category='2', hide_no_price=False, fields=['sku', 'has_image', 'category']))
+    assert projected['products'] == [
+        {'sku': p['sku'], 'has_image': p['has_image'], 'category': p['category']} for p in full['products']
+    ]
+
+    columnar = get_products(ProductFilters(category='2', hide_no_price=False, per_page=1,
+                                           fields=['sku', 'score'], response_format='columnar'))
+    assert 'products' not in columnar
+    assert columnar['fields'] == ['sku', 'score']
+    assert columnar['columns']['sku'] == [full['products'][0]['sku']]
+    assert columnar['columns']['score'] == pytest.approx([full['products'][0]['score']])
+    assert columnar['next_cursor']
+
+
+def test_invalid_format_is_rejected():
+    from app.utils.validation import InputValidator
+    with pytest.raises(ValidationError):
+        InputValidator.validate_product_filters({'format': 'xml'})
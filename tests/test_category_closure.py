@@ -0,0 +1,57 @@
+import pytest
+
+from app.database.category_closure import category_breadcrumbs, rebuild_category_closure
+from app.database.connection import get_db_connection
+from app.database.versions import bump_version
+from app.services import product_service
+from app.services.product_service import get_products
+from app.utils.category_tree import category_paths
+from app.utils.validation import ProductFilters
+
+
+@pytest.fixture
+def nested_db(catalog_db):
+    """Подкатегория второго уровня с товаром, который не привязан к родителям напрямую"""
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO feed_categories (id, category_number, name, parent_id) VALUES (4, 4, 'Мини', 2)")
+        conn.execute("INSERT INTO product_categories (sku, category_id, position) VALUES ('GKT000002-1', 4, 1)")
+        rebuild_category_closure(conn)
+        bump_version(conn)
+        conn.commit()
+    return catalog_db
+
+
+def test_closure_contains_all_ancestors(nested_db):
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            'SELECT ancestor_id, depth FROM category_closure WHERE descendant_id = 4 ORDER BY depth'
+        ).fetchall()
+        assert [tuple(row) for row in rows] == [(4, 0), (2, 1), (1, 2)]
+        assert [crumb['name'] for crumb in category_breadcrumbs(conn, 4)] == ['Одежда', 'Платья', 'Мини']
+
+
+@pytest.mark.parametrize('use_snapshot', [True, False])
+def test_parent_category_includes_descendants(nested_db, monkeypatch, use_snapshot):
+    monkeypatch.setattr(product_service, 'CATALOG_SNAPSHOT_ENABLED', use_snapshot)
+    result = get_products(ProductFilters(category='1', hide_no_price=False))
+    products = {p['sku']: p for p in result['products']}
+    assert result['total'] == 4
+    # Позиция в подкатегории не становится ручной позицией родителя
+    assert products['GKT000002-1']['position'] is None
+    assert get_products(ProductFilters(category='3', hide_no_price=False))['total'] == 1
+
+
+def test_closure_survives_parent_cycles(catalog_db):
+    with get_db_connection() as conn:
+        conn.execute('UPDATE feed_categories SET parent_id = 2 WHERE id = 1')
+        rebuild_category_closure(conn)
+        depths = dict(conn.execute(
+            'SELECT ancestor_id, depth FROM category_closure WHERE descendant_id = 1'
+        ).fetchall())
+    assert depths == {1: 0, 2: 1}
+
+
+def test_category_paths():
+    paths = category_paths({'1': None, '2': '1', '3': '2', '4': '9'})
+    assert paths['3'] == ['1', '2', '3']
+    assert paths['4'] == ['4']
@@ -0,0 +1,199 @@
+from app.database.connection import get_db_connection
+from app.services.category_order_service import (
+    POSITION_GAP,
+    apply_category_order,
+    apply_order_operations,
+    apply_staged_positions,
+    compact_category_positions,
+    pinned_positions,
+    plan_positions,
+    schedule_compaction,
+    stage_positions,
+    staged_missing_skus
+)
+
+
+def test_moving_one_item_changes_one_position():
+    current = [1024, 2048, 3072, 4096, 5120]
+    moved = [current[3]] + current[:3] + current[4:]
+    changes, crowded = plan_positions(moved)
+    assert changes == {0: 512}
+    assert not crowded
+
+
+def test_new_items_fill_gaps_and_append():
+    changes, crowded = plan_positions([None, 1024, None, None, 2048, None])
+    assert changes == {0: 512, 2: 1365, 3: 1706, 5: 2048 + POSITION_GAP}
+    assert not crowded
+
+
+def test_exhausted_gap_widens_the_run():
+    changes, crowded = plan_positions([1, None, 2, 3])
+    assert crowded
+    new = [changes.get(i, key) for i, key in enumerate([1, None, 2, 3])]
+    assert new == sorted(set(new))
+    assert 0 not in changes
+
+
+def test_bulk_order_writes_only_moved_rows(api, catalog_db):
+    payload = [
+        {'sku': sku, 'category_id': 1, 'position': i + 1}
+        for i, sku in enumerate(['GKT000001-1', 'GKT000001-2', 'GKT000003-1'])
+    ]
+    assert api.post('/api/category_order_bulk', json=payload).get_json()['changed'] == 3
+
+    payload[0]['position'], payload[2]['position'] = 3, 1
+    first = api.post('/api/category_order_bulk', json=payload).get_json()
+    assert first['changed'] == 2
+    assert first['versions'] == {'1': api.get('/api/category_ordering/1').get_json()['version']}
+    # Повтор без изменений не меняет версию категории
+    again = api.post('/api/category_order_bulk', json=payload).get_json()
+    assert again['changed'] == 0 and again['versions'] == first['versions']
+    order = [p['sku'] for p in api.get('/api/products?category=1&hide_no_price=false').get_json()['products']]
+    assert order == ['GKT000003-1', 'GKT000001-2', 'GKT000001-1']
+
+    # Частичное обновление: товары вне списка сохраняют взаимный порядок
+    partial = [{'sku': 'GKT000001-1', 'category_id': 1, 'position': 1},
+               {'sku': 'GKT000003-1', 'category_id': 1, 'position': 2}]
+    assert api.post('/api/category_order_bulk', json=partial).get_json()['changed'] == 1
+    listing = api.get('/api/products?category=1&hide_no_price=false').get_json()
+    assert [p['sku'] for p in listing['products']] == ['GKT000001-1', 'GKT000003-1', 'GKT000001-2']
+    assert all(p['position'] is not None for p in listing['products'])
+
+
+def test_bulk_order_moves_single_item_to_its_rank(api, catalog_db):
+    payload = [
+        {'sku': sku, 'category_id': 1, 'position': i + 1}
+        for i, sku in enumerate(['GKT000001-1', 'GKT000001-2', 'GKT000003-1'])
+    ]
+    api.post('/api/category_order_bulk', json=payload)
+    with get_db_connection() as conn:
+        assert pinned_positions(conn, 1)[-1] == ('GKT000003-1', 3 * POSITION_GAP)
+
+    # Товар с третьего места переезжает на первое, соседи сдвигаются без записи
+    response = api.post('/api/category_order_bulk', json=[{'sku': 'GKT000003-1', 'category_id': 1, 'position': 1}])
+    assert response.get_json()['changed'] == 1
+    assert _order(api) == ['GKT000003-1', 'GKT000001-1', 'GKT000001-2']
+
+    assert api.post('/api/category_order_bulk',
+                    json=[{'sku': 'GKT000003-1', 'category_id': 1, 'position': 0}]).status_code == 400
+
+
+def test_bulk_order_rejects_unknown_sku(api, catalog_db):
+    response = api.post('/api/category_order_bulk', json=[{'sku': 'NOPE', 'category_id': 1, 'position': 1}])
+    assert response.status_code == 400
+    assert 'NOPE' in response.get_json()['error']
+
+    # Связи с категорией не создаются
+    response = api.post('/api/category_order_bulk', json=[{'sku': 'GKT000002-1', 'category_id': 1, 'position': 1}])
+    assert response.status_code == 400
+    assert 'GKT000002-1' in response.get_json()['error']
+    assert api.get('/api/products?category=1&hide_no_price=false').get_json()['total'] == 3
+
+
+def test_compaction_keeps_order(catalog_db):
+    with get_db_connection() as conn:
+        apply_category_order(conn, 1, ['GKT000001-1', 'GKT000001-2', 'GKT000003-1'])
+        conn.execute("UPDATE product_categories SET position = 7 - position / 1024 WHERE category_id = 1")
+        conn.commit()
+        before = [sku for sku, _ in pinned_positions(conn, 1)]
+        assert compact_category_positions(conn, 1) == 3
+        assert compact_category_positions(conn, 1) == 0
+        assert pinned_positions(conn, 1) == [(sku, POSITION_GAP * (i + 1)) for i, sku in enumerate(before)]
+
+        conn.execute("UPDATE product_categories SET position = 1 WHERE category_id = 1 AND sku = 'GKT000001-1'")
+        conn.commit()
+        schedule_compaction(conn, 1).join()
+        assert [position for _, position in pinned_positions(conn, 1)] == [1024, 2048, 3072]
+
+
+def _order(api, category=1):
+    return [p['sku'] for p in api.get(f'/api/products?category={category}&hide_no_price=false').get_json()['products']]
+
+
+def test_order_operations(api, catalog_db):
+    pin = [{'op': 'pin', 'sku': sku, 'index': i} for i, sku in enumerate(['GKT000003-1', 'GKT000001-1'])]
+    first = api.post('/api/category_order_ops', json={'category_id': 1, 'operations': pin}).get_json()
+    assert first['changed'] == 2
+    assert _order(api)[:2] == ['GKT000003-1', 'GKT000001-1']
+
+    move = {'op': 'move', 'sku': 'GKT000001-2', 'before': 'GKT000001-1'}
+    second = api.post('/api/category_order_ops', json={'category_id': 1, 'operations': [move]}).get_json()
+    assert second['changed'] == 1
+    assert second['version'] == first['version'] + 1
+    assert _order(api) == ['GKT000003-1', 'GKT000001-2', 'GKT000001-1']
+
+    # Повтор той же операции ничего не пишет и не меняет версию
+    again = api.post('/api/category_order_ops', json={'category_id': 1, 'operations': [move]}).get_json()
+    assert again['changed'] == 0 and again['version'] == second['version']
+
+    ops = [{'op': 'unpin', 'sku': 'GKT000003-1'}, {'op': 'move', 'sku': 'GKT000001-1', 'after': 'GKT000001-2'}]
+    third = api.post('/api/category_order_ops', json={'category_id': 1, 'operations': ops}).get_json()
+    assert third['changed'] == 1
+    listing = api.get('/api/products?category=1&hide_no_price=false').get_json()['products']
+    assert [p['position'] is not None for p in listing] == [True, True, False]
+
+
+def test_order_operations_version_conflict_and_validation(api, catalog_db):
+    ordering = api.get('/api/category_ordering/1').get_json()
+    ops = [{'op': 'pin', 'sku': 'GKT000001-1', 'index': 0}]
+    assert api.post('/api/category_order_ops',
+                    json={'category_id': 1, 'version': ordering['version'] + 1, 'operations': ops}).status_code == 409
+    response = api.post('/api/category_order_ops', json={'category_id': 1, 'version': ordering['version'], 'operations': ops})
+    assert response.status_code == 200
+
+    bad = [{'op': 'move', 'sku': 'GKT000001-2', 'after': 'GKT000003-1'}]
+    response = api.post('/api/category_order_ops', json={'category_id': 1, 'operations': bad})
+    assert response.status_code == 400
+    assert api.post('/api/category_order_ops', json={'category_id': 1, 'operations': []}).status_code == 400
+
+
+def test_pin_into_exhausted_gap_shifts_neighbours(catalog_db):
+    with get_db_connection() as conn:
+        conn.execute("UPDATE product_categories SET position = 1 WHERE category_id = 1 AND sku = 'GKT000001-1'")
+        conn.execute("UPDATE product_categories SET position = 2 WHERE category_id = 1 AND sku = 'GKT000001-2'")
+        changed, crowded = apply_order_operations(conn, 1, [{'op': 'pin', 'sku': 'GKT000003-1', 'index': 1}])
+        assert crowded and changed == 2
+        assert [sku for sku, _ in pinned_positions(conn, 1)] == ['GKT000001-1', 'GKT000003-1', 'GKT000001-2']
+
+
+def test_staged_import_applies_positions(catalog_db):
+    rows = [(2, 'GKT000002-1', 5), (3, 'NOPE', 1), (4, 'GKT000001-1', 3), (5, 'GKT000002-1', 7)]
+    with get_db_connection() as conn:
+        assert stage_positions(conn, iter(rows), chunk_rows=2) == 4
+        assert staged_missing_skus(conn) == (['NOPE'], 1)
+        assert staged_missing_skus(conn, limit=0) == ([], 1)
+
+        stage_positions(conn, iter([row for row in rows if row[1] != 'NOPE']))
+        assert staged_missing_skus(conn) == ([], 0)
+        apply_staged_positions(conn, 3)
+        conn.commit()
+        # При повторе sku побеждает последняя строка файла
+        assert pinned_positions(conn, 3) == [('GKT000001-1', 3), ('GKT000002-1', 7)]
+
+
+def test_compaction_keeps_category_version(api, catalog_db):
+    ops = [{'op': 'pin', 'sku': sku, 'index': i} for i, sku in enumerate(['GKT000001-1', 'GKT000001-2'])]
+    version = api.post('/api/category_order_ops', json={'category_id': 1, 'operations': ops}).get_json()['version']
+    with get_db_connection() as conn:
+        conn.execute("UPDATE product_categories SET position = position / 1024 WHERE category_id = 1")
+        conn.commit()
+        schedule_compaction(conn, 1).join()
+        assert [position for _, position in pinned_positions(conn, 1)] == [1024, 2048]
+
+    # Уплотнение не меняет видимый порядок, поэтому версия категории остается действительной
+    ops = [{'op': 'unpin', 'sku': 'GKT000001-2'}]
+    response = api.post('/api/category_order_ops', json={'category_id': 1, 'version': version, 'operations': ops})
+    assert response.status_code == 200
+
+
+def test_init_spreads_dense_positions_once(catalog_db):
+    from app.database.init import init_db
+    with get_db_connection() as conn:
+        # Позиции фикстуры (1) разведены при init_db
+        assert pinned_positions(conn, 2) == [('GKT000001-2', POSITION_GAP)]
+        conn.execute("UPDATE product_categories SET position = 1 WHERE category_id = 2 AND sku = 'GKT000001-2'")
+        conn.commit()
+    init_db()
+    with get_db_connection() as conn:
+        assert pinned_positions(conn, 2) == [('GKT000001-2', 1)]
@@ -0,0 +1,65 @@
+from datetime import date
+
+from app.database.connection import get_db_connection
+from app.services.category_weights_service import (
+    compile_category_scorer,
+    get_category_scorer,
+    get_current_season,
+    save_category_profile,
+    delete_category_profile
+)
+from app.services.product_service import get_products
+from app.services.score_table_service import ensure_product_scores
+from app.utils.validation import ProductFilters
+
+
+def test_current_season():
+    assert get_current_season(date(2024, 1, 15)) == 'winter'
+    assert get_current_season(date(2024, 7, 1)) == 'summer'
+    assert get_current_season(date(2024, 10, 1)) == 'autumn'
+
+
+def test_compiled_scorer_merges_profile_with_global_weights():
+    weights = {'id': 1, 'views_weight': 2.0, 'discount_penalty': 1.0, 'sale_start_weight': 1.0}
+    scorer = compile_category_scorer(
+        {'views_weight': None, 'cart_weight': 5.0, 'category_group': 'shoes', 'discount_type': 'clearance'},
+        weights,
+        'winter'
+    )
+    assert scorer.vector.tolist() == [1.0, 2.0, 5.0, 1.0, 1.0, 1.0, 1.5, 1.0]
+    assert scorer.multiplier == 1.4
+
+
+def test_profile_changes_category_ordering(catalog_db):
+    filters = ProductFilters(category='1', hide_no_price=False)
+    default_order = [p['sku'] for p in get_products(filters)['products']]
+
+    # Только сессии: у GKT000001-1 их больше всех в категории 1
+    success, _ = save_category_profile(1, {
+        'sessions_weight': 1.0, 'views_weight': 0.0, 'cart_weight': 0.0, 'checkout_weight': 0.0,
+        'orders_gross_weight': 0.0, 'orders_net_weight': 0.0, 'sale_start_weight': 0.0
+    })
+    assert success
+    result = get_products(filters)
+    assert [p['sku'] for p in result['products']] == ['GKT000001-1', 'GKT000001-2', 'GKT000003-1']
+    assert [p['score'] for p in result['products']] == [100.0, 80.0, 10.0]
+    assert result['total'] == 3
+
+    delete_category_profile(1)
+    assert [p['sku'] for p in get_products(filters)['products']] == default_order
+
+
+def test_compiled_scorer_is_cached_per_weights_version(catalog_db):
+    save_category_profile(2, {'views_weight': 3.0})
+    with get_db_connection() as conn:
+        weights = ensure_product_scores(conn)
+        first = get_category_scorer(conn, 2, weights)
+        assert get_category_scorer(conn, 2, weights) is first
+        assert get_category_scorer(conn, 3, weights) is None
+        assert get_category_scorer(conn, 2, dict(weights, id=weights['id'] + 1)) is not first
+
+
+def test_invalid_profile_is_rejected(catalog_db):
+    success, message = save_category_profile(1, {'discount_type': 'unknown'})
+    assert not success
+    assert 'discount_type' in message
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services.weights_service import update_weights
+
+
+@pytest.mark.parametrize('url', ['/api/products?category=2&hide_no_price=false', '/api/categories', '/api/weights'])
+def test_matching_etag_returns_304(api, url):
+    first = api.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    second = api.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.data == b''
+    assert second.headers['ETag'] == etag
+
+
+def test_etag_ignores_parameter_order_and_changes_with_weights(api):
+    etag = api.get('/api/products?category=2&hide_no_price=false').headers['ETag']
+    assert api.get('/api/products?hide_no_price=false&category=2&search=').headers['ETag'] == etag
+    assert api.get('/api/products?category=1&hide_no_price=false').headers['ETag'] != etag
+
+    update_weights({'sessions_weight': 2.0})
+    response = api.get('/api/products?category=2&hide_no_price=false', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_handler_is_not_called_on_304(api, monkeypatch):
+    etag = api.get('/api/products').headers['ETag']
+    from app.routes import products
+    monkeypatch.setattr(products, 'get_products', lambda filters: pytest.fail('запрос не должен выполняться'))
+    assert api.get('/api/products', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_etag_changes_with_season(api, monkeypatch):
+    from app.utils import etag as etag_module
+    url = '/api/products?category=2&hide_no_price=false'
+    monkeypatch.setattr(etag_module, 'get_current_season', lambda: 'winter')
+    etag = api.get(url).headers['ETag']
+    monkeypatch.setattr(etag_module, 'get_current_season', lambda: 'summer')
+    assert api.get(url, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_never_runs_ahead_of_snapshot(api, monkeypatch):
+    from app.services import weights_service
+    url = '/api/products?category=1&hide_no_price=false'
+    first = api.get(url)
+    # Запись из другого процесса: снимок этого процесса не сбрасывается, CHECK_INTERVAL не истек
+    monkeypatch.setattr(weights_service, 'invalidate_catalog_snapshot', lambda: None)
+    update_weights({'sessions_weight': 50.0})
+
+    second = api.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.get_json()['products'] != first.get_json()['products']
+    assert api.get(url, headers={'If-None-Match': second.headers['ETag']}).status_code == 304
@@ -0,0 +1,80 @@
+import io
+
+from app.database.connection import get_db_connection
+from app.database.versions import get_version
+from app.services.category_order_service import get_category_order_version, pinned_positions
+
+
+def _upload(legacy_api, text, category_number=1, encoding='utf-8-sig'):
+    data = {'file': (io.BytesIO(text.encode(encoding)), 'order.csv')}
+    return legacy_api.post(f'/api/import_category/{category_number}', data=data,
+                           content_type='multipart/form-data')
+
+
+def test_import_category_applies_positions_and_bumps_version(legacy_api):
+    # Файл из Excel: UTF-8 с BOM перед первым заголовком
+    response = _upload(legacy_api, 'Артикул,Позиция в категории\r\nGKT000003-1,1\r\nGKT000001-1,2\r\n')
+    assert response.status_code == 200
+    with get_db_connection() as conn:
+        assert [sku for sku, _ in pinned_positions(conn, 1)] == ['GKT000003-1', 'GKT000001-1']
+        assert get_category_order_version(conn, 1) == 1
+
+
+def test_import_category_rejects_bad_row_and_missing_skus(legacy_api):
+    response = _upload(legacy_api, 'Артикул,Позиция в категории\nGKT000003-1,1\nGKT000001-1,abc\n')
+    assert response.status_code == 400
+    assert 'строке 3' in response.get_json()['error']
+
+    response = _upload(legacy_api, 'Артикул,Позиция в категории\nGKT000003-1,1\nNOPE-1,2\nNOPE-2,3\n')
+    assert response.status_code == 400
+    assert 'NOPE-1' in response.get_json()['error'] and 'NOPE-2' in response.get_json()['error']
+
+    # Ни одна из неудачных загрузок ничего не записала
+    with get_db_connection() as conn:
+        assert pinned_positions(conn, 1) == []
+        assert get_category_order_version(conn, 1) == 0
+
+
+def test_order_and_category_writes_bump_versions(legacy_api):
+    def versions():
+        with get_db_connection() as conn:
+            return get_category_order_version(conn, 1), get_version(conn)
+
+    assert versions() == (0, 0)
+    assert legacy_api.post('/api/category_order',
+                           json={'sku': 'GKT000001-1', 'category_number': 1, 'position': 5}).status_code == 200
+    assert versions() == (1, 0)
+    bulk = [{'sku': 'GKT000001-2', 'category_number': 1, 'position': 1}]
+    assert legacy_api.post('/api/category_order_bulk', json=bulk).get_json()['changed'] == 2
+    assert versions() == (2, 0)
+    # Повтор без изменений версию не меняет
+    assert legacy_api.post('/api/category_order_bulk', json=bulk).get_json()['changed'] == 0
+    assert versions() == (2, 0)
+    assert legacy_api.post('/api/reset_category_order', json={'category_number': 1}).status_code == 200
+    assert versions() == (3, 0)
+    assert legacy_api.post('/api/categories', json={'category_number': 7, 'name': 'Аксессуары'}).status_code == 200
+    assert versions() == (3, 1)
+
+
+def test_order_operations_in_legacy_app(legacy_api):
+    pin = [{'op': 'pin', 'sku': 'GKT000001-2', 'index': 0},
+           {'op': 'move', 'sku': 'GKT000003-1', 'after': 'GKT000001-2'}]
+    first = legacy_api.post('/api/category_order_ops', json={'category_id': 1, 'operations': pin}).get_json()
+    assert first['changed'] == 2
+    with get_db_connection() as conn:
+        assert [sku for sku, _ in pinned_positions(conn, 1)] == ['GKT000001-2', 'GKT000003-1']
+
+    # Индекс за концом закрепленных ставит товар последним среди них
+    tail = [{'op': 'pin', 'sku': 'GKT000001-1', 'index': 2 ** 53 - 1}]
+    response = legacy_api.post('/api/category_order_ops',
+                               json={'category_id': 1, 'version': first['version'], 'operations': tail})
+    assert response.status_code == 200
+    with get_db_connection() as conn:
+        assert pinned_positions(conn, 1)[-1][0] == 'GKT000001-1'
+
+    stale = legacy_api.post('/api/category_order_ops',
+                            json={'category_id': 1, 'version': first['version'], 'operations': tail})
+    assert stale.status_code == 409
+    bad = [{'op': 'move', 'sku': 'GKT000001-1', 'after': 'GKT000002-1'}]
+    assert legacy_api.post('/api/category_order_ops', json={'category_id': 1, 'operations': bad}).status_code == 400
+    assert legacy_api.post('/api/category_order_ops', json={'category_id': 'x', 'operations': pin}).status_code == 400
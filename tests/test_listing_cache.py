@@ -0,0 +1,40 @@
+from app.services import catalog_snapshot
+from app.services.product_service import get_products
+from app.services.weights_service import update_weights
+from app.utils.lru_cache import TTLCache
+from app.utils.validation import ProductFilters
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (3, 1, 1, 2)
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=2, ttl=0)
+    cache.put('a', 1)
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_pages_share_cached_listing_until_weights_change(catalog_db):
+    catalog_snapshot.invalidate_catalog_snapshot()
+    before = catalog_snapshot.listing_cache_stats()
+    first = get_products(ProductFilters(category='1', hide_no_price=False, per_page=1))
+    second = get_products(ProductFilters(category='1', hide_no_price=False, per_page=1, page=2))
+    stats = catalog_snapshot.listing_cache_stats()
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hits'] - before['hits'] == 1
+    assert first['products'][0]['sku'] != second['products'][0]['sku']
+
+    update_weights({'sessions_weight': 0.0})
+    assert catalog_snapshot.listing_cache_stats()['size'] == 0
+    get_products(ProductFilters(category='1', hide_no_price=False, per_page=1))
+    assert catalog_snapshot.listing_cache_stats()['misses'] - stats['misses'] == 1
@@ -0,0 +1,74 @@
+import numpy as np
+
+from app.database.connection import get_db_connection
+from app.services.catalog_snapshot import current_catalog_snapshot, get_catalog_snapshot
+from app.services.product_service import get_products
+from app.services.score_table_service import ensure_product_scores, rebuild_product_scores
+from app.services.weights_service import update_weights, reset_weights
+from app.utils.validation import ProductFilters
+
+
+def _score_rows():
+    with get_db_connection() as conn:
+        return conn.execute(
+            "SELECT sku, weights_id, score, score_rank FROM product_scores ORDER BY score_rank"
+        ).fetchall()
+
+
+def test_scores_are_built_lazily_for_latest_weights(catalog_db):
+    with get_db_connection() as conn:
+        weights = ensure_product_scores(conn)
+    rows = _score_rows()
+    assert len(rows) == 4
+    assert {row['weights_id'] for row in rows} == {weights['id']}
+    assert [row['score_rank'] for row in rows] == [1, 2, 3, 4]
+    assert rows[0]['score'] >= rows[-1]['score']
+
+
+def test_update_and_reset_weights_rebuild_table(catalog_db):
+    update_weights({'sessions_weight': 0.0, 'views_weight': 10.0})
+    updated = _score_rows()
+    with get_db_connection() as conn:
+        latest_id = conn.execute("SELECT MAX(id) FROM weights").fetchone()[0]
+    assert {row['weights_id'] for row in updated} == {latest_id}
+
+    reset_weights()
+    assert {row['weights_id'] for row in _score_rows()} == {latest_id + 1}
+
+
+def test_weights_update_reuses_snapshot_matrix(catalog_db):
+    snapshot, _ = get_catalog_snapshot()
+    update_weights({'views_weight': 3.0})
+    from_snapshot = [(row['sku'], row['score']) for row in _score_rows()]
+    with get_db_connection() as conn:
+        assert current_catalog_snapshot(conn) is snapshot
+        rebuild_product_scores(conn)
+        conn.commit()
+    assert [row['sku'] for row in _score_rows()] == [sku for sku, _ in from_snapshot]
+    assert np.allclose([row['score'] for row in _score_rows()], [score for _, score in from_snapshot])
+
+
+def test_listing_uses_score_rank_and_pinned_positions(catalog_db):
+    with get_db_connection() as conn:
+        ensure_product_scores(conn)
+    ranked = [row['sku'] for row in _score_rows()]
+    result = get_products(ProductFilters(category='all', hide_no_price=False, per_page=2, page=1))
+    assert [p['sku'] for p in result['products']] == ranked[:2]
+    assert result['total'] == 4
+    assert result['total_pages'] == 2
+
+    result = get_products(ProductFilters(category='2', hide_no_price=False))
+    assert [p['sku'] for p in result['products']] == ['GKT000001-2', 'GKT000001-1']
+
+
+def test_sale_start_day_and_novelty_rank_are_stored(catalog_db):
+    with get_db_connection() as conn:
+        rows = {row['sku']: row for row in conn.execute(
+            "SELECT sku, sale_start_day, novelty_rank FROM products"
+        ).fetchall()}
+    # '01.03.2024' и '2024-03-01' — один и тот же день и один ранг
+    assert rows['GKT000001-1']['sale_start_day'] == rows['GKT000001-2']['sale_start_day']
+    assert rows['GKT000001-1']['novelty_rank'] == 2
+    assert rows['GKT000002-1']['novelty_rank'] == 1
+    assert rows['GKT000003-1']['sale_start_day'] is None
+    assert rows['GKT000003-1']['novelty_rank'] is None
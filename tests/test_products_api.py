@@ -0,0 +1,73 @@
+import json
+
+
+def test_streaming_formats_match_regular_listing(api):
+    regular = api.get('/api/products?category=1&hide_no_price=false&per_page=2').get_json()
+
+    streamed = api.get('/api/products?category=1&hide_no_price=false&per_page=2&format=json-stream')
+    assert streamed.is_streamed
+    assert json.loads(streamed.data) == regular
+
+    ndjson = api.get('/api/products?category=1&hide_no_price=false&per_page=2&format=ndjson')
+    assert ndjson.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in ndjson.data.decode('utf-8').splitlines()] == regular['products']
+    assert ndjson.headers['X-Total-Count'] == str(regular['total'])
+    assert ndjson.headers['X-Next-Cursor'] == regular['next_cursor']
+
+
+def test_facets_count_each_dimension_without_its_own_filter(api):
+    facets = api.get('/api/facets?gender=Женщины&hide_no_price=true').get_json()
+    assert facets['total'] == 2
+    assert facets['gender']['Женщины'] == 2
+    assert facets['gender']['Мужчины'] == 1
+    assert facets['gender']['Девочки'] == 0
+    assert facets['price'] == {'has_price': 2, 'no_price': 0}
+    counts = {category['id']: category['count'] for category in facets['categories']}
+    # «Одежда» (1) включает товары подкатегории «Платья» (2)
+    assert counts == {1: 2, 2: 2}
+
+    facets = api.get('/api/facets?hide_no_price=false&category=1').get_json()
+    assert facets['total'] == 3
+    assert facets['price'] == {'has_price': 2, 'no_price': 1}
+    assert {category['id']: category['count'] for category in facets['categories']} == {1: 3, 2: 2, 3: 1}
+
+
+def test_category_ordering_matches_listing(api):
+    listing = api.get('/api/products?category=1&hide_no_price=false&per_page=100').get_json()
+    ordering = api.get('/api/category_ordering/1?hide_no_price=false').get_json()
+    assert ordering['total'] == 3
+    assert ordering['skus'] == [p['sku'] for p in listing['products']]
+    assert ordering['scores'] == [p['score'] for p in listing['products']]
+    assert ordering['positions'] == [p['position'] for p in listing['products']]
+    first = listing['products'][0]
+    assert ordering['thumbnail_template'].replace('{id}', ordering['thumbnails'][0]) == first['image_url']
+
+
+def test_thumbnail_id_strips_cdn_size():
+    from app.services.catalog_snapshot import thumbnail_id
+    url = 'https://cdn/pictures/Krasnaa-majka_GTN004379-3_01_515Wx515H.jpg'
+    assert thumbnail_id(url) == 'Krasnaa-majka_GTN004379-3_01'
+    assert thumbnail_id('') == ''
+
+
+def test_export_category_streams_csv(api):
+    response = api.get('/api/export_category/1')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert "filename*=UTF-8''" in response.headers['Content-Disposition']
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == 'sku;category_id;position'
+    assert sorted(line.split(';')[0] for line in lines[1:]) == ['GKT000001-1', 'GKT000001-2', 'GKT000003-1']
+    assert api.get('/api/export_category/99').status_code == 404
+
+
+def test_export_all_categories_zip(api):
+    import io
+    import zipfile
+    response = api.get('/api/export_categories')
+    assert response.status_code == 200
+    archive = zipfile.ZipFile(io.BytesIO(response.get_data()))
+    names = archive.namelist()
+    assert len(names) == 3
+    platya = archive.read(next(name for name in names if name.startswith('category_2_'))).decode('utf-8')
+    assert platya.splitlines() == ['sku;category_id;position', 'GKT000001-2;2;1024', 'GKT000001-1;2;']
@@ -0,0 +1,67 @@
+import numpy as np
+from datetime import datetime
+
+from models import Product, ProductMetrics, ScoringWeights, ScoringThresholds
+from scoring import ProductScorer, PENALTY_HIGH_CONVERSION_RATE, PENALTY_NO_SIZES_AVAILABLE, PENALTY_LOW_REVENUE
+
+
+def _product(i, views, cart, orders, revenue, sizes):
+    return Product(
+        id=f'SKU{i}',
+        name=f'Товар {i}',
+        category='clothing',
+        metrics=ProductMetrics(
+            views=views,
+            cart_additions=cart,
+            orders=orders,
+            revenue=revenue,
+            net_revenue=revenue,
+            old_price=1000.0,
+            new_price=900.0,
+            discount=10.0,
+            sizes_available=sizes
+        ),
+        created_at=datetime(2024, 1, 1),
+        updated_at=datetime(2024, 1, 1)
+    )
+
+
+PRODUCTS = [
+    _product(0, 0, 0, 0, 0.0, []),
+    _product(1, 10, 8, 7, 500.0, ['M']),
+    _product(2, 250, 30, 12, 5000.0, ['S', 'M']),
+    _product(3, 50, 0, 0, 999.9, ['L']),
+]
+
+
+def test_batch_matches_scalar_scoring():
+    scorer = ProductScorer(ScoringWeights(), ScoringThresholds())
+    batch = scorer.score_products_batch(PRODUCTS)
+    for index, product in enumerate(PRODUCTS):
+        expected = scorer.score_product(product)
+        assert batch.base_scores[index] == expected.base_score
+        assert batch.final_scores[index] == expected.final_score
+        assert batch.penalties(index) == expected.penalties
+
+
+def test_penalty_bitmasks():
+    scorer = ProductScorer(ScoringWeights(), ScoringThresholds())
+    batch = scorer.score_batch(
+        views=[10, 200],
+        cart_additions=[8, 20],
+        orders=[7, 5],
+        revenue=[100.0, 2000.0],
+        sizes_available=[False, True]
+    )
+    assert batch.penalty_masks[0] == PENALTY_HIGH_CONVERSION_RATE | PENALTY_NO_SIZES_AVAILABLE | PENALTY_LOW_REVENUE
+    assert batch.penalty_masks[1] == 0
+    assert batch.product_ids == ['0', '1']
+
+
+def test_product_scores_are_built_lazily():
+    scorer = ProductScorer(ScoringWeights(), ScoringThresholds())
+    batch = scorer.score_products_batch(PRODUCTS)
+    scores = list(batch)
+    assert [s.product_id for s in scores] == [p.id for p in PRODUCTS]
+    assert len({s.timestamp for s in scores}) == 1
+    assert np.isclose(scores[2].final_score, batch.final_scores[2])
@@ -0,0 +1,122 @@
+import numpy as np
+from datetime import datetime
+
+from app.services.product_service import calculate_score
+from app.services.scoring_engine import (
+    ScoringEngine,
+    IncrementalScorer,
+    parse_sale_start_day,
+    weights_vector,
+    NO_SALE_DAY
+)
+
+WEIGHTS = {
+    'sessions_weight': 0.3,
+    'views_weight': 1.7,
+    'cart_weight': 2.1,
+    'checkout_weight': 0.9,
+    'orders_gross_weight': 3.3,
+    'orders_net_weight': 1.1,
+    'discount_penalty': 0.45,
+    'sale_start_weight': 2.5,
+}
+
+
+def _products():
+    dates = ['01.03.2024', '2024-03-01', '15.01.2023', '', None, 'не дата', '2023-12-31', '01.01.2000']
+    products = []
+    for i in range(40):
+        products.append({
+            'sku': f'SKU{i}',
+            'sessions': i * 7,
+            'product_views': i * 13 % 17,
+            'cart_additions': i % 5,
+            'checkout_starts': i % 3,
+            'orders_gross': i % 4,
+            'orders_net': i % 2,
+            'discount': (i * 3.7) % 50,
+            'sale_start_date': dates[i % len(dates)],
+        })
+    return products
+
+
+def _reference_scores(products, weights):
+    """Исходный построчный расчёт: calculate_score + novelty_bonus"""
+    def parse(date_str):
+        for date_format in ('%d.%m.%Y', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(date_str, date_format)
+            except (ValueError, TypeError):
+                continue
+        return None
+
+    sale_dates = sorted({parse(p['sale_start_date']) for p in products if p['sale_start_date']} - {None})
+    date_to_index = {d: i for i, d in enumerate(sale_dates)}
+    sale_start_weight = weights.get('sale_start_weight', 1.0)
+    result = []
+    for product in products:
+        score = calculate_score(product, weights)
+        idx = date_to_index.get(parse(product['sale_start_date'])) if product['sale_start_date'] else None
+        score += sale_start_weight if idx is None else sale_start_weight * (idx + 1)
+        result.append(score)
+    return result
+
+
+def _matrix_scores(products, weights):
+    return ScoringEngine.from_products(products).contribution_matrix() @ weights_vector(weights)
+
+
+def test_scores_match_row_by_row_calculation():
+    # Матричный скор отличается от построчного только порядком сложения
+    products = _products()
+    np.testing.assert_allclose(_matrix_scores(products, WEIGHTS), _reference_scores(products, WEIGHTS), rtol=1e-12)
+
+
+def test_zero_discount_penalty_is_ignored():
+    products = _products()
+    weights = dict(WEIGHTS, discount_penalty=0.0)
+    np.testing.assert_allclose(_matrix_scores(products, weights), _reference_scores(products, weights), rtol=1e-12)
+
+
+def test_both_date_formats_share_one_rank():
+    assert parse_sale_start_day('01.03.2024') == parse_sale_start_day('2024-03-01')
+    assert parse_sale_start_day('не дата') == NO_SALE_DAY
+    assert parse_sale_start_day(None) == NO_SALE_DAY
+
+
+def test_normalized_sale_start_day_matches_parsed_dates():
+    products = _products()
+    normalized = [
+        dict(p, sale_start_day=None if parse_sale_start_day(p['sale_start_date']) == NO_SALE_DAY
+             else parse_sale_start_day(p['sale_start_date']), sale_start_date='не разбирается')
+        for p in products
+    ]
+    np.testing.assert_array_equal(_matrix_scores(normalized, WEIGHTS), _matrix_scores(products, WEIGHTS))
+
+
+def test_incremental_scorer_matches_row_by_row_calculation():
+    products = _products()
+    scorer = IncrementalScorer(ScoringEngine.from_products(products))
+    np.testing.assert_allclose(scorer.score(WEIGHTS), _reference_scores(products, WEIGHTS), rtol=1e-12)
+    assert scorer.delta_updates == 0
+
+    moved = dict(WEIGHTS, cart_weight=5.0)
+    np.testing.assert_allclose(scorer.score(moved), _reference_scores(products, moved), rtol=1e-12)
+    assert scorer.delta_updates == 1
+
+    # Включение штрафа за скидку с нуля — тоже изменение одного веса
+    no_penalty = dict(moved, discount_penalty=0.0)
+    np.testing.assert_allclose(scorer.score(no_penalty), _reference_scores(products, no_penalty), rtol=1e-12)
+    assert scorer.delta_updates == 2
+
+    several = dict(WEIGHTS, views_weight=0.1, orders_net_weight=7.0)
+    np.testing.assert_allclose(scorer.score(several), _reference_scores(products, several), rtol=1e-12)
+    assert scorer.delta_updates == 0
+
+
+def test_incremental_scorer_does_not_mutate_returned_scores():
+    scorer = IncrementalScorer(ScoringEngine.from_products(_products()))
+    first = scorer.score(WEIGHTS)
+    snapshot = first.copy()
+    scorer.score(dict(WEIGHTS, sessions_weight=9.0))
+    np.testing.assert_array_equal(first, snapshot)
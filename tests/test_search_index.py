@@ -0,0 +1,64 @@
+import pytest
+
+from app.database.connection import get_db_connection
+from app.services import product_service
+from app.services.product_service import get_products
+from app.services.search_service import find_search_skus, prefix_query
+from app.utils.validation import ProductFilters
+
+
+def _search(term):
+    with get_db_connection() as conn:
+        return find_search_skus(conn, term)
+
+
+def test_prefix_query_quotes_tokens():
+    assert prefix_query('плат "бел') == '"плат"* "бел"*'
+    assert prefix_query('  ') == ''
+
+
+def test_cyrillic_prefix_and_case_insensitive(catalog_db):
+    assert _search('плат') == ['GKT000001-1', 'GKT000001-2']
+    assert _search('ПЛАТЬЕ ЧЕРН') == ['GKT000001-2']
+    assert _search('кеды') == ['GKT000002-1']
+
+
+def test_sku_prefix_and_substring(catalog_db):
+    assert _search('gkt000001') == ['GKT000001-1', 'GKT000001-2']
+    assert _search('GKT000002-1') == ['GKT000002-1']
+    # Подстрока в середине sku находится через триграммный индекс, как прежний LIKE
+    assert _search('00003') == ['GKT000003-1']
+
+
+def test_typo_falls_back_to_trigrams(catalog_db):
+    assert _search('футбалка') == ['GKT000003-1']
+    assert _search('zzzzzz') == []
+
+
+def test_index_follows_product_changes(catalog_db):
+    with get_db_connection() as conn:
+        conn.execute("UPDATE products SET name = 'Сарафан' WHERE sku = 'GKT000001-1'")
+        conn.execute("INSERT INTO products (sku, name, price) VALUES ('GKT000009-1', 'Платье синее', 100)")
+        conn.execute("DELETE FROM products WHERE sku = 'GKT000001-2'")
+        conn.commit()
+    assert _search('платье') == ['GKT000009-1']
+    assert _search('сараф') == ['GKT000001-1']
+
+
+@pytest.mark.parametrize('use_snapshot', [True, False])
+def test_listing_search_uses_index(catalog_db, monkeypatch, use_snapshot):
+    monkeypatch.setattr(product_service, 'CATALOG_SNAPSHOT_ENABLED', use_snapshot)
+    result = get_products(ProductFilters(category='all', hide_no_price=False, search='платье'))
+    assert result['total'] == 2
+    assert sorted(p['sku'] for p in result['products']) == ['GKT000001-1', 'GKT000001-2']
+    result = get_products(ProductFilters(category='2', hide_no_price=False, search='черн'))
+    assert [p['sku'] for p in result['products']] == ['GKT000001-2']
+
+
+def test_yo_matches_ye(catalog_db):
+    with get_db_connection() as conn:
+        conn.execute("INSERT INTO products (sku, name, price) VALUES ('GKT000009-1', 'Ёлочная игрушка', 100)")
+        conn.commit()
+    assert _search('ПЛАТЬЕ ЧЁРН') == ['GKT000001-2']
+    assert _search('елоч') == ['GKT000009-1']
+    assert _search('лочная') == ['GKT000009-1']
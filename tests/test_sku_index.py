@@ -0,0 +1,29 @@
+from app.services.product_service import autocomplete_skus
+from app.utils.sku_index import SkuIndex, base_article, normalize_sku
+
+
+def test_base_article_strips_variant_suffix():
+    assert base_article('GKT027834-1') == 'GKT027834'
+    assert base_article('GKT027834-12') == 'GKT027834'
+    assert base_article('GKT027834') == 'GKT027834'
+    assert normalize_sku(' gkt0278 ') == 'GKT0278'
+
+
+def test_prefix_rows_keep_variants_together():
+    skus = ['GKT0278340-1', 'GKT027834-2', 'ABC1', 'GKT027834-1', 'GKT027835-1']
+    index = SkuIndex(skus)
+    assert [skus[row] for row in index.prefix_rows('gkt02783')] == \
+        ['GKT027834-1', 'GKT027834-2', 'GKT0278340-1', 'GKT027835-1']
+    assert list(index.prefix_rows('XYZ')) == []
+
+    groups = index.autocomplete('GKT', 2, skus)
+    assert [group['article'] for group in groups] == ['GKT027834', 'GKT0278340']
+    assert [skus[row] for row in groups[0]['rows']] == ['GKT027834-1', 'GKT027834-2']
+
+
+def test_autocomplete_returns_name_and_image(catalog_db):
+    items = autocomplete_skus('gkt00000', limit=2)
+    assert [item['article'] for item in items] == ['GKT000001', 'GKT000002']
+    assert items[0]['name'] == 'Платье белое'
+    assert items[0]['image_url'] == 'http://img/1.jpg'
+    assert [variant['sku'] for variant in items[0]['variants']] == ['GKT000001-1', 'GKT000001-2']
@@ -0,0 +1,15 @@
+import numpy as np
+import pytest
+
+from app.utils.top_k import top_k_indices
+
+
+@pytest.mark.parametrize('k', [0, 1, 7, 20, 99, 400, 1000])
+def test_top_k_indices_matches_stable_argsort(k):
+    scores = np.random.default_rng(k).integers(0, 12, size=400).astype(np.float64)
+    expected = np.argsort(-scores, kind='stable')[:k]
+    np.testing.assert_array_equal(top_k_indices(scores, k), expected)
+
+
+def test_top_k_indices_empty():
+    assert len(top_k_indices(np.array([]), 5)) == 0
@@ -0,0 +1,44 @@
+import pytest
+
+from app.database.connection import get_db_connection
+from app.services.product_service import get_products
+from app.services.simulation_service import simulate_weights
+from app.utils.validation import ProductFilters, ValidationError
+
+
+def _weights_count():
+    with get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM weights").fetchone()[0]
+
+
+def test_current_weights_candidate_reproduces_listing(catalog_db):
+    listing = [p['sku'] for p in get_products(ProductFilters(hide_no_price=False))['products']]
+    result = simulate_weights([{}], top_k=3)
+    candidate = result['candidates'][0]
+    assert [item['sku'] for item in candidate['top']] == listing[:3]
+    assert candidate['top_k_overlap'] == 1.0
+    assert candidate['mean_rank_displacement'] == 0.0
+    assert result['total_products'] == 4
+
+
+def test_candidates_are_scored_without_saving(catalog_db):
+    before = _weights_count()
+    result = simulate_weights([
+        {'sessions_weight': 0, 'views_weight': 0, 'cart_weight': 0, 'checkout_weight': 0,
+         'orders_gross_weight': 0, 'orders_net_weight': 0, 'sale_start_weight': 0},
+        {'sale_start_weight': 1000},
+    ], top_k=2)
+    assert _weights_count() == before
+    zeroed, novelty = result['candidates']
+    assert all(item['score'] == 0.0 for item in zeroed['top'])
+    # Самая поздняя дата старта продаж у товаров GKT000001-*
+    assert {item['sku'] for item in novelty['top']} == {'GKT000001-1', 'GKT000001-2'}
+
+
+def test_invalid_candidates(catalog_db):
+    with pytest.raises(ValidationError):
+        simulate_weights([], top_k=5)
+    with pytest.raises(ValidationError):
+        simulate_weights([{'views_weight': 'много'}])
+    with pytest.raises(ValidationError):
+        simulate_weights([{}], top_k=0)